@@ -1,19 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import json
-import os
-
-DATA_FILE = "hostel_data.json"
-COLLEGE_IDS_FILE = "college_ids.json"  # File to store valid student IDs
-
-# Function to load valid student IDs from file
-def load_valid_ids():
-    try:
-        with open(COLLEGE_IDS_FILE, "r") as file:
-            return json.load(file)  # Returns a list of valid IDs
-    except FileNotFoundError:
-        messagebox.showerror("Error", "The file containing student IDs was not found.")
-        return []
+from hostel_engine import BookingError, HostelEngine
+from lazy_tree import LazyTreeFiller
+from persistence_worker import TkCallbacks, UiLatencyMonitor
 
 class HostelManagementSystem:
     def __init__(self, root):
@@ -21,8 +10,19 @@ class HostelManagementSystem:
         self.root.title("Hostel Management System")
         self.root.geometry("800x600")  # Set default window size
 
-        # Load hostel data and set up the UI
-        self.hostels = self.load_data()
+        # Booking engine over the storage backend (JSON files by default, HOSTEL_STORAGE=sqlite, journal or sharded)
+        self.engine = HostelEngine(lazy=True)  # Hostel summaries only; rooms are read when a hostel is opened
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)  # Flush storage on clean shutdown
+
+        # Saves run on a worker thread; results come back to this thread through root.after
+        self.callbacks = TkCallbacks(self.root)
+        self.worker = self.engine.start_worker(self.callbacks.schedule)
+        self.engine.start_tailer(self.callbacks.schedule)  # Picks up bookings stored at other desks
+        self.latency = UiLatencyMonitor(self.root)
+        self.latency.start()
+
+        # Hostel data as loaded by the engine
+        self.hostels = self.engine.hostels
 
         # Style configuration
         self.style = ttk.Style()
@@ -31,6 +31,11 @@ class HostelManagementSystem:
         self.style.configure("TLabel", font=("Helvetica", 12))
         self.style.configure("Treeview.Heading", font=("Helvetica", 14, "bold"))
 
+        # Status bar with pending saves and UI responsiveness
+        self.status_label = ttk.Label(self.root, text="", foreground="gray")
+        self.status_label.pack(side="bottom", fill="x", padx=10)
+        self.update_status()
+
         # Create Notebook (Tabs)
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill="both", expand=True, padx=10, pady=10)
@@ -55,9 +60,13 @@ class HostelManagementSystem:
         self.tree.heading("Hostel", text="Nearby Hostels")
         self.tree.heading("Distance", text="Distance (km)")
         self.tree.heading("Category", text="Category")
+        self.tree_scrollbar = ttk.Scrollbar(self.view_rooms_frame, orient="vertical")
+        self.tree_scrollbar.pack(side="right", fill="y", pady=10)
         self.tree.pack(fill="both", expand=True, padx=10, pady=10)
+        self.hostel_filler = LazyTreeFiller(self.tree, self.tree_scrollbar)  # Renders hostel rows page by page
 
         self.populate_hostel_list()
+        self.engine.feed.subscribe(self.show_changes)  # Hostels added here or at other desks
 
         self.view_rooms_button = ttk.Button(self.view_rooms_frame, text="View Rooms", command=self.view_rooms)
         self.view_rooms_button.pack(side="left", padx=10, pady=10)
@@ -72,22 +81,35 @@ class HostelManagementSystem:
                                     foreground="blue")
         self.info_label.pack(pady=10)
 
-    def load_data(self):
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, "r") as file:
-                return json.load(file)
-        return {}
+    def on_close(self):
+        self.engine.close()  # Waits for queued saves before closing the backend
+        self.root.destroy()
 
-    def save_data(self):
-        with open(DATA_FILE, "w") as file:
-            json.dump(self.hostels, file, indent=4)
+    # Function to show queued saves and how late the Tk event loop has been running
+    def update_status(self):
+        lag_p99, lag_max = self.latency.summary()
+        slowest = f"{max(self.worker.write_times) * 1000:.0f} ms" if self.worker.write_times else "-"
+        self.status_label.config(text=f"Pending saves: {self.worker.pending()}   Slowest save: {slowest}   "
+                                      f"UI lag p99: {lag_p99:.0f} ms (max {lag_max:.0f} ms)")
+        self.root.after(1000, self.update_status)
 
     def populate_hostel_list(self):
-        self.tree.delete(*self.tree.get_children())
-        for hostel, info in self.hostels.items():
-            distance = info.get("distance", "N/A")
-            category = info.get("category", "N/A")
-            self.tree.insert("", "end", values=(hostel, distance, category))
+        self.hostel_filler.load(self.hostels, self.engine.hostel_row)
+
+    # Function to add rows only for hostels the list does not show yet
+    def append_new_hostels(self):
+        for hostel_name in self.hostels:
+            if hostel_name not in self.hostel_filler:
+                self.hostel_filler.append(hostel_name)
+
+    # Function to add or refresh only the hostel rows named in a batch of change-feed deltas
+    def show_changes(self, deltas):
+        for delta in deltas:
+            if delta[0] == "hostel" and delta[1] in self.hostels:
+                if delta[1] in self.hostel_filler:
+                    self.hostel_filler.update(delta[1])
+                else:
+                    self.hostel_filler.append(delta[1])
 
     def check_admin_code(self):
         entered_code = self.admin_code_entry.get()
@@ -102,8 +124,8 @@ class HostelManagementSystem:
         if not selected_item:
             messagebox.showwarning("Warning", "Please select a hostel!")
             return
-        hostel_name = self.tree.item(selected_item, "values")[0]
-        RoomWindow(self.root, hostel_name, self.hostels[hostel_name]["floors"], self.save_data)
+        hostel_name = selected_item[0]  # Rows use the hostel name as their id; values turn "101" into 101
+        RoomWindow(self.root, hostel_name, self.engine)
 
     def add_hostel(self):
         hostel_name = simpledialog.askstring("Hostel Name", "Enter the name of the new hostel:")
@@ -125,42 +147,31 @@ class HostelManagementSystem:
         veg_price = simpledialog.askfloat("Veg Price", "Enter the price for veg meals:")
         non_veg_price = simpledialog.askfloat("Non-Veg Price", "Enter the price for non-veg meals:")
 
-        floors = {}
-        for i in range(num_floors):
-            floor_name = f"Floor {i + 1}"
-            floors[floor_name] = {
-                f"Room {j + 1}": {
-                    "status": "available",
-                    "capacity": standard_capacity,
-                    "occupants": [],
-                    "veg_price": veg_price,
-                    "non_veg_price": non_veg_price
-                } for j in range(standard_num_rooms)
-            }
-
         distance = simpledialog.askfloat("Distance", "Enter the distance from the college (in km):")
         category = simpledialog.askstring("Category", "Enter the category (Boys, Girls, Mixed):")
-        if category not in ["Boys", "Girls", "Mixed"]:
-            messagebox.showwarning("Warning", "Category must be one of Boys, Girls, Mixed!")
+
+        def saved(error):
+            if error is not None:
+                messagebox.showwarning("Warning", str(error))
+                self.populate_hostel_list()  # The hostel was dropped again
+                return
+            self.append_new_hostels()  # Hostels other desks added meanwhile
+
+        try:
+            self.engine.submit_add_hostel(hostel_name, num_floors, standard_num_rooms, standard_capacity, distance,
+                                          category, veg_price, non_veg_price, done=saved)
+        except BookingError as error:
+            messagebox.showwarning("Warning", str(error))
             return
-        
-        self.hostels[hostel_name] = {
-            "distance": distance,
-            "category": category,
-            "floors": floors
-        }
-        self.save_data()
-        self.populate_hostel_list()
+        self.append_new_hostels()
 
 class RoomWindow:
-    def __init__(self, root, hostel_name, floors, save_callback):
+    def __init__(self, root, hostel_name, engine):
         self.root = tk.Toplevel(root)
         self.root.title(f"{hostel_name} - Rooms")
-        self.floors = floors
-        self.save_callback = save_callback
-
-        # Load valid IDs once during initialization
-        self.valid_ids = load_valid_ids()
+        self.hostel_name = hostel_name
+        self.engine = engine
+        self.floors = engine.hostels[hostel_name]["floors"]
 
         self.floor_list = tk.Listbox(self.root)
         self.floor_list.pack(side="left", fill="y", padx=10, pady=10)
@@ -173,44 +184,54 @@ class RoomWindow:
         self.room_tree.heading("Booked", text="Booked")
         self.room_tree.heading("Remaining", text="Remaining")
         self.room_tree.heading("Capacity", text="Capacity")
+        self.room_scrollbar = ttk.Scrollbar(self.root, orient="vertical")
+        self.room_scrollbar.pack(side="right", fill="y")
         self.room_tree.pack(fill="both", expand=True)
+        self.room_filler = LazyTreeFiller(self.room_tree, self.room_scrollbar)  # Large floors render page by page
 
         self.floor_list.bind("<<ListboxSelect>>", self.populate_room_list)
+        self.shown_floor = None
+        # Rooms booked in other windows or at other desks are redrawn row by row while this window is open
+        self.subscription = self.engine.feed.subscribe(self.show_changes)
+        self.room_tree.bind("<Destroy>", lambda event: self.engine.feed.unsubscribe(self.subscription))
         self.book_room_button = tk.Button(self.root, text="Book Room", command=self.open_booking_window)
         self.book_room_button.pack(pady=10)
 
     def populate_room_list(self, event=None):
         try:
             selected_floor = self.floor_list.get(self.floor_list.curselection())
-            rooms = self.floors[selected_floor]
-            self.room_tree.delete(*self.room_tree.get_children())
-            for room, info in rooms.items():
-                booked = len(info["occupants"])
-                remaining = info["capacity"] - booked
-                status = "Fully Booked" if remaining == 0 else "Available"
-                self.room_tree.insert("", "end", values=(room, status, booked, remaining, info["capacity"]))
+            self.room_filler.load(self.floors[selected_floor],
+                                  lambda room: self.engine.room_row(self.hostel_name, selected_floor, room))
+            self.shown_floor = selected_floor
         except tk.TclError:
             pass
 
+    def show_changes(self, deltas):
+        for delta in deltas:
+            if delta[0] == "room" and delta[1] == self.hostel_name and delta[2] == self.shown_floor:
+                self.room_filler.update(delta[3])
+
     def open_booking_window(self):
         try:
             selected_floor = self.floor_list.get(self.floor_list.curselection())
-            selected_room = self.room_tree.item(self.room_tree.selection())["values"][0]
+            selected_room = self.room_tree.selection()[0]  # Rows use the room name as their id
             room_data = self.floors[selected_floor][selected_room]
+            # The room as the operator sees it now; the booking is refused if another desk changes it meanwhile
+            version = self.engine.room_version(self.hostel_name, selected_floor, selected_room)
 
-            if room_data["capacity"] == len(room_data["occupants"]):
+            if room_data["capacity"] <= len(room_data["occupants"]) + \
+                    self.engine.free_beds.held_beds(self.hostel_name, selected_floor, selected_room):
                 messagebox.showwarning("Warning", "Room is fully booked!")
                 return
 
             student_id = simpledialog.askstring("Student ID", "Enter Student ID:")
 
-            # Check if the student ID is valid
-            if student_id not in self.valid_ids:
-                messagebox.showwarning("Warning", "Invalid Student ID!")
-                return
-
-            if any(occupant["id"] == student_id for occupant in room_data["occupants"]):
-                messagebox.showwarning("Warning", "Student already booked this room!")
+            # Check the ID and the room before asking for the meal choice
+            try:
+                self.engine.check_student(self.hostel_name, selected_floor, selected_room, student_id,
+                                          record_booking=False)
+            except BookingError as error:
+                messagebox.showwarning("Warning", str(error))
                 return
 
             meal_choice = simpledialog.askstring("Meal Choice", "Enter meal choice (Veg/Non-Veg):")
@@ -218,9 +239,21 @@ class RoomWindow:
                 messagebox.showwarning("Warning", "Invalid meal choice!")
                 return
 
-            room_data["occupants"].append({"id": student_id, "meal": meal_choice})
-            self.save_callback()  # Save the updated data
-            self.populate_room_list()
+            # Called on this thread once the save finished; storage re-checks the room under the shared lock
+            def saved(error):
+                if not self.root.winfo_exists():
+                    return
+                self.room_filler.update(selected_room)  # Show the room as it is now stored
+                if error is not None:
+                    messagebox.showwarning("Warning", str(error), parent=self.root)
+
+            # Validate now and save on the worker thread; this also adds the student to the room occupants
+            try:
+                self.engine.submit_booking(self.hostel_name, selected_floor, selected_room, student_id,
+                                           meal=meal_choice, expected_version=version, record_booking=False,
+                                           done=saved)
+            except BookingError as error:
+                messagebox.showwarning("Warning", str(error))
 
         except IndexError:
             messagebox.showwarning("Warning", "No room selected!")
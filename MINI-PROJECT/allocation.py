@@ -0,0 +1,235 @@
+import argparse
+import concurrent.futures
+import csv
+import heapq
+import os
+import sys
+
+import metrics
+from bulk_import import row_problem
+from free_beds import distance_key
+from hostel_engine import HOSTELS_FOR, MEAL_CHOICES, HostelEngine
+from storage import BookingError
+
+CSV_COLUMNS = ["student_id", "name", "category", "preferences"]  # Optional: meal, max_meal_price
+PREFERENCE_SEPARATOR = ";"  # Between hostel names in the preferences column, best first
+
+# Function to stream (row_number, student_id, name, category, preferences, meal, max_meal_price) tuples out
+# of a CSV file; an empty preferences column means "nearest hostel first". Malformed rows are skipped and
+# reported in errors as (row_number, student_id, message).
+def read_students(file, errors):
+    reader = csv.DictReader(file)
+    missing = [column for column in CSV_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+    for row in reader:
+        student_id = (row.get("student_id") or "").strip()
+        problem = row_problem(row, CSV_COLUMNS)
+        budget = (row.get("max_meal_price") or "").strip() or None
+        if not problem and budget is not None:
+            try:
+                budget = float(budget)
+            except ValueError:
+                problem = "Maximum meal price must be a number!"
+        if problem:
+            errors.append((reader.line_num, student_id, problem))
+            continue
+        preferences = [name.strip() for name in row["preferences"].split(PREFERENCE_SEPARATOR) if name.strip()]
+        yield (reader.line_num, student_id, row["name"].strip(), row["category"].strip(),
+               preferences, (row.get("meal") or "").strip() or None, budget)
+
+
+# Function to find the highest price a hostel's rooms charge for a meal (0 when it sets none)
+def meal_price(info, meal):
+    key = "veg_price" if meal == "Veg" else "non_veg_price"
+    return max((room_data.get(key) or 0 for rooms in info["floors"].values() for room_data in rooms.values()),
+               default=0)
+
+
+# Student-proposing deferred acceptance. preferences[s] lists hostel numbers best first; every hostel
+# prefers students with a lower number (earlier in the file). Returns each student's hostel, or -1.
+# The result is stable: no student would rather have a hostel that is not full or that holds a later student.
+def deferred_acceptance(preferences, capacities):
+    next_choice = [0] * len(preferences)
+    held = [[] for _ in capacities]  # Per hostel, a heap of -student so the latest-priority student is on top
+    unmatched = list(range(len(preferences) - 1, -1, -1))
+    while unmatched:
+        student = unmatched.pop()
+        choices = preferences[student]
+        while next_choice[student] < len(choices):
+            hostel = choices[next_choice[student]]
+            next_choice[student] += 1
+            if len(held[hostel]) < capacities[hostel]:
+                heapq.heappush(held[hostel], -student)
+                break
+            if held[hostel] and -held[hostel][0] > student:
+                unmatched.append(-heapq.heapreplace(held[hostel], -student))  # The bumped student tries again
+                break
+    assignment = [-1] * len(preferences)
+    for hostel, students in enumerate(held):
+        for student in students:
+            assignment[-student] = hostel
+    return assignment
+
+
+# Function to split a Mixed hostel's open rooms between student categories in proportion to how many of
+# each listed it; whole rooms go to one category, so every partition can be matched on its own
+def split_rooms(rooms, demand):
+    shares = {category: [] for category in demand}
+    total = sum(demand.values())
+    if not total:
+        return shares
+    beds = sum(free for floor, room, free in rooms)
+    owed = {category: beds * count / total for category, count in demand.items()}
+    for floor, room, free in rooms:
+        category = max(owed, key=owed.get)
+        shares[category].append((floor, room, free))
+        owed[category] -= free
+    return shares
+
+
+# Function to check the student rows and turn them into partitions, one per student category.
+# Returns ({category: (students, hostel_names, beds)}, errors) where students are (row_number, student_id,
+# name, meal, preference numbers) in priority order and beds[i] lists the (floor, room, free) of hostel i.
+def build_partitions(engine, rows):
+    hostels = engine.hostels
+    by_distance = sorted(hostels, key=lambda hostel_name: distance_key(hostel_name, hostels[hostel_name]))
+    students = {category: [] for category in HOSTELS_FOR}
+    errors = []
+    seen = set()
+    prices = {}  # (hostel, meal) -> meal_price
+    for row_number, student_id, name, category, preferences, meal, budget in rows:
+        try:
+            if student_id in seen:
+                raise BookingError("Student appears more than once in this file!")
+            if not engine.is_valid_id(student_id):
+                raise BookingError("Invalid Student ID!")
+            if student_id in engine.bookings or student_id in engine.pending_ids:
+                raise BookingError("Student has already booked a room!")
+            if not name:
+                raise BookingError("Student name cannot be empty!")
+            if category not in HOSTELS_FOR:
+                raise BookingError(f"Category must be one of {', '.join(HOSTELS_FOR)}!")
+            if meal is not None and meal not in MEAL_CHOICES:
+                raise BookingError("Invalid meal choice!")
+            unknown = [hostel_name for hostel_name in preferences if hostel_name not in hostels]
+            if unknown:
+                raise BookingError(f"Unknown hostel: {unknown[0]}")
+        except BookingError as error:
+            errors.append((row_number, student_id, str(error)))
+            continue
+        seen.add(student_id)
+        allowed = HOSTELS_FOR[category]
+        ranked = [hostel_name for hostel_name in dict.fromkeys(preferences or by_distance)
+                  if hostels[hostel_name].get("category") in allowed]
+        if meal is not None and budget is not None:
+            for hostel_name in ranked:
+                if (hostel_name, meal) not in prices:
+                    prices[hostel_name, meal] = meal_price(hostels[hostel_name], meal)
+            ranked = [hostel_name for hostel_name in ranked if prices[hostel_name, meal] <= budget]
+        students[category].append((row_number, student_id, name, meal, ranked))
+
+    demand = {}  # Mixed hostel -> {category: students listing it}
+    for category, category_students in students.items():
+        for row in category_students:
+            for hostel_name in row[4]:
+                if hostels[hostel_name].get("category") == "Mixed":
+                    counts = demand.setdefault(hostel_name, dict.fromkeys(HOSTELS_FOR, 0))
+                    counts[category] += 1
+    mixed_shares = {hostel_name: split_rooms(open_rooms(hostels[hostel_name]), counts)
+                    for hostel_name, counts in demand.items()}
+
+    partitions = {}
+    for category, category_students in students.items():
+        if not category_students:
+            continue
+        numbers = {}
+        beds = []
+        for row in category_students:
+            for hostel_name in row[4]:
+                if hostel_name not in numbers:
+                    numbers[hostel_name] = len(beds)
+                    beds.append(mixed_shares[hostel_name][category] if hostel_name in mixed_shares
+                                else open_rooms(hostels[hostel_name]))
+        partitions[category] = ([row[:4] + ([numbers[hostel_name] for hostel_name in row[4]],)
+                                 for row in category_students], list(numbers), beds)
+    return partitions, errors
+
+
+def open_rooms(info):
+    return [(floor, room, room_data["capacity"] - len(room_data["occupants"]))
+            for floor, rooms in info["floors"].items() for room, room_data in rooms.items()
+            if room_data["capacity"] > len(room_data["occupants"])]
+
+
+# Function to place every student of a file at once: the partitions are matched in parallel worker processes
+# (workers=1 runs them here), then every placement is stored with one bulk commit.
+# Returns (bookings made, students left without a place, per-row errors).
+@metrics.timed("allocate")
+def allocate(engine, rows, workers=None, dry_run=False, record_booking=True):
+    partitions, errors = build_partitions(engine, rows)
+    categories = list(partitions)
+    jobs = [([student[4] for student in partitions[category][0]],
+             [sum(free for floor, room, free in rooms) for rooms in partitions[category][2]])
+            for category in categories]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            assignments = list(pool.map(deferred_acceptance, *zip(*jobs)))
+    else:
+        assignments = [deferred_acceptance(preferences, capacities) for preferences, capacities in jobs]
+
+    entries = []
+    unplaced = []
+    for category, assignment in zip(categories, assignments):
+        students, hostel_names, beds = partitions[category]
+        rooms_left = [iter(rooms) for rooms in beds]
+        current = [None] * len(beds)  # Per hostel, [floor, room, free beds] of the room being filled
+        for (row_number, student_id, name, meal, preferences), hostel in zip(students, assignment):
+            if hostel < 0:
+                unplaced.append((row_number, student_id))
+                continue
+            if current[hostel] is None or current[hostel][2] == 0:
+                current[hostel] = list(next(rooms_left[hostel]))
+            floor, room, free = current[hostel]
+            room_data = engine.hostels[hostel_names[hostel]]["floors"][floor][room]
+            try:
+                entries.append(engine.make_entry(hostel_names[hostel], floor, room, student_id, name, meal,
+                                                 record_booking, pending=room_data["capacity"] - len(
+                                                     room_data["occupants"]) - free))
+            except BookingError as error:
+                errors.append((row_number, student_id, str(error)))  # The bed stays free for the next student
+                continue
+            current[hostel][2] -= 1
+    if dry_run:
+        return [booking or occupant for hostel_name, floor, room, occupant, booking in entries], unplaced, errors
+    return engine.book_many(entries), unplaced, errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Place many students at once from a CSV of "
+                                                 "student_id,name,category,preferences[,meal,max_meal_price] rows. "
+                                                 "Earlier rows win when hostels run out of beds.")
+    parser.add_argument("csv_file")
+    parser.add_argument("--workers", type=int, help="processes for the matching (default: one per category)")
+    parser.add_argument("--dry-run", action="store_true", help="only compute the placement, do not book")
+    parser.add_argument("--occupants-only", action="store_true",
+                        help="only add room occupants (Hostel_final.py data, which keeps no bookings list)")
+    args = parser.parse_args()
+
+    engine = HostelEngine()
+    try:
+        with open(args.csv_file, "r", newline="") as file:
+            errors = []
+            booked, unplaced, row_errors = allocate(engine, read_students(file, errors), args.workers,
+                                                    args.dry_run, not args.occupants_only)
+        errors = sorted(errors + row_errors, key=lambda error: error[0])
+    finally:
+        engine.close()
+
+    for row_number, student_id, message in errors:
+        print(f"line {row_number}: {student_id}: {message}", file=sys.stderr)
+    for row_number, student_id in unplaced:
+        print(f"line {row_number}: {student_id}: no hostel on the list has a bed left", file=sys.stderr)
+    print(f"Placed {len(booked)} students, {len(unplaced)} without a bed, {len(errors)} rows rejected")
+    sys.exit(1 if errors else 0)
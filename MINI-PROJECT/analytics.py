@@ -0,0 +1,203 @@
+import argparse
+import collections
+import csv
+from array import array
+
+import metrics
+
+from student_details import department_codes
+from student_ids import COLLEGE_CODE
+
+try:
+    import numpy as np
+except ImportError:  # Aggregation falls back to plain loops over the same arrays
+    np = None
+
+ROLL_PREFIX = len("1602-YY-DDD")  # College, intake year and department part of a roll number
+
+
+class RoomColumns:
+    # The room tree flattened in one pass into parallel arrays, one slot per room, plus a count of
+    # occupants per roll-number prefix ("1602-YY-DDD") for the year/department mix
+    def __init__(self, hostels):
+        self.hostel_names = []
+        self.categories = []  # Category of each hostel, same order as hostel_names
+        self.floor_names = []  # (hostel, floor) per floor slot
+        self.skipped_rooms = 0  # Rooms left out because their capacity is not a whole number
+        room_hostel = []
+        room_floor = []
+        capacity = []
+        booked = []
+        revenue = []
+        veg_meals = []
+        non_veg_meals = []
+        student_ids = []
+
+        for hostel_name, info in hostels.items():
+            hostel_slot = len(self.hostel_names)
+            self.hostel_names.append(hostel_name)
+            self.categories.append(info.get("category") or "N/A")
+            for floor, rooms in info["floors"].items():
+                floor_slot = len(self.floor_names)
+                self.floor_names.append((hostel_name, floor))
+                first = len(capacity)
+                room_list = []
+                for room_data in rooms.values():
+                    try:
+                        capacity.append(int(room_data["capacity"]))  # Older files store it as text
+                    except (KeyError, TypeError, ValueError):
+                        self.skipped_rooms += 1
+                        continue
+                    room_list.append(room_data)
+                room_hostel.extend([hostel_slot] * len(room_list))
+                room_floor.extend([floor_slot] * len(room_list))
+                booked.extend([len(room_data["occupants"]) for room_data in room_list])
+                veg_meals.extend([0] * len(room_list))
+                non_veg_meals.extend([0] * len(room_list))
+                revenue.extend([0.0] * len(room_list))
+                for slot, room_data in enumerate(room_list, first):
+                    occupants = room_data["occupants"]
+                    if not occupants:
+                        continue
+                    meals = [occupant.get("meal") for occupant in occupants]
+                    veg = veg_meals[slot] = meals.count("Veg")
+                    non_veg = non_veg_meals[slot] = meals.count("Non-Veg")
+                    revenue[slot] = veg * (room_data.get("veg_price") or 0) + \
+                        non_veg * (room_data.get("non_veg_price") or 0)
+                    student_ids.extend([occupant.get("id") or "" for occupant in occupants])
+
+        self.room_hostel = array("i", room_hostel)
+        self.room_floor = array("i", room_floor)
+        self.capacity = array("i", capacity)
+        self.booked = array("i", booked)
+        self.revenue = array("d", revenue)  # Meal revenue of the room's occupants at the room's prices
+        self.veg_meals = array("i", veg_meals)
+        self.non_veg_meals = array("i", non_veg_meals)
+        self.prefixes = collections.Counter(student_id[:ROLL_PREFIX] for student_id in student_ids)
+        metrics.count("rooms_scanned", len(capacity))
+
+
+# Function to add up values per group (one bincount with NumPy, one loop without)
+def group_sum(groups, values, size):
+    if np is not None:
+        sums = np.bincount(np.frombuffer(groups, dtype=np.intc), weights=np.asarray(values, dtype=float),
+                           minlength=size)
+        return sums.tolist()
+    sums = [0] * size
+    for group, value in zip(groups, values):
+        sums[group] += value
+    return sums
+
+
+# Function to turn prefix counts into {(year, department code): students} and a count of IDs that did not decode
+def decode_prefixes(prefixes):
+    mix = {}
+    undecoded = 0
+    for prefix, count in prefixes.items():
+        parts = prefix.split("-")
+        if len(parts) != 3 or parts[0] != COLLEGE_CODE or len(parts[1]) != 2 or len(parts[2]) != 3 or \
+                not (parts[1].isdigit() and parts[2].isdigit()):
+            undecoded += count
+            continue
+        mix[(2000 + int(parts[1]), parts[2])] = count
+    return mix, undecoded
+
+
+# Function to express free beds as a share of capacity
+def vacancy_ratio(capacity, booked):
+    return round(max(capacity - booked, 0) / capacity, 4) if capacity else 0.0
+
+
+class AnalyticsReport:
+    # Occupancy, vacancy, department/year mix and projected meal revenue over the whole room tree
+    SECTIONS = {
+        "hostels": ["hostel", "category", "capacity", "booked", "free", "vacancy_ratio", "veg_meals",
+                    "non_veg_meals", "meal_revenue"],
+        "floors": ["hostel", "floor", "capacity", "booked", "free", "vacancy_ratio"],
+        "categories": ["category", "capacity", "booked", "free", "vacancy_ratio", "meal_revenue"],
+        "students": ["year", "department", "students"],
+    }
+
+    def __init__(self, hostels):
+        columns = RoomColumns(hostels)
+        hostel_count = len(columns.hostel_names)
+        floor_count = len(columns.floor_names)
+
+        hostel_capacity = group_sum(columns.room_hostel, columns.capacity, hostel_count)
+        hostel_booked = group_sum(columns.room_hostel, columns.booked, hostel_count)
+        hostel_veg = group_sum(columns.room_hostel, columns.veg_meals, hostel_count)
+        hostel_non_veg = group_sum(columns.room_hostel, columns.non_veg_meals, hostel_count)
+        hostel_revenue = group_sum(columns.room_hostel, columns.revenue, hostel_count)
+        floor_capacity = group_sum(columns.room_floor, columns.capacity, floor_count)
+        floor_booked = group_sum(columns.room_floor, columns.booked, floor_count)
+
+        self.hostels = []
+        by_category = {}
+        for slot, hostel_name in enumerate(columns.hostel_names):
+            capacity, booked = int(hostel_capacity[slot]), int(hostel_booked[slot])
+            revenue = round(hostel_revenue[slot], 2)
+            category = columns.categories[slot]
+            self.hostels.append((hostel_name, category, capacity, booked, max(capacity - booked, 0),
+                                 vacancy_ratio(capacity, booked), int(hostel_veg[slot]), int(hostel_non_veg[slot]),
+                                 revenue))
+            totals = by_category.setdefault(category, [0, 0, 0.0])
+            totals[0] += capacity
+            totals[1] += booked
+            totals[2] += revenue
+
+        self.floors = []
+        for slot, (hostel_name, floor) in enumerate(columns.floor_names):
+            capacity, booked = int(floor_capacity[slot]), int(floor_booked[slot])
+            self.floors.append((hostel_name, floor, capacity, booked, max(capacity - booked, 0),
+                                vacancy_ratio(capacity, booked)))
+
+        self.categories = [(category, capacity, booked, max(capacity - booked, 0), vacancy_ratio(capacity, booked),
+                            round(revenue, 2))
+                           for category, (capacity, booked, revenue) in sorted(by_category.items())]
+
+        mix, self.undecoded_ids = decode_prefixes(columns.prefixes)
+        self.skipped_rooms = columns.skipped_rooms
+        self.students = [(year, department_codes.get(department, department), count)
+                         for (year, department), count in sorted(mix.items())]
+
+        self.capacity = sum(row[1] for row in self.categories)
+        self.booked = sum(row[2] for row in self.categories)
+        self.meal_revenue = round(sum(row[5] for row in self.categories), 2)
+
+    def rows(self, section):
+        return getattr(self, section)
+
+    # Function to write one section as CSV with a header row
+    def export_csv(self, path, section="hostels"):
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(self.SECTIONS[section])
+            writer.writerows(self.rows(section))
+
+    def summary(self):
+        return (f"Beds: {self.capacity}   Booked: {self.booked}   Free: {max(self.capacity - self.booked, 0)}   "
+                f"Vacancy: {vacancy_ratio(self.capacity, self.booked):.1%}   "
+                f"Projected meal revenue: {self.meal_revenue:.2f}" +
+                (f"   Rooms skipped (unreadable capacity): {self.skipped_rooms}" if self.skipped_rooms else ""))
+
+
+if __name__ == "__main__":
+    from hostel_engine import HostelEngine
+
+    parser = argparse.ArgumentParser(description="Print occupancy analytics or export them as CSV.")
+    parser.add_argument("--section", choices=list(AnalyticsReport.SECTIONS), default="hostels")
+    parser.add_argument("--csv", help="write the section to this CSV file instead of printing it")
+    args = parser.parse_args()
+
+    engine = HostelEngine()
+    try:
+        report = engine.analytics()
+    finally:
+        engine.close()
+    if args.csv:
+        report.export_csv(args.csv, args.section)
+    else:
+        print(", ".join(AnalyticsReport.SECTIONS[args.section]))
+        for row in report.rows(args.section):
+            print(", ".join(str(value) for value in row))
+    print(report.summary())
@@ -0,0 +1,798 @@
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import allocation
+import analytics
+import metrics
+import schema
+import storage
+import student_details
+import student_ids
+from bookings import BookingStore
+from bulk_import import import_csv
+from free_beds import FreeBedIndex
+from hostel_engine import HostelEngine
+from search import SearchIndex
+
+
+# Function to print one benchmark result line
+def report(name, seconds, count):
+    per_op = seconds / count * 1e9 if count else 0.0
+    print(f"{name:<40} {count:>10} ops  {seconds:8.4f} s  {per_op:10.1f} ns/op")
+
+
+# Benchmark: ID validation stays constant time no matter where the ID sits in the file
+def bench_id_lookup():
+    start = time.perf_counter()
+    student_ids.clear_id_index()
+    student_ids.load_id_index()
+    print(f"{'build ID index (cold)':<40} {time.perf_counter() - start:8.4f} s")
+
+    samples = {
+        "first ID": "1602-20-732-001",
+        "middle ID": "1602-22-735-097",
+        "last ID": "1602-24-748-194",
+        "unknown ID": "1602-99-999-999",
+        "malformed ID": "not-a-roll-number",
+    }
+    count = 200000
+    for label, student_id in samples.items():
+        seconds = timeit.timeit(lambda: student_ids.is_valid_id(student_id), number=count)
+        report(f"is_valid_id ({label})", seconds, count)
+
+
+# Benchmark: duplicate checks and lookups stay flat as the booking count grows
+def bench_booking_store():
+    for size in (1000, 10000, 50000):
+        store = BookingStore(
+            {"student_id": f"S{i}", "student_name": f"Student {i}", "hostel_name": f"Hostel {i % 50}",
+             "floor": f"Floor {i % 5 + 1}", "room": f"Room {i % 20 + 1}"}
+            for i in range(size)
+        )
+        count = 200000
+        seconds = timeit.timeit(lambda: f"S{size - 1}" in store, number=count)
+        report(f"duplicate check ({size} bookings)", seconds, count)
+        seconds = timeit.timeit(lambda: store.find(f"S{size // 2}"), number=count)
+        report(f"find ({size} bookings)", seconds, count)
+
+
+# Function run by each desk process: try to book its own students into the shared room
+def _desk_worker(kind, directory, desk, attempts):
+    os.chdir(directory)
+    backend = storage.open_storage(kind)
+    hostels = backend.load_hostels()
+    booked = 0
+    for i in range(attempts):
+        student_id = f"1602-24-733-{desk:02d}{i}"
+        occupant = {"id": student_id, "name": f"Desk {desk}"}
+        booking = {"student_id": student_id, "student_name": f"Desk {desk}", "hostel_name": "Stress",
+                   "room": "Room 1", "floor": "Floor 1"}
+        try:
+            backend.add_booking(hostels, [], "Stress", "Floor 1", "Room 1", occupant, booking)
+            booked += 1
+        except storage.BookingConflict:
+            pass
+    backend.close()
+    return booked
+
+
+# Benchmark: N desk processes hammer one room (tests/test_desks.py checks it never ends up over capacity)
+def bench_desk_contention(desks=8, attempts=5, capacity=10):
+    for kind in ("json", "journal", "sqlite", "sharded"):
+        with tempfile.TemporaryDirectory() as directory:
+            cwd = os.getcwd()
+            os.chdir(directory)
+            hostels = {"Stress": {"distance": 1.0, "category": "Mixed", "floors": {
+                "Floor 1": {"Room 1": {"status": "available", "capacity": capacity, "occupants": []}}}}}
+            backend = storage.open_storage(kind)
+            backend.save_hostels(hostels)
+            backend.close()
+            os.chdir(cwd)
+
+            start = time.perf_counter()
+            with multiprocessing.Pool(desks) as pool:
+                results = pool.starmap(_desk_worker, [(kind, directory, desk, attempts) for desk in range(desks)])
+            seconds = time.perf_counter() - start
+
+            os.chdir(directory)
+            backend = storage.open_storage(kind)
+            occupants = backend.load_hostels()["Stress"]["floors"]["Floor 1"]["Room 1"]["occupants"]
+            bookings = backend.load_bookings()
+            backend.close()
+            os.chdir(cwd)
+
+            report(f"{desks} desks on one room ({kind})", seconds, desks * attempts)
+            print(f"{'':<40} {sum(results)} booked, {len(occupants)} occupants, {len(bookings)} bookings, "
+                  f"capacity {capacity}")
+
+
+# Function to build a synthetic hostel tree
+def make_hostels(count, floors=5, rooms=20, capacity=4):
+    categories = ["Boys", "Girls", "Mixed"]
+    return {
+        f"Hostel {h}": {
+            "distance": round(0.5 + (h * 37 % 100) / 10, 1),
+            "category": categories[h % 3],
+            "floors": {
+                f"Floor {f + 1}": {
+                    f"Room {r + 1}": {"status": "available", "capacity": capacity, "occupants": []}
+                    for r in range(rooms)
+                } for f in range(floors)
+            }
+        } for h in range(count)
+    }
+
+
+# Function to list every valid roll number in the same order as college_ids.json
+def all_student_ids():
+    with open(student_ids.COLLEGE_IDS_FILE, "r") as file:
+        data = json.load(file)
+    return [student_id for year in data.values() for department in year.values() for student_id in department]
+
+
+# Benchmark: bookings per second through HostelEngine on 10, 100 and 1,000 hostels
+def bench_engine():
+    ids = all_student_ids()
+    for kind, bookings in (("memory", 3000), ("sqlite", 1000), ("json", 20)):
+        for count in (10, 100, 1000):
+            with tempfile.TemporaryDirectory() as directory:
+                backend = {
+                    "memory": lambda: storage.MemoryStorage(make_hostels(count)),
+                    "sqlite": lambda: storage.SqliteStorage(os.path.join(directory, "hostel_data.db")),
+                    "json": lambda: storage.JsonStorage(os.path.join(directory, "hostel_data.json"),
+                                                        os.path.join(directory, "student_bookings.json")),
+                }[kind]()
+                if kind != "memory":
+                    backend.save_hostels(make_hostels(count))
+                engine = HostelEngine(backend)
+                rooms = [(hostel, floor, room) for hostel, info in engine.hostels.items()
+                         for floor, floor_rooms in info["floors"].items() for room in floor_rooms]
+
+                start = time.perf_counter()
+                for i in range(bookings):
+                    hostel, floor, room = rooms[i % len(rooms)]
+                    engine.book(hostel, floor, room, ids[i], f"Student {i}")
+                seconds = time.perf_counter() - start
+                engine.close()
+                report(f"book ({kind}, {count} hostels)", seconds, bookings)
+                print(f"{'':<40} {bookings / seconds:10.0f} bookings/s")
+
+
+# Benchmark: time until the hostel list can be shown, full parse vs. snapshot with floors loaded on demand
+def bench_startup(hostel_count=1000, bookings=5000):
+    ids = all_student_ids()
+    for kind in ("json", "sqlite"):
+        with tempfile.TemporaryDirectory() as directory:
+            def open_backend():
+                if kind == "sqlite":
+                    return storage.SqliteStorage(os.path.join(directory, "hostel_data.db"))
+                return storage.JsonStorage(os.path.join(directory, "hostel_data.json"),
+                                           os.path.join(directory, "student_bookings.json"))
+
+            backend = open_backend()
+            backend.save_hostels(make_hostels(hostel_count))
+            engine = HostelEngine(backend)
+            rooms = [(hostel, floor, room) for hostel, info in engine.hostels.items()
+                     for floor, floor_rooms in info["floors"].items() for room in floor_rooms]
+            engine.book_many([engine.make_entry(*rooms[i * 7 % len(rooms)], ids[i], f"Student {i}")
+                              for i in range(bookings)])
+            engine.close()
+
+            for label, lazy in (("full load", False), ("snapshot, cold", True), ("snapshot, warm", True)):
+                start = time.perf_counter()
+                engine = HostelEngine(open_backend(), lazy=lazy)
+                engine.list_hostels()
+                seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                engine.list_rooms(next(iter(engine.hostels)))  # What opening one RoomWindow costs
+                first_hostel = time.perf_counter() - start
+                engine.close()
+                print(f"{'startup (' + kind + ', ' + label + ')':<40} {seconds * 1000:10.1f} ms"
+                      f"  first hostel {first_hostel * 1000:8.3f} ms")
+
+
+# Benchmark: the full analytics report over 100,000 rooms with meals and prices
+def bench_analytics(hostel_count=1000, occupants=200000):
+    ids = all_student_ids()
+    hostels = make_hostels(hostel_count)
+    rooms = [room_data for info in hostels.values() for floor_rooms in info["floors"].values()
+             for room_data in floor_rooms.values()]
+    for room_data in rooms:
+        room_data["veg_price"] = 3000.0
+        room_data["non_veg_price"] = 3500.0
+    for i in range(occupants):
+        rooms[i * 7 % len(rooms)]["occupants"].append(
+            {"id": ids[i % len(ids)], "meal": "Veg" if i % 3 else "Non-Veg"})
+    start = time.perf_counter()
+    result = analytics.AnalyticsReport(hostels)
+    seconds = time.perf_counter() - start
+    report(f"analytics ({len(rooms)} rooms, {'numpy' if analytics.np is not None else 'array'})", seconds, len(rooms))
+    print(f"{'':<40} {result.summary()}")
+
+
+# Benchmark: time the UI thread spends per booking, inline save vs. the persistence worker
+def bench_worker(hostel_count=100, bookings=200):
+    ids = all_student_ids()
+    for mode in ("inline", "worker"):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = storage.JsonStorage(os.path.join(directory, "hostel_data.json"),
+                                          os.path.join(directory, "student_bookings.json"))
+            backend.save_hostels(make_hostels(hostel_count))
+            engine = HostelEngine(backend)
+            callbacks = queue.SimpleQueue()  # Stands in for the Tk event loop
+            worker = engine.start_worker(callbacks.put) if mode == "worker" else None
+            rooms = [(hostel, floor, room) for hostel, info in engine.hostels.items()
+                     for floor, floor_rooms in info["floors"].items() for room in floor_rooms]
+
+            ui_times = []
+            start = time.perf_counter()
+            for i in range(bookings):
+                hostel, floor, room = rooms[i % len(rooms)]
+                submitted = time.perf_counter()
+                engine.submit_booking(hostel, floor, room, ids[i], f"Student {i}")
+                ui_times.append(time.perf_counter() - submitted)
+                while not callbacks.empty():
+                    callbacks.get()()
+            if worker is not None:
+                worker.flush()
+                while not callbacks.empty():
+                    callbacks.get()()
+            seconds = time.perf_counter() - start
+            writes = worker.batches if worker is not None else bookings
+            engine.close()
+
+            ui_times.sort()
+            report(f"submit_booking ({mode}, json)", seconds, bookings)
+            print(f"{'':<40} UI thread p99 {ui_times[int(len(ui_times) * 0.99)] * 1000:8.3f} ms"
+                  f"  max {ui_times[-1] * 1000:8.3f} ms  {writes} writes")
+
+
+# Benchmark: validate and commit a 50,000-row allotment CSV with one write
+def bench_bulk_import(rows=50000):
+    departments = ["732", "733", "734", "735", "736", "737", "748"]
+    ids = [f"1602-{year:02d}-{department}-{unique_id:03d}"
+           for year in range(10, 20) for department in departments for unique_id in range(1, 1000)][:rows]
+    for kind in ("json", "sqlite"):
+        with tempfile.TemporaryDirectory() as directory:
+            ids_file = os.path.join(directory, "college_ids.json")
+            with open(ids_file, "w") as file:
+                json.dump({"synthetic": {"all": ids}}, file)
+            csv_file = os.path.join(directory, "allotments.csv")
+            hostels = make_hostels(250, floors=10, rooms=20, capacity=2)
+            rooms = [(hostel, floor, room) for hostel, info in hostels.items()
+                     for floor, floor_rooms in info["floors"].items() for room in floor_rooms]
+            with open(csv_file, "w") as file:
+                file.write("student_id,name,hostel,floor,room\n")
+                for i, student_id in enumerate(ids):
+                    hostel, floor, room = rooms[i % len(rooms)]
+                    file.write(f"{student_id},Student {i},{hostel},{floor},{room}\n")
+
+            if kind == "json":
+                backend = storage.JsonStorage(os.path.join(directory, "hostel_data.json"),
+                                              os.path.join(directory, "student_bookings.json"))
+            else:
+                backend = storage.SqliteStorage(os.path.join(directory, "hostel_data.db"))
+            backend.save_hostels(hostels)
+            engine = HostelEngine(backend, ids_file)
+
+            start = time.perf_counter()
+            booked, errors = import_csv(engine, csv_file)
+            seconds = time.perf_counter() - start
+            engine.close()
+            assert len(booked) == rows and not errors, errors[:5]
+            report(f"bulk import ({kind})", seconds, rows)
+
+
+# Benchmark: "nearest hostel with N free beds" and incremental updates on growing hostel counts
+def bench_free_beds():
+    for count in (100, 1000, 10000):
+        hostels = make_hostels(count, floors=2, rooms=5, capacity=2)
+        start = time.perf_counter()
+        index = FreeBedIndex(hostels)
+        print(f"{'build free-bed index (' + str(count) + ' hostels)':<40} {time.perf_counter() - start:8.4f} s")
+        number = 20000
+        seconds = timeit.timeit(lambda: index.nearest(15, ["Girls"]), number=number)
+        report(f"nearest with 15 free ({count} hostels)", seconds, number)
+        room = hostels["Hostel 0"]["floors"]["Floor 1"]["Room 1"]
+        def toggle():
+            if room["occupants"]:
+                room["occupants"].pop()
+            else:
+                room["occupants"].append({"id": "x"})
+            index.room_changed("Hostel 0", "Floor 1", "Room 1")
+        seconds = timeit.timeit(toggle, number=number)
+        report(f"room_changed ({count} hostels)", seconds, number)
+
+
+# Benchmark: nested ID file vs compact range file (size, generation time, load + index time)
+def bench_roll_numbers():
+    datasets = {
+        "default (2020-2024, 194/dept)": (range(2020, 2025), 194),
+        "large (2000-2099, 999/dept)": (range(2000, 2100), 999),
+    }
+    for label, (years, intake) in datasets.items():
+        for compact in (False, True):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "college_ids.json")
+                start = time.perf_counter()
+                student_details.generate_roll_numbers(years, intake=intake, path=path, compact=compact)
+                generate_seconds = time.perf_counter() - start
+
+                student_ids.clear_id_index()
+                start = time.perf_counter()
+                index = student_ids.load_id_index(path)
+                load_seconds = time.perf_counter() - start
+                student_ids.clear_id_index()
+
+                layout = "ranges" if compact else "nested"
+                print(f"{label + ' ' + layout:<46} {len(index):>8} IDs  {os.path.getsize(path):>11,} bytes  "
+                      f"generate {generate_seconds:7.3f} s  load {load_seconds:7.3f} s")
+
+
+# Function to list every way the room tree and the bookings disagree (empty when they are consistent)
+def consistency_errors(hostels, bookings):
+    errors = []
+    seen = {}
+    for hostel_name, info in hostels.items():
+        for floor, rooms in info["floors"].items():
+            for room, room_data in rooms.items():
+                key = (hostel_name, floor, room)
+                if len(room_data["occupants"]) > room_data["capacity"]:
+                    errors.append(f"{key} is over capacity")
+                for occupant in room_data["occupants"]:
+                    if occupant["id"] in seen:
+                        errors.append(f"{occupant['id']} is in {seen[occupant['id']]} and {key}")
+                    seen[occupant["id"]] = key
+    store = bookings if isinstance(bookings, BookingStore) else BookingStore(bookings)
+    for booking in store:
+        key = BookingStore.room_key(booking)
+        if seen.pop(booking["student_id"], None) != key:
+            errors.append(f"{booking['student_id']} is booked into {key} but not listed there")
+        if not store.is_in_room(booking["student_id"], *key) or \
+                booking["student_id"] not in store.by_hostel.get(booking["hostel_name"], {}):
+            errors.append(f"{booking['student_id']} is missing from the hostel/room indexes")
+    errors += [f"{student_id} occupies {key} without a booking" for student_id, key in seen.items()]
+    if sum(len(room_bookings) for room_bookings in store.by_room.values()) != len(store):
+        errors.append("The room index holds stale bookings")
+    return errors
+
+
+# Function to snapshot which students sit in which room
+def room_occupants(hostels):
+    return {(hostel_name, floor, room): sorted(occupant["id"] for occupant in room_data["occupants"])
+            for hostel_name, info in hostels.items() for floor, rooms in info["floors"].items()
+            for room, room_data in rooms.items()}
+
+
+# Benchmark: thousands of random book/cancel/transfer operations on every backend, inline and through the
+# persistence worker, then hostel_data/student_bookings are reloaded and compared
+# (tests/test_consistency.py fails on any inconsistency)
+def bench_consistency(operations=3000, seed=17):
+    ids = all_student_ids()
+    for kind in ("memory", "json", "journal", "sqlite", "sharded"):
+        # MemoryStorage writes straight into the rooms it is handed and has no stored copy to re-check a
+        # queued write against, so it only runs inline
+        for mode in ("inline",) if kind == "memory" else ("inline", "worker"):
+            with tempfile.TemporaryDirectory() as directory:
+                def open_backend():
+                    data_file = os.path.join(directory, "hostel_data.json")
+                    bookings_file = os.path.join(directory, "student_bookings.json")
+                    if kind == "sqlite":
+                        return storage.SqliteStorage(os.path.join(directory, "hostel_data.db"))
+                    if kind == "journal":
+                        return storage.JournalStorage(data_file, bookings_file,
+                                                      os.path.join(directory, "hostel_journal.jsonl"))
+                    if kind == "json":
+                        return storage.JsonStorage(data_file, bookings_file)
+                    if kind == "sharded":
+                        return storage.ShardedStorage(os.path.join(directory, "hostel_shards"))
+                    return memory
+
+                memory = storage.MemoryStorage(make_hostels(6, floors=2, rooms=5, capacity=3))
+                backend = open_backend()
+                if kind != "memory":
+                    backend.save_hostels(make_hostels(6, floors=2, rooms=5, capacity=3))
+                engine = HostelEngine(backend)
+                callbacks = queue.SimpleQueue()
+                worker = engine.start_worker(callbacks.put) if mode == "worker" else None
+                rooms = [(hostel, floor, room) for hostel, info in engine.hostels.items()
+                         for floor, floor_rooms in info["floors"].items() for room in floor_rooms]
+                students = ids[:len(rooms) * 2]  # Twice as many students as rooms, so rooms fill up
+                rng = random.Random(seed)
+                done = {"book": 0, "cancel": 0, "transfer": 0, "rejected": 0}
+
+                def finished(error):
+                    if error is not None:
+                        done["rejected"] += 1
+
+                start = time.perf_counter()
+                for i in range(operations):
+                    student_id = rng.choice(students)
+                    operation = "book" if student_id not in engine.bookings else rng.choice(["cancel", "transfer"])
+                    try:
+                        if operation == "book":
+                            engine.submit_booking(*rng.choice(rooms), student_id, f"Student {i}", done=finished)
+                        elif operation == "cancel":
+                            engine.submit_cancel(student_id, done=finished)
+                        else:
+                            engine.submit_transfer(student_id, *rng.choice(rooms), done=finished)
+                        done[operation] += 1
+                    except storage.BookingError:
+                        done["rejected"] += 1
+                    if worker is not None and i % 50 == 49:
+                        worker.flush()
+                    while not callbacks.empty():
+                        callbacks.get()()
+                if worker is not None:
+                    worker.flush()
+                    while not callbacks.empty():
+                        callbacks.get()()
+                seconds = time.perf_counter() - start
+
+                errors = consistency_errors(engine.hostels, engine.bookings)
+                expected = room_occupants(engine.hostels)
+                engine.close()
+                reloaded = HostelEngine(open_backend())
+                errors += consistency_errors(reloaded.hostels, reloaded.storage.load_bookings())
+                if room_occupants(reloaded.hostels) != expected:
+                    errors.append("Stored rooms differ from the rooms in memory")
+                reloaded.close()
+
+                report(f"book/cancel/transfer ({kind}, {mode})", seconds, operations)
+                print(f"{'':<40} {done['book']} booked, {done['cancel']} cancelled, "
+                      f"{done['transfer']} transferred, {done['rejected']} rejected, {len(errors)} inconsistencies")
+
+
+# Benchmark: one booking, written through the backend, with one file for every hostel vs. one file per
+# hostel; the sharded cost should stay flat as the hostel count grows
+def bench_shards(bookings=20):
+    ids = all_student_ids()
+    for count in (10, 100, 1000):
+        with tempfile.TemporaryDirectory() as directory:
+            source = storage.JsonStorage(os.path.join(directory, "hostel_data.json"),
+                                         os.path.join(directory, "student_bookings.json"))
+            source.save_hostels(make_hostels(count))
+            start = time.perf_counter()
+            sharded = storage.ShardedStorage(os.path.join(directory, "hostel_shards"))
+            storage.migrate(source, sharded)
+            print(f"{'convert ' + str(count) + ' hostels to shards':<40} {time.perf_counter() - start:8.4f} s")
+
+            for kind, backend in (("json", source), ("sharded", sharded)):
+                engine = HostelEngine(backend, lazy=True)
+                hostel = next(iter(engine.hostels))
+                rooms = [(hostel, floor, room) for floor, floor_rooms in engine.hostels[hostel]["floors"].items()
+                         for room in floor_rooms]
+                metrics.enable()
+                metrics.reset()
+                start = time.perf_counter()
+                for i in range(bookings):
+                    engine.book(*rooms[i % len(rooms)], ids[i], f"Student {i}")
+                seconds = time.perf_counter() - start
+                written = dict(metrics.counter_rows()).get("bytes_written", 0)
+                metrics.disable()
+                metrics.reset()
+                engine.close()
+                report(f"book ({kind}, {count} hostels)", seconds, bookings)
+                print(f"{'':<40} {written / bookings / 1024:10.1f} KiB written per booking")
+
+            reloaded = storage.ShardedStorage(os.path.join(directory, "hostel_shards"))
+            assert len(reloaded.load_bookings()) == bookings
+            assert room_occupants(reloaded.load_hostels()) == room_occupants(source.load_hostels())
+            reloaded.close()
+
+
+# Function to list the students who would rather have a hostel that has room for them or that holds a
+# later student (empty when a matching is stable)
+def blocking_students(preferences, capacities, assignment):
+    counts = [0] * len(capacities)
+    latest = [-1] * len(capacities)
+    for student, hostel in enumerate(assignment):
+        if hostel >= 0:
+            counts[hostel] += 1
+            latest[hostel] = max(latest[hostel], student)
+    blocking = []
+    for student, choices in enumerate(preferences):
+        for hostel in choices:
+            if hostel == assignment[student]:
+                break
+            if counts[hostel] < capacities[hostel] or latest[hostel] > student:
+                blocking.append(student)
+                break
+    return blocking
+
+
+# Benchmark: 50,000 students with ranked preferences placed into 500 hostels by deferred acceptance,
+# matched in one process vs. one process per category, then stored with one bulk commit
+def bench_allocation(students=50000, hostel_count=500, choices=20):
+    departments = ["732", "733", "734", "735", "736", "737", "748"]
+    ids = [f"1602-{year:02d}-{department}-{unique_id:03d}"
+           for year in range(10, 20) for department in departments for unique_id in range(1, 1000)][:students]
+    hostels = make_hostels(hostel_count, floors=5, rooms=10, capacity=3)  # 150 beds each, so popular hostels fill up
+    for h, info in enumerate(hostels.values()):
+        for rooms in info["floors"].values():
+            for room_data in rooms.values():
+                room_data.update(veg_price=2000 + h % 7 * 100, non_veg_price=2500 + h % 5 * 150)
+    rng = random.Random(21)
+    names = {category: [hostel for hostel, info in hostels.items() if info["category"] in allowed]
+             for category, allowed in allocation.HOSTELS_FOR.items()}
+    rows = []
+    for i, student_id in enumerate(ids):
+        category = "Boys" if i % 2 else "Girls"
+        nearest = sorted(names[category], key=lambda hostel: hostels[hostel]["distance"] + rng.random() * 10)
+        meal = rng.choice([None, "Veg", "Non-Veg"])
+        rows.append((i + 2, student_id, f"Student {i}", category, nearest[:choices], meal,
+                     rng.choice([None, 2500.0, 3200.0]) if meal else None))
+
+    with tempfile.TemporaryDirectory() as directory:
+        ids_file = os.path.join(directory, "college_ids.json")
+        with open(ids_file, "w") as file:
+            json.dump({"synthetic": {"all": ids}}, file)
+        backend = storage.SqliteStorage(os.path.join(directory, "hostel_data.db"))
+        backend.save_hostels(hostels)
+        engine = HostelEngine(backend, ids_file)
+
+        start = time.perf_counter()
+        partitions, errors = allocation.build_partitions(engine, rows)
+        report("check rows and build partitions", time.perf_counter() - start, students)
+        jobs = [([student[4] for student in partition[0]],
+                 [sum(free for floor, room, free in rooms) for rooms in partition[2]])
+                for partition in partitions.values()]
+        start = time.perf_counter()
+        inline = [allocation.deferred_acceptance(*job) for job in jobs]
+        report("deferred acceptance, 1 process", time.perf_counter() - start, students)
+        start = time.perf_counter()
+        with concurrent.futures.ProcessPoolExecutor(len(jobs)) as pool:
+            pooled = list(pool.map(allocation.deferred_acceptance, *zip(*jobs)))
+        report(f"deferred acceptance, {len(jobs)} processes", time.perf_counter() - start, students)
+        assert pooled == inline
+        for job, assignment in zip(jobs, inline):
+            assert not blocking_students(*job, assignment)
+
+        start = time.perf_counter()
+        booked, unplaced, errors = allocation.allocate(engine, rows)
+        report("allocate + one bulk commit (sqlite)", time.perf_counter() - start, students)
+        engine.close()
+
+        reloaded = HostelEngine(storage.SqliteStorage(os.path.join(directory, "hostel_data.db")), ids_file)
+        assert not consistency_errors(reloaded.hostels, reloaded.bookings)
+        assert all(len(room_data["occupants"]) <= room_data["capacity"] for info in reloaded.hostels.values()
+                   for rooms in info["floors"].values() for room_data in rooms.values())
+        assert len(reloaded.bookings) == len(booked) == students - len(unplaced) - len(errors)
+        reloaded.close()
+        print(f"{'':<40} {len(booked)} placed, {len(unplaced)} without a bed, {len(errors)} rejected, stable")
+
+
+# Benchmark: a booking at one desk reaching another desk's open windows as a single-room delta, per backend
+def bench_change_feed(bookings=200, interval=0.02):
+    ids = all_student_ids()
+    for kind in ("json", "journal", "sqlite", "sharded"):
+        with tempfile.TemporaryDirectory() as directory:
+            def open_backend():
+                data_file = os.path.join(directory, "hostel_data.json")
+                bookings_file = os.path.join(directory, "student_bookings.json")
+                if kind == "sqlite":
+                    return storage.SqliteStorage(os.path.join(directory, "hostel_data.db"))
+                if kind == "journal":
+                    return storage.JournalStorage(data_file, bookings_file,
+                                                  os.path.join(directory, "hostel_journal.jsonl"))
+                if kind == "sharded":
+                    return storage.ShardedStorage(os.path.join(directory, "hostel_shards"))
+                return storage.JsonStorage(data_file, bookings_file)
+
+            backend = open_backend()
+            backend.save_hostels(make_hostels(50))
+            backend.close()
+            desk, watcher = HostelEngine(open_backend()), HostelEngine(open_backend())
+            callbacks = queue.SimpleQueue()
+            tailer = watcher.start_tailer(callbacks.put, interval)
+            while tailer.stamp is None:
+                time.sleep(interval)  # First poll only records what is stored
+            seen = {}
+            watcher.feed.subscribe(lambda deltas: seen.update((delta, time.perf_counter()) for delta in deltas))
+            rooms = [(hostel, floor, room) for hostel, info in desk.hostels.items()
+                     for floor, floor_rooms in info["floors"].items() for room in floor_rooms]
+
+            latencies = []
+            for i in range(bookings):
+                key = rooms[i * 7 % len(rooms)]
+                desk.book(*key, ids[i], f"Student {i}")
+                stored = time.perf_counter()
+                while ("room",) + key not in seen:
+                    try:
+                        callbacks.get(timeout=1)()
+                    except queue.Empty:
+                        raise AssertionError(f"{kind}: no delta for {key}")
+                latencies.append(seen.pop(("room",) + key) - stored)
+            extra = len(seen)
+            desk.close()
+            watcher.close()
+
+            assert room_occupants(watcher.hostels) == room_occupants(desk.hostels)
+            assert not consistency_errors(watcher.hostels, watcher.bookings)
+            latencies.sort()
+            print(f"{'booking seen at another desk (' + kind + ')':<40} {bookings:>10} ops  "
+                  f"p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms  "
+                  f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.1f} ms  {extra} other deltas")
+
+
+# Benchmark: roll-number, name, typo and hostel queries on 100,000 bookings, plus index upkeep per change
+def bench_search(bookings=100000):
+    first_names = ["Badri", "Aarav", "Priya", "Sneha", "Rahul", "Kiran", "Meera", "Arjun", "Divya", "Rohan",
+                   "Ananya", "Vikram", "Lakshmi", "Suresh", "Farhan", "Neha", "Karthik", "Pooja", "Sai", "Ishaan"]
+    last_names = ["Narayan", "Reddy", "Sharma", "Iyer", "Khan", "Rao", "Gupta", "Naidu", "Patel", "Varma",
+                  "Menon", "Das", "Joshi", "Kumar", "Pillai", "Singh", "Bose", "Chari", "Goud", "Verma"]
+    departments = ["732", "733", "734", "735", "736", "737", "748"]
+    ids = [f"1602-{year:02d}-{department}-{unique_id:03d}"
+           for year in range(10, 25) for department in departments for unique_id in range(1, 1000)][:bookings]
+    rng = random.Random(5)
+    store = BookingStore([{"student_id": student_id,
+                           "student_name": f"{rng.choice(first_names)} {chr(65 + i % 26)} {rng.choice(last_names)}",
+                           "hostel_name": f"Hostel {i % 500}", "floor": f"Floor {i % 5 + 1}",
+                           "room": f"Room {i % 20 + 1}"} for i, student_id in enumerate(ids)])
+
+    start = time.perf_counter()
+    index = SearchIndex(store)
+    print(f"{'build search index (' + str(len(store)) + ' bookings)':<40} {time.perf_counter() - start:8.4f} s")
+
+    queries = ["1602-23-737", "1602-23-737-1*", "1602-1", "badri", "Badri Nar", "Bardi", "Lakshmi Pilai",
+               "sn", "Hostel 42", "Hostel 42 / Floor 3 / Room 7"]
+    for query in queries:
+        number = 50
+        times = []
+        for _ in range(number):
+            started = time.perf_counter()
+            results = index.search(query)
+            times.append(time.perf_counter() - started)
+        print(f"{'search ' + repr(query):<40} {len(results):>6} hits  mean {sum(times) / number * 1000:7.3f} ms"
+              f"  max {max(times) * 1000:7.3f} ms")
+
+    number = 2000
+    moves = [store.find(ids[i * 37 % len(ids)]) for i in range(number)]
+    start = time.perf_counter()
+    for booking in moves:
+        store.move(dict(booking, hostel_name="Hostel 0", floor="Floor 1", room="Room 1"))
+    report("transfer with search index upkeep", time.perf_counter() - start, number)
+    assert index.search("1602-23-737") == sorted(student_id for student_id in store.by_student
+                                                  if student_id.startswith("1602-23-737"))
+
+
+# Benchmark: cost of the instrumentation per booking when it is off, on, and on with cProfile dumps
+def bench_metrics(bookings=3000):
+    ids = all_student_ids()
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ("off", "on", "on + cProfile"):
+            metrics.disable()
+            metrics.reset()
+            if mode != "off":
+                metrics.enable(os.path.join(directory, "profiles") if "cProfile" in mode else None)
+            engine = HostelEngine(storage.MemoryStorage(make_hostels(100)))
+            rooms = [(hostel, floor, room) for hostel, info in engine.hostels.items()
+                     for floor, floor_rooms in info["floors"].items() for room in floor_rooms]
+            count = bookings // 10 if "cProfile" in mode else bookings
+            start = time.perf_counter()
+            for i in range(count):
+                engine.book(*rooms[i % len(rooms)], ids[i], f"Student {i}")
+            report(f"book (metrics {mode})", time.perf_counter() - start, count)
+        metrics.dump(os.path.join(directory, "metrics.prom"))
+        metrics.dump(os.path.join(directory, "metrics.json"))
+        with open(os.path.join(directory, "metrics.json")) as file:
+            dumped = json.load(file)
+        profiles = len(os.listdir(os.path.join(directory, "profiles")))
+        print(f"{'':<40} {len(dumped['latency'])} operations, counters {dumped['counters']}, {profiles} profiles")
+        metrics.disable()
+        metrics.reset()
+
+    number = 1000000
+    noop = metrics.timed("noop")(lambda: None)
+    seconds = timeit.timeit(noop, number=number) - timeit.timeit(lambda: None, number=number)
+    report("timed() wrapper while off", seconds, number)
+
+
+# Function to write a data file of count hostels in the older shapes, one hostel at a time: new_hostel.py
+# occupants, Hostel_final.py occupants with per-room prices, bare IDs, capacities stored as text, and every
+# 50th hostel carrying a damaged room. Returns the number of damaged rooms written.
+def write_legacy_file(path, count, floors=5, rooms=20, capacity=4):
+    damaged = 0
+    student = 0
+    with open(path, "w") as file:
+        file.write("{")
+        for h in range(count):
+            info = {"distance": round(0.5 + (h * 37 % 100) / 10, 1), "category": ["Boys", "Girls", "Mixed"][h % 3],
+                    "floors": {}}
+            for f in range(floors):
+                floor_rooms = info["floors"][f"Floor {f + 1}"] = {}
+                for r in range(rooms):
+                    occupants = []
+                    for _ in range(r % (capacity + 1)):
+                        student += 1
+                        student_id = f"S{student:07d}"  # The schema check does not look at the ID format
+                        occupants.append({"id": student_id, "name": f"Student {student}"} if h % 3 == 0 else
+                                         {"id": student_id, "meal": "Veg"} if h % 3 == 1 else student_id)
+                    room_data = {"status": "available", "capacity": str(capacity) if r % 7 == 0 else capacity,
+                                 "occupants": occupants}
+                    if h % 3 == 1:
+                        room_data.update(veg_price=2500, non_veg_price="3000")
+                    floor_rooms[f"Room {r + 1}"] = room_data
+            if h % 50 == 49:
+                info["floors"]["Floor 1"]["Room 1"] = {"status": "available", "capacity": 0, "occupants": "full"}
+                info["floors"]["Floor 1"]["Room 2"]["occupants"].append({"name": "No ID"})
+                damaged += 3  # Capacity, occupants not a list, occupant without an ID
+            file.write(("," if h else "") + f"\n    {json.dumps(f'Hostel {h}')}: {json.dumps(info, indent=4)}")
+        file.write("\n}")
+    return damaged
+
+
+# Benchmark: the streaming schema migration keeps its peak memory flat as the data file grows,
+# while json.load needs the whole tree; the output matches migrating the loaded tree in memory
+def bench_schema(sizes=(100, 500, 2500)):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "hostel_data.json")
+        for count in sizes:
+            damaged = write_legacy_file(path, count)
+            megabytes = os.path.getsize(path) / 1e6
+            if count == sizes[0]:
+                tracemalloc.start()
+                with open(path, "r") as file:
+                    expected, problems = schema.check_hostels(json.load(file))
+                load_peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                expected = json.dumps(expected, indent=4)
+                print(f"{'json.load + check (' + str(count) + ' hostels)':<40} {megabytes:8.1f} MB file"
+                      f"  {load_peak / 1e6:8.1f} MB peak")
+
+            tracemalloc.start()
+            hostel_count, room_count, changed, problems = schema.migrate_file(
+                path, path + ".out", check_only=True, workers=1)
+            stream_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            assert len(problems) == damaged
+            print(f"{'stream check (' + str(count) + ' hostels)':<40} {megabytes:8.1f} MB file"
+                  f"  {stream_peak / 1e6:8.1f} MB peak  {len(problems)} problems")
+
+            for workers in (1, 2):
+                start = time.perf_counter()
+                schema.migrate_file(path, path + ".out", workers=workers)
+                report(f"migrate {count} hostels ({workers} process{'es' if workers > 1 else ''})",
+                       time.perf_counter() - start, hostel_count)
+            if count == sizes[0]:
+                with open(path + ".out", "r") as file:
+                    assert file.read() == expected  # Same bytes as json.dump of the migrated tree
+                schema.migrate_file(path, path + ".out", workers=1, chunk_size=4096)  # Values across many chunks
+                with open(path + ".out", "r") as file:
+                    assert file.read() == expected
+
+
+BENCHMARKS = {
+    "ids": bench_id_lookup,
+    "bookings": bench_booking_store,
+    "desks": bench_desk_contention,
+    "engine": bench_engine,
+    "worker": bench_worker,
+    "startup": bench_startup,
+    "analytics": bench_analytics,
+    "bulk": bench_bulk_import,
+    "freebeds": bench_free_beds,
+    "rollnumbers": bench_roll_numbers,
+    "consistency": bench_consistency,
+    "search": bench_search,
+    "metrics": bench_metrics,
+    "shards": bench_shards,
+    "allocation": bench_allocation,
+    "feed": bench_change_feed,
+    "schema": bench_schema,
+}
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
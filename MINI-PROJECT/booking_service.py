@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import contextlib
+import json
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import metrics
+from hostel_engine import BookingError, HostelEngine
+from storage import BookingConflict, open_storage
+
+HOST = "127.0.0.1"
+PORT = 8080
+MAX_BODY = 64 * 1024  # Largest request body accepted, in bytes
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class BookingService:
+    # The HostelManagementSystem/RoomWindow operations as JSON endpoints over one HostelEngine:
+    #   GET    /hostels                          hostel list with free beds
+    #   GET    /hostels/<hostel>/rooms[?floor=]  room rows
+    #   POST   /bookings                         {"hostel", "floor", "room", "student_id", "name"[, "meal"]}
+    #   GET    /bookings/<student_id>            look up a booking
+    #   PUT    /bookings/<student_id>            move a booking: {"hostel", "floor", "room"}
+    #   DELETE /bookings/<student_id>            cancel a booking
+    # Validation runs on the event loop; writes go through the engine's persistence worker. Requests for
+    # the same room hold that room's lock until their write is stored, so they are answered in order.
+    def __init__(self, engine):
+        self.engine = engine
+        self.room_locks = {}  # (hostel, floor, room) -> asyncio.Lock
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self.engine.start_worker(lambda callback: loop.call_soon_threadsafe(callback))
+        self.engine.start_tailer(lambda callback: loop.call_soon_threadsafe(callback))  # Other desks' bookings
+
+    def room_lock(self, hostel_name, floor, room):
+        return self.room_locks.setdefault((hostel_name, floor, room), asyncio.Lock())
+
+    # Function to wait for a queued write; the worker reports back through done(error)
+    async def stored(self, submit, *args, **kwargs):
+        future = asyncio.get_running_loop().create_future()
+
+        def done(error):
+            if future.done():
+                return
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+        result = submit(*args, done=done, **kwargs)
+        await future
+        return result
+
+    async def dispatch(self, method, path, query, body):
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+        if parts == ["hostels"]:
+            self.allow(method, "GET")
+            return 200, [{"name": name, "distance": distance, "category": category,
+                          "free_beds": self.engine.free_beds.free_beds(name)}
+                         for name, distance, category in self.engine.list_hostels()]
+        if len(parts) == 3 and parts[0] == "hostels" and parts[2] == "rooms":
+            self.allow(method, "GET")
+            return 200, self.list_rooms(parts[1], query.get("floor", [None])[0])
+        if parts == ["bookings"]:
+            self.allow(method, "POST")
+            return 201, await self.book(self.parse_body(body))
+        if len(parts) == 2 and parts[0] == "bookings":
+            self.allow(method, "GET", "PUT", "DELETE")
+            if method == "GET":
+                booking = self.engine.find_booking(parts[1])
+                if booking is None:
+                    raise HttpError(404, "No booking found for this Student ID.")
+                return 200, booking
+            if method == "PUT":
+                return 200, await self.transfer(parts[1], self.parse_body(body))
+            return 200, await self.cancel(parts[1])
+        raise HttpError(404, f"No endpoint at {path}")
+
+    @staticmethod
+    def allow(method, *methods):
+        if method not in methods:
+            raise HttpError(405, f"Use {' or '.join(methods)} here")
+
+    # Function to check that every field is present and a non-empty string; raises HttpError(400)
+    @staticmethod
+    def require(data, fields):
+        missing = [field for field in fields if not data.get(field)]
+        if missing:
+            raise HttpError(400, f"Missing fields: {', '.join(missing)}")
+        wrong = [field for field in fields if not isinstance(data[field], str)]
+        if wrong:
+            raise HttpError(400, f"Fields must be strings: {', '.join(wrong)}")
+
+    @staticmethod
+    def parse_body(body):
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise HttpError(400, "Body must be JSON")
+        if not isinstance(data, dict):
+            raise HttpError(400, "Body must be a JSON object")
+        return data
+
+    def list_rooms(self, hostel_name, floor):
+        if hostel_name not in self.engine.hostels:
+            raise HttpError(404, f"{hostel_name} does not exist!")
+        floors = [floor] if floor is not None else self.engine.list_floors(hostel_name)
+        rows = []
+        for floor_name in floors:
+            if floor_name not in self.engine.hostels[hostel_name]["floors"]:
+                raise HttpError(404, f"{hostel_name} / {floor_name} does not exist!")
+            for room, status, booked, remaining, capacity in self.engine.list_rooms(hostel_name, floor_name):
+                rows.append({"floor": floor_name, "room": room, "status": status, "booked": booked,
+                             "remaining": remaining, "capacity": capacity})
+        return rows
+
+    async def book(self, data):
+        self.require(data, ("hostel", "floor", "room", "student_id", "name"))
+        hostel_name, floor, room = data["hostel"], data["floor"], data["room"]
+        if room not in self.engine.hostels.get(hostel_name, {"floors": {}})["floors"].get(floor, {}):
+            raise HttpError(404, f"{hostel_name} / {floor} / {room} does not exist!")
+        async with self.room_lock(hostel_name, floor, room):
+            return await self.stored(self.engine.submit_booking, hostel_name, floor, room, data["student_id"],
+                                     data["name"], data.get("meal"))
+
+    async def cancel(self, student_id):
+        booking = self.engine.find_booking(student_id)
+        if booking is None:
+            raise HttpError(404, "No booking found for this Student ID.")
+        async with self.room_lock(booking["hostel_name"], booking["floor"], booking["room"]):
+            return await self.stored(self.engine.submit_cancel, student_id)
+
+    # Both rooms stay locked until the move is stored; locks are taken in a fixed order
+    async def transfer(self, student_id, data):
+        self.require(data, ("hostel", "floor", "room"))
+        booking = self.engine.find_booking(student_id)
+        if booking is None:
+            raise HttpError(404, "No booking found for this Student ID.")
+        target = (data["hostel"], data["floor"], data["room"])
+        if target[2] not in self.engine.hostels.get(target[0], {"floors": {}})["floors"].get(target[1], {}):
+            raise HttpError(404, f"{target[0]} / {target[1]} / {target[2]} does not exist!")
+        source = (booking["hostel_name"], booking["floor"], booking["room"])
+        async with contextlib.AsyncExitStack() as locks:
+            for key in sorted({source, target}):
+                await locks.enter_async_context(self.room_lock(*key))
+            return await self.stored(self.engine.submit_transfer, student_id, *target)
+
+    async def respond(self, method, target, body):
+        url = urlsplit(target)
+        try:
+            return await self.dispatch(method, url.path, parse_qs(url.query), body)
+        except HttpError as error:
+            return error.status, {"error": str(error)}
+        except BookingConflict as error:
+            return 409, {"error": str(error)}
+        except BookingError as error:
+            return 400, {"error": str(error)}
+        except Exception as error:
+            return 500, {"error": f"{type(error).__name__}: {error}"}
+
+    # One HTTP/1.1 connection; requests are answered in order and the connection is kept alive
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.write_response(writer, 400, {"error": "Malformed request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = headers.get("content-length") or "0"
+                if not (length.isascii() and length.isdigit()):
+                    await self.write_response(writer, 400, {"error": "Content-Length must be a whole number"}, False)
+                    break
+                length = int(length)
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                if length > MAX_BODY:
+                    await self.write_response(writer, 413, {"error": "Request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.respond(method.upper(), target, body)
+                await self.write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def write_response(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(engine, host=HOST, port=PORT, ready=None):
+    service = BookingService(engine)
+    service.start()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    if ready is not None:
+        ready(server)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the booking operations as a local HTTP/JSON API.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--storage", help="json, sqlite, journal, sharded or memory (default: HOSTEL_STORAGE or json)")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.configure(args)
+
+    engine = HostelEngine(open_storage(args.storage), lazy=True)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(serve(engine, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()  # Stores any queued writes
+        if args.metrics_file:
+            metrics.dump(args.metrics_file)
@@ -0,0 +1,69 @@
+class BookingStore:
+    # Keeps student bookings with hash indexes by student, by hostel and by (hostel, floor, room)
+    def __init__(self, bookings=None):
+        self.by_student = {}  # student_id -> booking (insertion ordered, so it doubles as the list)
+        self.by_hostel = {}  # hostel_name -> {student_id: booking}
+        self.by_room = {}  # (hostel_name, floor, room) -> {student_id: booking}
+        self.watchers = []  # Objects with added(booking) / cancelled(booking), e.g. search.SearchIndex
+        for booking in bookings or []:
+            self.add(booking)
+
+    def __len__(self):
+        return len(self.by_student)
+
+    def __iter__(self):
+        return iter(self.by_student.values())
+
+    def __contains__(self, student_id):
+        return student_id in self.by_student
+
+    @staticmethod
+    def room_key(booking):
+        return (booking["hostel_name"], booking["floor"], booking["room"])
+
+    def add(self, booking):
+        student_id = booking["student_id"]
+        if student_id in self.by_student:
+            raise ValueError(f"Student {student_id} has already booked a room")
+        self.by_student[student_id] = booking
+        self.by_hostel.setdefault(booking["hostel_name"], {})[student_id] = booking
+        self.by_room.setdefault(self.room_key(booking), {})[student_id] = booking
+        for watcher in self.watchers:
+            watcher.added(booking)
+
+    def cancel(self, student_id):
+        booking = self.by_student.pop(student_id, None)
+        if booking is None:
+            return None
+        hostel_bookings = self.by_hostel[booking["hostel_name"]]
+        del hostel_bookings[student_id]
+        if not hostel_bookings:
+            del self.by_hostel[booking["hostel_name"]]
+        key = self.room_key(booking)
+        room_bookings = self.by_room[key]
+        del room_bookings[student_id]
+        if not room_bookings:
+            del self.by_room[key]
+        for watcher in self.watchers:
+            watcher.cancelled(booking)
+        return booking
+
+    # Function to swap a student's booking for one in another room, updating every index in O(1)
+    def move(self, booking):
+        self.cancel(booking["student_id"])
+        self.add(booking)
+
+    def find(self, student_id):
+        return self.by_student.get(student_id)
+
+    def for_hostel(self, hostel_name):
+        return list(self.by_hostel.get(hostel_name, {}).values())
+
+    def for_room(self, hostel_name, floor, room):
+        return list(self.by_room.get((hostel_name, floor, room), {}).values())
+
+    def is_in_room(self, student_id, hostel_name, floor, room):
+        return student_id in self.by_room.get((hostel_name, floor, room), {})
+
+    def to_list(self):
+        return list(self.by_student.values())
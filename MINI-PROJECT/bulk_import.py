@@ -0,0 +1,83 @@
+import argparse
+import csv
+import sys
+
+from hostel_engine import HostelEngine
+from storage import BookingConflict, BookingError
+
+CSV_COLUMNS = ["student_id", "name", "hostel", "floor", "room"]
+
+
+# Function to find what is wrong with the shape of one DictReader row (None when nothing is): a short row
+# leaves None in its last columns, a long one puts the extra values in a list under the None key
+def row_problem(row, columns):
+    if any(value.strip() for value in row.get(None) or []):
+        return "Row has more fields than the header!"
+    missing = [column for column in columns if row.get(column) is None]
+    if missing:
+        return f"Row is missing: {', '.join(missing)}!"
+    return None
+
+
+# Function to stream (row_number, student_id, name, hostel, floor, room) tuples out of a CSV file;
+# malformed rows are skipped and reported in errors as (row_number, student_id, message)
+def read_rows(file, errors):
+    reader = csv.DictReader(file)
+    missing = [column for column in CSV_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+    for row in reader:
+        problem = row_problem(row, CSV_COLUMNS)
+        if problem:
+            errors.append((reader.line_num, (row.get("student_id") or "").strip(), problem))
+            continue
+        yield (reader.line_num, row["student_id"].strip(), row["name"].strip(), row["hostel"].strip(),
+               row["floor"].strip(), row["room"].strip())
+
+
+# Function to import a CSV of allotments; returns (bookings made, per-row errors). A strict import books
+# nothing, and raises BookingConflict if another desk got in the way
+def import_csv(engine, path, strict=False, dry_run=False):
+    errors = []
+    with open(path, "r", newline="") as file:
+        entries, row_numbers, row_errors = engine.validate_rows(read_rows(file, errors))
+    errors = sorted(errors + row_errors, key=lambda error: error[0])
+    if dry_run or (strict and errors):
+        return [], errors
+    try:
+        return engine.book_many(entries), errors
+    except BookingConflict:
+        if strict:
+            raise
+    # Another desk changed a room or booked a student since the rows were checked; store them one by one
+    # so only the affected rows are rejected
+    booked = []
+    for row_number, entry in zip(row_numbers, entries):
+        try:
+            booked += engine.book_many([entry])
+        except BookingError as error:
+            errors.append((row_number, entry[3]["id"], str(error)))
+    return booked, sorted(errors, key=lambda error: error[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Book many students at once from a CSV of "
+                                                 "student_id,name,hostel,floor,room rows.")
+    parser.add_argument("csv_file")
+    parser.add_argument("--strict", action="store_true", help="book nothing if any row is invalid")
+    parser.add_argument("--dry-run", action="store_true", help="only validate, do not book")
+    args = parser.parse_args()
+
+    engine = HostelEngine()
+    try:
+        booked, errors = import_csv(engine, args.csv_file, args.strict, args.dry_run)
+    except BookingConflict as error:
+        print(f"Nothing booked: {error}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        engine.close()
+
+    for row_number, student_id, message in errors:
+        print(f"line {row_number}: {student_id}: {message}", file=sys.stderr)
+    print(f"Booked {len(booked)} students, {len(errors)} rows rejected")
+    sys.exit(1 if errors else 0)
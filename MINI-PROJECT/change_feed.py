@@ -0,0 +1,113 @@
+import logging
+import threading
+
+import metrics
+
+POLL_INTERVAL = 0.5  # Seconds between looks at the shared data for changes made at other desks
+
+log = logging.getLogger(__name__)
+
+
+class ChangeFeed:
+    # In-process event bus for fine-grained deltas: ("room", hostel, floor, room) when a room's occupants
+    # changed and ("hostel", hostel) when a hostel was added. Publishing is thread-safe and cheap while
+    # nobody listens. With schedule (root.after for Tk) deltas published in a burst are collected and
+    # handed to every subscriber as one de-duplicated list on the subscriber's thread; without it they
+    # are delivered at once.
+    def __init__(self, schedule=None):
+        self.schedule = schedule
+        self.subscribers = []
+        self.pending = {}  # delta -> None, in publish order
+        self.lock = threading.Lock()
+
+    # Function to register callback(deltas); returns callback so it can be passed to unsubscribe later
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def publish(self, *delta):
+        if not self.subscribers:
+            return
+        with self.lock:
+            first = not self.pending
+            self.pending[delta] = None
+        if self.schedule is None:
+            self.deliver()
+        elif first:
+            self.schedule(self.deliver)  # Later deltas join this delivery until it runs
+
+    def deliver(self):
+        with self.lock:
+            deltas, self.pending = list(self.pending), {}
+        if not deltas:
+            return
+        metrics.count("deltas_delivered", len(deltas))
+        for callback in list(self.subscribers):
+            callback(deltas)
+
+
+class ChangeTailer:
+    # Polls the storage backend for changes other desks (or processes) stored and hands them to
+    # apply(new_hostels, rooms) through schedule, on the caller's thread. The backend compares a cheap
+    # stamp (file mtimes, SQLite data_version) first and only reads the data again when it moved; it
+    # returns just the hostels this tailer has not seen and the rooms whose version differs from the one
+    # seen last. The first poll only records what is stored.
+    def __init__(self, storage, apply, schedule, interval=POLL_INTERVAL):
+        self.storage = storage
+        self.apply = apply
+        self.schedule = schedule
+        self.interval = interval
+        self.stamp = None
+        self.known_hostels = set()
+        self.versions = {}  # (hostel, floor, room) -> version last read from storage
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def _run(self):
+        try:
+            self.poll(publish=False)
+        except Exception:
+            # The next poll records it instead; hostels the engine already has are skipped when applied
+            self._failed()
+        while not self.stopped.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                self._failed()  # A file caught mid-replace or a busy database; the next poll picks it up
+
+    # Function to count and log a poll that raised; the tailer keeps running, so a backend that keeps
+    # failing shows up as a growing tail_errors counter instead of a silent stop
+    def _failed(self):
+        metrics.count("tail_errors")
+        log.warning("Reading changes from other desks failed; retrying on the next poll", exc_info=True)
+
+    # Function to read what changed since the last poll; returns the number of changed rooms
+    @metrics.timed("tail_poll")
+    def poll(self, publish=True):
+        self.stamp, new_hostels, rooms = self.storage.read_changes(self.stamp, self.known_hostels, self.versions)
+        for hostel_name, info in new_hostels.items():
+            self.known_hostels.add(hostel_name)
+            for floor, floor_rooms in info["floors"].items():
+                for room, room_data in floor_rooms.items():
+                    self.versions[(hostel_name, floor, room)] = room_data.get("version", 0)
+        for key, room_data in rooms.items():
+            self.versions[key] = room_data.get("version", 0)
+        if publish and (new_hostels or rooms):
+            try:
+                self.schedule(lambda: self.apply(new_hostels, rooms))
+            except RuntimeError:
+                pass  # The caller's event loop is already gone
+        return len(rooms)
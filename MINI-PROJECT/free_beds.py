@@ -0,0 +1,162 @@
+from hostel_cache import LazyHostel
+
+
+class MaxTree:
+    # Segment tree over a fixed list of counts; finds the leftmost slot holding at least N in O(log n)
+    def __init__(self, values):
+        self.size = 1
+        while self.size < max(len(values), 1):
+            self.size *= 2
+        self.tree = [0] * (2 * self.size)
+        self.tree[self.size:self.size + len(values)] = values
+        for i in range(self.size - 1, 0, -1):
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+
+    def set(self, position, value):
+        i = position + self.size
+        self.tree[i] = value
+        i //= 2
+        while i:
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+            i //= 2
+
+    def leftmost_at_least(self, minimum):
+        if self.tree[1] < minimum:
+            return None
+        i = 1
+        while i < self.size:
+            i = 2 * i if self.tree[2 * i] >= minimum else 2 * i + 1
+        return i - self.size
+
+
+# Function to give hostels without a distance a sort key after every real distance
+def distance_key(hostel_name, info):
+    distance = info.get("distance")
+    return (distance if isinstance(distance, (int, float)) else float("inf"), hostel_name)
+
+
+class FreeBedIndex:
+    # Free beds per room and per hostel, with one distance-ordered MaxTree per category
+    def __init__(self, hostels):
+        self.hostels = hostels
+        self.held = {}  # (hostel, floor, room) -> beds promised to bookings that are not stored yet
+        self.rebuild()
+
+    def rebuild(self):
+        self.room_free = {}  # (hostel, floor, room) -> free beds
+        self.hostel_free = {}  # hostel -> free beds
+        self.open_rooms = {}  # hostel -> {(floor, room): None} for rooms with a free bed (None until loaded)
+        for hostel_name in self.hostels:
+            self._index_rooms(hostel_name)
+        self._build_trees()
+
+    def _index_rooms(self, hostel_name):
+        info = self.hostels[hostel_name]
+        if isinstance(info, LazyHostel) and not info.loaded:  # Use the snapshot's count until rooms are read
+            self.hostel_free[hostel_name] = info.summary_free
+            self.open_rooms[hostel_name] = None
+            return
+        total = 0
+        open_rooms = {}
+        for floor, rooms in self.hostels[hostel_name]["floors"].items():
+            for room, room_data in rooms.items():
+                free = self._free((hostel_name, floor, room), room_data)
+                self.room_free[(hostel_name, floor, room)] = free
+                total += free
+                if free:
+                    open_rooms[(floor, room)] = None
+        self.hostel_free[hostel_name] = total
+        self.open_rooms[hostel_name] = open_rooms
+
+    def _build_trees(self):
+        by_category = {}
+        for hostel_name, info in self.hostels.items():
+            by_category.setdefault(info.get("category"), []).append(hostel_name)
+        self.order = {}  # category -> hostels sorted by distance
+        self.position = {}  # hostel -> (category, slot in that category's order)
+        self.trees = {}
+        for category, names in by_category.items():
+            names.sort(key=lambda name: distance_key(name, self.hostels[name]))
+            self.order[category] = names
+            for slot, name in enumerate(names):
+                self.position[name] = (category, slot)
+            self.trees[category] = MaxTree([self.hostel_free[name] for name in names])
+
+    # New hostels change the distance order, so only that category's tree is rebuilt
+    def add_hostel(self, hostel_name):
+        self._index_rooms(hostel_name)
+        category = self.hostels[hostel_name].get("category")
+        names = self.order.get(category, []) + [hostel_name]
+        names.sort(key=lambda name: distance_key(name, self.hostels[name]))
+        self.order[category] = names
+        for slot, name in enumerate(names):
+            self.position[name] = (category, slot)
+        self.trees[category] = MaxTree([self.hostel_free[name] for name in names])
+
+    # Function to count a lazily loaded hostel room by room once its floors are in memory
+    def _index_loaded(self, hostel_name):
+        self._index_rooms(hostel_name)
+        category, slot = self.position[hostel_name]
+        self.trees[category].set(slot, self.hostel_free[hostel_name])
+
+    # Function to refresh one room after a booking, cancellation or sync from disk
+    def room_changed(self, hostel_name, floor, room):
+        if self.open_rooms[hostel_name] is None:
+            self._index_loaded(hostel_name)  # Counts this room as it is now
+            return
+        room_data = self.hostels[hostel_name]["floors"][floor][room]
+        key = (hostel_name, floor, room)
+        free = self._free(key, room_data)
+        old = self.room_free.get(key, 0)
+        if free == old:
+            return
+        self.room_free[key] = free
+        if free:
+            self.open_rooms[hostel_name][(floor, room)] = None
+        else:
+            self.open_rooms[hostel_name].pop((floor, room), None)
+        self.hostel_free[hostel_name] += free - old
+        category, slot = self.position[hostel_name]
+        self.trees[category].set(slot, self.hostel_free[hostel_name])
+
+    def _free(self, key, room_data):
+        return max(room_data["capacity"] - len(room_data["occupants"]) - self.held.get(key, 0), 0)
+
+    # Function to reserve (count > 0) or release (count < 0) beds for bookings still being saved
+    def hold(self, hostel_name, floor, room, count=1):
+        key = (hostel_name, floor, room)
+        held = self.held.get(key, 0) + count
+        if held > 0:
+            self.held[key] = held
+        else:
+            self.held.pop(key, None)
+        self.room_changed(hostel_name, floor, room)
+
+    def held_beds(self, hostel_name, floor, room):
+        return self.held.get((hostel_name, floor, room), 0)
+
+    def free_beds(self, hostel_name):
+        return self.hostel_free.get(hostel_name, 0)
+
+    # Function to find the nearest hostel with at least min_free beds in one of categories (any if None)
+    def nearest(self, min_free=1, categories=None):
+        categories = list(self.trees) if categories is None else categories
+        best = None
+        for name in categories:
+            if name not in self.trees:
+                continue
+            slot = self.trees[name].leftmost_at_least(min_free)
+            if slot is None:
+                continue
+            hostel_name = self.order[name][slot]
+            if best is None or distance_key(hostel_name, self.hostels[hostel_name]) < \
+                    distance_key(best, self.hostels[best]):
+                best = hostel_name
+        return best
+
+    # Function to pick the room a new student should go to: the first room with a free bed
+    def open_room(self, hostel_name):
+        if hostel_name in self.open_rooms and self.open_rooms[hostel_name] is None:
+            self.hostels[hostel_name].load()
+            self._index_loaded(hostel_name)
+        return next(iter(self.open_rooms.get(hostel_name, {})), None)
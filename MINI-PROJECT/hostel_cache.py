@@ -0,0 +1,146 @@
+import os
+import pickle
+
+import metrics
+
+CACHE_SUFFIX = ".cache"  # Snapshot kept next to the JSON file it was parsed from
+CACHE_VERSION = 1
+
+
+# Function to identify one version of a source file; the cache is only used while this matches
+def source_stamp(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Free beds in one hostel, counted the same way as free_beds.FreeBedIndex. The snapshot is written before
+# the engine checks the schema, so rooms it would repair or report must not stop the count.
+def count_free_beds(floors):
+    free = 0
+    for rooms in floors.values():
+        for room_data in rooms.values():
+            try:
+                free += max(int(room_data["capacity"]) - len(room_data["occupants"]), 0)
+            except (KeyError, TypeError, ValueError):
+                continue
+    return free
+
+
+class LazyHostel(dict):
+    # Hostel summary (distance, category, ...) whose "floors" are read on first access
+    def __init__(self, summary, load_floors, free_beds):
+        super().__init__(summary)
+        self.load_floors = load_floors
+        self.summary_free = free_beds  # Free beds when the snapshot was taken
+
+    @property
+    def loaded(self):
+        return dict.__contains__(self, "floors")
+
+    def __missing__(self, key):
+        if key != "floors":
+            raise KeyError(key)
+        with metrics.timer("load_floors"):
+            floors = self.load_floors()
+        self["floors"] = floors
+        return floors
+
+    def load(self):
+        return self["floors"]
+
+
+# Function to turn a parsed dict back into plain hostel dicts with every floor loaded (for saving)
+def load_all(hostels):
+    for info in hostels.values():
+        if isinstance(info, LazyHostel):
+            info.load()
+    return hostels
+
+
+class HostelCache:
+    # Binary snapshot of hostel_data.json: a pickled summary of every hostel, followed by one pickled
+    # floors blob per hostel, so startup reads the summary only and each hostel's rooms when opened
+    def __init__(self, source_path, cache_path=None):
+        self.source_path = source_path
+        self.cache_path = cache_path or source_path + CACHE_SUFFIX
+        self.file = None  # Kept open so a snapshot replaced by another desk cannot shift our offsets
+
+    def write(self, stamp, hostels):
+        index = {}
+        blobs = []
+        offset = 0
+        for hostel_name, info in hostels.items():
+            floors = info.get("floors", {})
+            blob = pickle.dumps(floors, pickle.HIGHEST_PROTOCOL)
+            summary = {key: value for key, value in info.items() if key != "floors"}
+            index[hostel_name] = (summary, offset, len(blob), count_free_beds(floors))
+            blobs.append(blob)
+            offset += len(blob)
+        temp_path = self.cache_path + ".tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                pickle.dump({"version": CACHE_VERSION, "stamp": stamp, "hostels": index}, file,
+                            pickle.HIGHEST_PROTOCOL)
+                for blob in blobs:
+                    file.write(blob)
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            pass  # The cache is only a speed-up; the JSON file stays the source of truth
+
+    # Function to return {hostel: LazyHostel} from the snapshot, or None if it is missing or stale
+    def read(self, stamp):
+        self.close()
+        try:
+            file = open(self.cache_path, "rb")
+        except OSError:
+            return None
+        try:
+            header = pickle.load(file)
+        except Exception:  # Truncated or written by an incompatible version
+            file.close()
+            return None
+        if not isinstance(header, dict) or header.get("version") != CACHE_VERSION or \
+                tuple(header.get("stamp", ())) != tuple(stamp):
+            file.close()
+            return None
+        self.file = file
+        base = file.tell()
+        return {hostel_name: LazyHostel(summary, self._loader(base + offset, length), free_beds)
+                for hostel_name, (summary, offset, length, free_beds) in header["hostels"].items()}
+
+    def _loader(self, offset, length):
+        def load_floors():
+            self.file.seek(offset)
+            return pickle.loads(self.file.read(length))
+        return load_floors
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+# Function to load a JSON-derived value through a pickle snapshot; load() parses the source on a miss
+def load_cached(source_path, load, cache_path=None):
+    cache_path = cache_path or source_path + CACHE_SUFFIX
+    try:
+        stamp = source_stamp(source_path)
+    except OSError:
+        return load()
+    try:
+        with open(cache_path, "rb") as file:
+            cached = pickle.load(file)
+        if cached.get("version") == CACHE_VERSION and tuple(cached.get("stamp", ())) == stamp:
+            return cached["data"]
+    except Exception:
+        pass  # Missing, stale or damaged snapshot; fall back to the source
+    data = load()
+    if source_stamp(source_path) == stamp:  # Only cache what matches the stamp
+        try:
+            with open(cache_path + ".tmp", "wb") as file:
+                pickle.dump({"version": CACHE_VERSION, "stamp": stamp, "data": data}, file,
+                            pickle.HIGHEST_PROTOCOL)
+            os.replace(cache_path + ".tmp", cache_path)
+        except OSError:
+            pass
+    return data
@@ -0,0 +1,623 @@
+import collections
+import copy
+import functools
+import logging
+
+import metrics
+import student_ids
+from analytics import AnalyticsReport
+from bookings import BookingStore
+from change_feed import POLL_INTERVAL, ChangeFeed, ChangeTailer
+from free_beds import FreeBedIndex
+from hostel_cache import LazyHostel, load_all
+from persistence_worker import PersistenceWorker
+from schema import SCHEMA_KEY, SCHEMA_VERSION, format_problem, migrate_hostel
+from search import MAX_RESULTS, SearchIndex
+from storage import BookingConflict, BookingError, open_storage
+
+COLLEGE_IDS_FILE = "college_ids.json"  # File to store valid student IDs
+CATEGORIES = ["Boys", "Girls", "Mixed"]
+# Hostel categories each student category may be placed in
+HOSTELS_FOR = {"Boys": ("Boys", "Mixed"), "Girls": ("Girls", "Mixed")}
+MEAL_CHOICES = ["Veg", "Non-Veg"]
+ALLOCATE_RETRIES = 3  # Attempts when another desk fills the chosen room first
+
+log = logging.getLogger(__name__)
+
+
+# Function to turn one room into the (status, booked, remaining, capacity) values shown in the room list
+def room_summary(room_data):
+    booked = len(room_data["occupants"])
+    remaining = room_data["capacity"] - booked
+    status = "Fully Booked" if remaining <= 0 else "Available"
+    return status, booked, remaining, room_data["capacity"]
+
+
+class HostelEngine:
+    # Booking logic without any UI: validation, duplicate checks and persistence.
+    # lazy=True starts from the storage snapshot: hostel summaries now, each hostel's floors on first use.
+    def __init__(self, storage=None, ids_file=COLLEGE_IDS_FILE, lazy=False):
+        self.storage = storage if storage is not None else open_storage()
+        self.ids_file = ids_file
+        with metrics.timer("load"):
+            if lazy:
+                self.hostels, bookings = self.storage.load_snapshot()
+            else:
+                self.hostels, bookings = self.storage.load_hostels(), self.storage.load_bookings()
+        self.problems = []  # (hostel, floor, room, message) found in the hostels read so far
+        for hostel_name, info in self.hostels.items():
+            self.check_hostel(hostel_name, info)
+        self.bookings = BookingStore(bookings)
+        self.free_beds = FreeBedIndex(self.hostels)
+        self.worker = None
+        self.pending_ids = set()  # Students with a booking or cancellation still being saved
+        self.queued_changes = collections.Counter()  # Room -> version bumps its queued writes will make
+        self.refused_writes = collections.Counter()  # Room -> queued writes storage refused, as each one comes back
+        self.search_index = None  # Built on the first search, then kept up to date by the BookingStore
+        self.feed = ChangeFeed()  # Room and hostel deltas for open windows, from this desk and (tailed) others
+        self.tailer = None
+
+    # Function to move writes onto a background thread; schedule(fn) must run fn on the caller's thread
+    def start_worker(self, schedule):
+        self.worker = PersistenceWorker(self.storage, schedule)
+        return self.worker
+
+    # Function to follow changes stored by other desks; schedule(fn) must run fn on the caller's thread.
+    # Feed deltas are then collected per schedule tick instead of delivered one by one.
+    def start_tailer(self, schedule, interval=POLL_INTERVAL):
+        self.feed.schedule = schedule
+        self.tailer = ChangeTailer(self.storage, self.apply_changes, schedule, interval).start()
+        return self.tailer
+
+    # Queued writes are stored before the backend is closed
+    def close(self):
+        if self.tailer is not None:
+            self.tailer.stop()
+            self.tailer = None
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+        self.storage.close()
+
+    # Function to read every lazily loaded hostel's floors (needed before saving the whole tree)
+    def load_all(self):
+        return load_all(self.hostels)
+
+    # Function to refresh the free-bed index and tell open windows after a room changed
+    def room_changed(self, hostel_name, floor, room):
+        self.free_beds.room_changed(hostel_name, floor, room)
+        self.feed.publish("room", hostel_name, floor, room)
+
+    def hostel_added(self, hostel_name):
+        self.free_beds.add_hostel(hostel_name)
+        self.feed.publish("hostel", hostel_name)
+
+    # Function to take in rooms and hostels another desk stored (from the tailer, on this thread).
+    # A room is only replaced when its stored version is newer and no write of ours is queued for it;
+    # the bookings index follows the room's occupants. A hostel whose floors were not read yet is read
+    # now: its snapshot may predate the change, and its free beds are still the snapshot's count.
+    @metrics.timed("apply_changes")
+    def apply_changes(self, new_hostels, rooms):
+        for hostel_name, info in new_hostels.items():
+            if hostel_name not in self.hostels:
+                self.hostels[hostel_name] = self.check_hostel(hostel_name, info)
+                self.hostel_added(hostel_name)
+        for (hostel_name, floor, room), fresh_room in rooms.items():
+            info = self.hostels.get(hostel_name)
+            if info is None:
+                continue
+            unread = isinstance(info, LazyHostel) and not info.loaded
+            room_data = info["floors"].get(floor, {}).get(room)
+            if room_data is None or self.free_beds.held_beds(hostel_name, floor, room):
+                continue
+            key = (hostel_name, floor, room)
+            if fresh_room.get("version", 0) > room_data.get("version", 0):
+                before = {occupant["id"] for occupant in room_data["occupants"]}
+                room_data.clear()
+                room_data.update(copy.deepcopy(fresh_room))
+            elif unread:  # Backends that read floors from storage itself already have the change
+                before = {booking["student_id"] for booking in self.bookings.for_room(*key)}
+            else:
+                continue
+            self._follow_occupants(key, before, room_data)
+            self.room_changed(hostel_name, floor, room)
+
+    def _follow_occupants(self, key, before, room_data):
+        hostel_name, floor, room = key
+        after = {occupant["id"]: occupant for occupant in room_data["occupants"]}
+        for student_id in before - after.keys():
+            if self.bookings.is_in_room(student_id, *key) and student_id not in self.pending_ids:
+                self.bookings.cancel(student_id)
+        for student_id, occupant in after.items():
+            if student_id in before or student_id in self.pending_ids or self.bookings.is_in_room(student_id, *key):
+                continue
+            self.bookings.cancel(student_id)  # Moved here from another room
+            self.bookings.add({"student_id": student_id, "student_name": occupant.get("name"),
+                               "hostel_name": hostel_name, "room": room, "floor": floor})
+
+    # Function to bring a stored hostel to the current schema in memory; a lazily loaded hostel is
+    # checked when its floors are first read. Hostels stamped with the current version checked clean
+    # when they were stamped and are left alone. Problems that cannot be repaired are logged and kept
+    # in self.problems; the hostel is only replaced when the upgrade changed something.
+    def check_hostel(self, hostel_name, info):
+        if isinstance(info, dict) and info.get(SCHEMA_KEY) == SCHEMA_VERSION:
+            return info
+        if isinstance(info, LazyHostel) and not info.loaded:
+            info.load_floors = functools.partial(self._checked_floors, hostel_name, info, info.load_floors)
+            return info
+        hostel, problems, occupants = migrate_hostel(info)
+        for floor, room, message in problems:
+            self.problems.append((hostel_name, floor, room, message))
+            log.warning("%s", format_problem(self.problems[-1]))
+        if hostel is not info and hostel != info:
+            info.clear()
+            info.update(hostel)
+        return info
+
+    def _checked_floors(self, hostel_name, info, load_floors):
+        hostel = self.check_hostel(hostel_name, dict(info, floors=load_floors()))
+        for key, value in hostel.items():
+            if key != "floors":
+                dict.__setitem__(info, key, value)
+        return hostel["floors"]
+
+    def is_valid_id(self, student_id):
+        try:
+            return student_ids.is_valid_id(student_id, self.ids_file)
+        except FileNotFoundError:
+            raise BookingError("The file containing student IDs was not found.")
+
+    def room(self, hostel_name, floor, room):
+        try:
+            return self.hostels[hostel_name]["floors"][floor][room]
+        except KeyError:
+            raise BookingError(f"{hostel_name} / {floor} / {room} does not exist!")
+
+    def list_hostels(self):
+        return [self.hostel_row(hostel_name) for hostel_name in self.hostels]
+
+    # (hostel, distance, category) values shown in the hostel list
+    def hostel_row(self, hostel_name):
+        info = self.hostels[hostel_name]
+        return hostel_name, info.get("distance", "N/A"), info.get("category", "N/A")
+
+    def list_floors(self, hostel_name):
+        return list(self.hostels[hostel_name]["floors"])
+
+    # (room, status, booked, remaining, capacity) values shown in the room list
+    def room_row(self, hostel_name, floor, room):
+        return (room,) + room_summary(self.hostels[hostel_name]["floors"][floor][room])
+
+    # Rows of (room, status, booked, remaining, capacity) for one floor, or for every floor
+    def list_rooms(self, hostel_name, floor=None):
+        floors = self.hostels[hostel_name]["floors"]
+        selected = [floor] if floor is not None else list(floors)
+        return [(room,) + room_summary(room_data)
+                for floor_name in selected
+                for room, room_data in floors[floor_name].items()]
+
+    # Function to compute occupancy, vacancy, student mix and meal revenue over every hostel
+    @metrics.timed("analytics")
+    def analytics(self):
+        return AnalyticsReport(self.load_all())
+
+    def find_booking(self, student_id):
+        return self.bookings.find(student_id)
+
+    # Function to find booked students by roll-number prefix, name (prefix or one typo) or hostel / floor / room
+    @metrics.timed("search")
+    def search(self, query, limit=MAX_RESULTS):
+        if self.search_index is None:
+            self.search_index = SearchIndex(self.bookings)
+        return self.search_index.search(query, limit)
+
+    # (student ID, name, hostel, floor, room) values shown in the search results
+    def booking_row(self, student_id):
+        booking = self.bookings.find(student_id) or {"student_id": student_id}
+        return (student_id, booking.get("student_name") or "", booking.get("hostel_name", ""),
+                booking.get("floor", ""), booking.get("room", ""))
+
+    # Function to run every check that does not need the student's name; raises BookingError.
+    # pending counts occupants already queued for this room by a bulk import; beds held by writes
+    # still on the worker thread count as taken too.
+    @metrics.timed("validate")
+    def check_student(self, hostel_name, floor, room, student_id, record_booking=True, pending=0):
+        room_data = self.room(hostel_name, floor, room)
+        metrics.count("occupants_scanned", len(room_data["occupants"]))
+        pending += self.free_beds.held_beds(hostel_name, floor, room)
+        if len(room_data["occupants"]) + pending >= room_data["capacity"]:
+            raise BookingError("Room is fully booked!")
+        if not self.is_valid_id(student_id):
+            raise BookingError("Invalid Student ID!")
+        if self.bookings.is_in_room(student_id, hostel_name, floor, room) or \
+                any(occupant["id"] == student_id for occupant in room_data["occupants"]):
+            raise BookingError("Student has already booked this room!")
+        if record_booking and student_id in self.bookings:
+            raise BookingError("Student has already booked a room!")
+        if student_id in self.pending_ids:
+            raise BookingError("A booking for this student is still being saved!")
+        return room_data
+
+    # Function to validate one booking and build its (hostel, floor, room, occupant, booking) entry
+    def make_entry(self, hostel_name, floor, room, student_id, name=None, meal=None, record_booking=True,
+                   pending=0):
+        self.check_student(hostel_name, floor, room, student_id, record_booking, pending)
+        if record_booking and not name:
+            raise BookingError("Student name cannot be empty!")
+        if meal is not None and meal not in MEAL_CHOICES:
+            raise BookingError("Invalid meal choice!")
+
+        occupant = {"id": student_id}
+        if name:
+            occupant["name"] = name
+        if meal is not None:
+            occupant["meal"] = meal
+        booking = None
+        if record_booking:
+            booking = {
+                "student_id": student_id,
+                "student_name": name,
+                "hostel_name": hostel_name,
+                "room": room,
+                "floor": floor
+            }
+        return hostel_name, floor, room, occupant, booking
+
+    # record_booking=False only adds the occupant (the Hostel_final.py flow, which keeps no bookings list)
+    @metrics.timed("book")
+    @metrics.profiled("book")
+    def book(self, hostel_name, floor, room, student_id, name=None, meal=None, expected_version=None,
+             record_booking=True):
+        hostel_name, floor, room, occupant, booking = self.make_entry(hostel_name, floor, room, student_id, name,
+                                                                      meal, record_booking)
+
+        # Storage validates against the shared state and adds the occupant to our room on success
+        try:
+            self.storage.add_booking(self.hostels, self.bookings, hostel_name, floor, room, occupant, booking,
+                                     expected_version)
+        finally:
+            self.room_changed(hostel_name, floor, room)  # The room may also have been refreshed
+        if booking is not None:
+            self.bookings.add(booking)
+        return booking or occupant
+
+    # Function to validate many rows in one pass; rows are (row_number, student_id, name, hostel, floor, room).
+    # Returns the valid entries, the row number of each and a list of (row_number, student_id, message) errors.
+    @metrics.timed("validate_rows")
+    def validate_rows(self, rows):
+        entries = []
+        row_numbers = []
+        errors = []
+        pending_rooms = {}  # (hostel, floor, room) -> occupants queued so far
+        pending_ids = set()
+        for row_number, student_id, name, hostel_name, floor, room in rows:
+            key = (hostel_name, floor, room)
+            try:
+                if student_id in pending_ids:
+                    raise BookingError("Student appears more than once in this import!")
+                entry = self.make_entry(hostel_name, floor, room, student_id, name,
+                                        pending=pending_rooms.get(key, 0))
+            except BookingError as error:
+                errors.append((row_number, student_id, str(error)))
+                continue
+            entries.append(entry)
+            row_numbers.append(row_number)
+            pending_ids.add(student_id)
+            pending_rooms[key] = pending_rooms.get(key, 0) + 1
+        return entries, row_numbers, errors
+
+    # Function to store validated entries with a single persistence write; versions optionally gives the
+    # room version each entry expects
+    @metrics.timed("book_many")
+    def book_many(self, entries, versions=None):
+        if not entries:
+            return []
+        try:
+            self.storage.add_bookings(self.hostels, self.bookings, entries, versions)
+        finally:
+            for hostel_name, floor, room, occupant, booking in entries:
+                self.room_changed(hostel_name, floor, room)
+        for hostel_name, floor, room, occupant, booking in entries:
+            if booking is not None:
+                self.bookings.add(booking)
+        return [booking or occupant for hostel_name, floor, room, occupant, booking in entries]
+
+    @metrics.timed("cancel")
+    def cancel(self, student_id):
+        booking = self.bookings.find(student_id)
+        if booking is None:
+            raise BookingError("No booking found for this Student ID.")
+        self.bookings.cancel(student_id)
+        try:
+            self.storage.cancel_booking(self.hostels, self.bookings, booking["hostel_name"], booking["floor"],
+                                        booking["room"], student_id)
+        except Exception:
+            self.bookings.add(booking)
+            raise
+        self.room_changed(booking["hostel_name"], booking["floor"], booking["room"])
+        return booking
+
+    # Function to give the version a room will have once this desk's queued writes are stored. The UIs
+    # read it when the operator opens a room and pass it back as expected_version.
+    def room_version(self, hostel_name, floor, room):
+        return self.room(hostel_name, floor, room).get("version", 0) + self.queued_changes[(hostel_name, floor, room)]
+
+    # Function to check that a booked student can move to another room; returns (booking, moved booking)
+    def check_transfer(self, student_id, hostel_name, floor, room):
+        booking = self.bookings.find(student_id)
+        if booking is None:
+            raise BookingError("No booking found for this Student ID.")
+        if student_id in self.pending_ids:
+            raise BookingError("A booking for this student is still being saved!")
+        room_data = self.room(hostel_name, floor, room)
+        if BookingStore.room_key(booking) == (hostel_name, floor, room):
+            raise BookingError("Student is already in this room!")
+        if len(room_data["occupants"]) + self.free_beds.held_beds(hostel_name, floor, room) >= room_data["capacity"]:
+            raise BookingError("Room is fully booked!")
+        return booking, dict(booking, hostel_name=hostel_name, floor=floor, room=room)
+
+    # Function to move a booked student to another room; occupants, bookings and both rooms' versions
+    # are stored as one change
+    @metrics.timed("transfer")
+    def transfer(self, student_id, hostel_name, floor, room):
+        booking, moved = self.check_transfer(student_id, hostel_name, floor, room)
+        source = BookingStore.room_key(booking)
+        target = (hostel_name, floor, room)
+        try:
+            self.storage.transfer_booking(self.hostels, self.bookings, student_id, source, target, moved)
+        finally:
+            for key in (source, target):
+                self.room_changed(*key)  # Either room may also have been refreshed
+        self.bookings.move(moved)
+        return moved
+
+    # Function to copy the rooms a queued write touches, so the worker never reads dicts the UI is changing
+    def _shadow(self, keys):
+        shadow = {}
+        for hostel_name, floor, room in keys:
+            rooms = shadow.setdefault(hostel_name, {"floors": {}})["floors"].setdefault(floor, {})
+            rooms[room] = copy.deepcopy(self.hostels[hostel_name]["floors"][floor][room])
+        return shadow
+
+    # Function to copy the stored rooms a finished write sent back into the live dicts the UI shows
+    def _apply_shadow(self, shadow):
+        for hostel_name, info in shadow.items():
+            for floor, rooms in info["floors"].items():
+                for room, fresh_room in rooms.items():
+                    room_data = self.hostels[hostel_name]["floors"][floor][room]
+                    room_data.clear()
+                    room_data.update(fresh_room)
+                    self.room_changed(hostel_name, floor, room)
+
+    # Function to validate a booking now and store it on the worker thread; done(error) runs on the UI
+    # thread once it is stored (error is None) or rejected. Without a worker the booking is stored inline.
+    # expected_version is the room_version() the operator saw; storage rejects the booking if another
+    # desk changed the room since.
+    @metrics.timed("submit_booking")
+    @metrics.profiled("book")
+    def submit_booking(self, hostel_name, floor, room, student_id, name=None, meal=None, expected_version=None,
+                       record_booking=True, done=None):
+        if expected_version is not None and self.room_version(hostel_name, floor, room) != expected_version:
+            raise BookingConflict("This room was changed at another desk. Please check it and try again.")
+        entry = self.make_entry(hostel_name, floor, room, student_id, name, meal, record_booking)
+        if self.worker is None:
+            result = self.book_many([entry], [expected_version])[0]
+            if done is not None:
+                done(None)
+            return result
+        self._submit_entries([entry], done, [expected_version])
+        return entry[4] or entry[3]
+
+    def _submit_entries(self, entries, done, versions=None):
+        keys = {(hostel_name, floor, room) for hostel_name, floor, room, occupant, booking in entries}
+        shadow = self._shadow(keys)
+        refused = [self.refused_writes[entry[:3]] for entry in entries]
+        for hostel_name, floor, room, occupant, booking in entries:
+            self.pending_ids.add(occupant["id"])
+            self.free_beds.hold(hostel_name, floor, room)  # The bed stays taken while the write is queued
+            self.queued_changes[(hostel_name, floor, room)] += 1
+
+        def finished(error):
+            for hostel_name, floor, room, occupant, booking in entries:
+                self.pending_ids.discard(occupant["id"])
+                self.free_beds.hold(hostel_name, floor, room, -1)
+                self._unqueue((hostel_name, floor, room), error)
+            if error is None:
+                self._apply_shadow(shadow)
+                for hostel_name, floor, room, occupant, booking in entries:
+                    if booking is not None:
+                        self.bookings.add(booking)
+            if done is not None:
+                done(error)
+
+        self.worker.submit(("book", (entries, versions, refused), shadow), finished)
+
+    def _unqueue(self, key, error):
+        self.queued_changes[key] -= 1
+        if not self.queued_changes[key]:
+            del self.queued_changes[key]
+        if error is not None:
+            self.refused_writes[key] += 1
+
+    @metrics.timed("submit_cancel")
+    def submit_cancel(self, student_id, done=None):
+        booking = self.bookings.find(student_id)
+        if booking is None:
+            raise BookingError("No booking found for this Student ID.")
+        if self.worker is None:
+            self.cancel(student_id)
+            if done is not None:
+                done(None)
+            return booking
+        if student_id in self.pending_ids:
+            raise BookingError("A booking for this student is still being saved!")
+        key = (booking["hostel_name"], booking["floor"], booking["room"])
+        shadow = self._shadow([key])
+        self.pending_ids.add(student_id)
+        self.queued_changes[key] += 1
+
+        def finished(error):
+            self.pending_ids.discard(student_id)
+            self._unqueue(key, error)
+            if error is None:
+                self.bookings.cancel(student_id)
+                self._apply_shadow(shadow)
+            if done is not None:
+                done(error)
+
+        self.worker.submit(("cancel", key + (student_id,), shadow), finished)
+        return booking
+
+    # The target bed is held while the move is queued, so it cannot be booked twice in the meantime
+    @metrics.timed("submit_transfer")
+    def submit_transfer(self, student_id, hostel_name, floor, room, done=None):
+        if self.worker is None:
+            moved = self.transfer(student_id, hostel_name, floor, room)
+            if done is not None:
+                done(None)
+            return moved
+        booking, moved = self.check_transfer(student_id, hostel_name, floor, room)
+        source = BookingStore.room_key(booking)
+        target = (hostel_name, floor, room)
+        shadow = self._shadow([source, target])
+        self.pending_ids.add(student_id)
+        self.free_beds.hold(*target)
+        self.queued_changes.update((source, target))
+
+        def finished(error):
+            self.pending_ids.discard(student_id)
+            self.free_beds.hold(*target, -1)
+            for key in (source, target):
+                self._unqueue(key, error)
+            if error is None:
+                self.bookings.move(moved)
+                self._apply_shadow(shadow)
+            if done is not None:
+                done(error)
+
+        self.worker.submit(("transfer", (student_id, source, target, moved), shadow), finished)
+        return moved
+
+    # Function to find the nearest hostel (optionally of one category) with at least min_free beds
+    def find_hostel(self, min_free=1, category=None):
+        return self.free_beds.nearest(min_free, None if category is None else [category])
+
+    # Function to find the nearest hostel a student of this category may be placed in; raises BookingError
+    def nearest_for(self, category):
+        if category not in HOSTELS_FOR:
+            raise BookingError(f"Category must be one of {', '.join(HOSTELS_FOR)}!")
+        hostel_name = self.free_beds.nearest(1, HOSTELS_FOR[category])
+        if hostel_name is None:
+            raise BookingError(f"No free beds left for {category}!")
+        return hostel_name
+
+    # Function to book a student into the nearest hostel with space, without browsing rooms
+    def auto_allocate(self, student_id, name, category):
+        if not self.is_valid_id(student_id):
+            raise BookingError("Invalid Student ID!")
+        if student_id in self.bookings:
+            raise BookingError("Student has already booked a room!")
+        for attempt in range(ALLOCATE_RETRIES):
+            hostel_name = self.nearest_for(category)
+            floor, room = self.free_beds.open_room(hostel_name)
+            try:
+                return self.book(hostel_name, floor, room, student_id, name)
+            except BookingConflict:
+                if attempt == ALLOCATE_RETRIES - 1:
+                    raise  # Rooms keep filling up at other desks; let the operator retry
+
+    # Beds held by queued bookings are not free in the index, so back-to-back allocations never collide
+    def submit_allocate(self, student_id, name, category, done=None):
+        if self.worker is None:
+            booking = self.auto_allocate(student_id, name, category)
+            if done is not None:
+                done(None)
+            return booking
+        if not self.is_valid_id(student_id):
+            raise BookingError("Invalid Student ID!")
+        hostel_name = self.nearest_for(category)
+        floor, room = self.free_beds.open_room(hostel_name)
+        return self.submit_booking(hostel_name, floor, room, student_id, name, done=done)
+
+    # Function to validate a new hostel and build its floors; raises BookingError
+    def build_hostel(self, hostel_name, num_floors, rooms_per_floor, capacity, distance, category,
+                     veg_price=None, non_veg_price=None):
+        if not hostel_name:
+            raise BookingError("Hostel name cannot be empty!")
+        if hostel_name in self.hostels:
+            raise BookingError("Hostel already exists!")
+        if not num_floors or num_floors < 1:
+            raise BookingError("Number of floors must be greater than 0!")
+        if not rooms_per_floor or rooms_per_floor < 1:
+            raise BookingError("Number of rooms must be greater than 0!")
+        if not capacity or capacity < 1:
+            raise BookingError("Room capacity must be greater than 0!")
+        if category not in CATEGORIES:
+            raise BookingError("Category must be one of Boys, Girls, Mixed!")
+
+        floors = {}
+        for i in range(num_floors):
+            floor_name = f"Floor {i + 1}"
+            floors[floor_name] = {}
+            for j in range(rooms_per_floor):
+                room_data = {
+                    "status": "available",
+                    "capacity": capacity,
+                    "occupants": []
+                }
+                if veg_price is not None or non_veg_price is not None:
+                    room_data["veg_price"] = veg_price
+                    room_data["non_veg_price"] = non_veg_price
+                floors[floor_name][f"Room {j + 1}"] = room_data
+
+        return {
+            "distance": distance,
+            "category": category,
+            "schema": SCHEMA_VERSION,
+            "floors": floors
+        }
+
+    def add_hostel(self, hostel_name, num_floors, rooms_per_floor, capacity, distance, category,
+                   veg_price=None, non_veg_price=None):
+        known = set(self.hostels)
+        self.hostels[hostel_name] = self.build_hostel(hostel_name, num_floors, rooms_per_floor, capacity, distance,
+                                                      category, veg_price, non_veg_price)
+        try:
+            self.storage.add_hostel(self.hostels, hostel_name)
+        except BookingConflict:
+            del self.hostels[hostel_name]
+            raise
+        for name in self.hostels:
+            if name not in known:  # Also picks up hostels merged in from other desks
+                self.hostel_added(name)
+        return self.hostels[hostel_name]
+
+    # The hostel is usable at once; it is dropped again if another desk stored the same name first
+    def submit_add_hostel(self, hostel_name, num_floors, rooms_per_floor, capacity, distance, category,
+                          veg_price=None, non_veg_price=None, done=None):
+        if self.worker is None:
+            info = self.add_hostel(hostel_name, num_floors, rooms_per_floor, capacity, distance, category,
+                                   veg_price, non_veg_price)
+            if done is not None:
+                done(None)
+            return info
+        info = self.build_hostel(hostel_name, num_floors, rooms_per_floor, capacity, distance, category,
+                                 veg_price, non_veg_price)
+        shadow = {hostel_name: copy.deepcopy(info)}
+        self.hostels[hostel_name] = info
+        self.hostel_added(hostel_name)
+
+        def finished(error):
+            if error is None:
+                for name, stored in shadow.items():
+                    if name not in self.hostels:  # Hostels merged in from other desks
+                        self.hostels[name] = stored
+                        self.hostel_added(name)
+            elif self.hostels.get(hostel_name) is info:
+                del self.hostels[hostel_name]
+                self.free_beds.rebuild()
+            if done is not None:
+                done(error)
+
+        self.worker.submit(("add_hostel", hostel_name, shadow), finished)
+        return info
@@ -0,0 +1,63 @@
+import metrics
+
+PAGE_SIZE = 100  # Rows inserted per page
+PREFETCH_AT = 0.9  # Load the next page once the view is scrolled past this fraction
+
+
+class LazyTreeFiller:
+    # Fills a Treeview one page at a time as the user scrolls; rows are keyed by iid so
+    # a single row can be refreshed without touching the rest
+    def __init__(self, tree, scrollbar=None, page_size=PAGE_SIZE):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.page_size = page_size
+        self.keys = []
+        self.key_set = set()
+        self.make_values = None
+        self.loaded = 0
+        self.load_pending = False
+        self.tree.configure(yscrollcommand=self.on_scroll)
+        if scrollbar is not None:
+            scrollbar.configure(command=self.tree.yview)
+
+    # Function to show a new list of rows; values are only computed for rows that get rendered
+    @metrics.timed("render_list")
+    def load(self, keys, make_values):
+        self.tree.delete(*self.tree.get_children())
+        self.keys = list(keys)
+        self.key_set = set(self.keys)
+        self.make_values = make_values
+        self.loaded = 0
+        self.load_more()
+
+    @metrics.timed("render")
+    def load_more(self):
+        self.load_pending = False
+        end = min(self.loaded + self.page_size, len(self.keys))
+        for key in self.keys[self.loaded:end]:
+            self.tree.insert("", "end", iid=key, values=self.make_values(key))
+        metrics.count("rows_rendered", end - self.loaded)
+        self.loaded = end
+
+    def on_scroll(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        if float(last) >= PREFETCH_AT and self.loaded < len(self.keys) and not self.load_pending:
+            self.load_pending = True
+            self.tree.after_idle(self.load_more)
+
+    def __contains__(self, key):
+        return key in self.key_set
+
+    # Function to refresh one row in place (no-op if that row has not been rendered yet)
+    def update(self, key):
+        if self.tree.exists(key):
+            self.tree.item(key, values=self.make_values(key))
+
+    # Function to add a row at the end; it is rendered now only if every earlier row already is
+    def append(self, key):
+        self.keys.append(key)
+        self.key_set.add(key)
+        if self.loaded == len(self.keys) - 1:
+            self.tree.insert("", "end", iid=key, values=self.make_values(key))
+            self.loaded += 1
@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import collections
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+import storage
+from benchmarks import all_student_ids, make_hostels
+from booking_service import HOST, PORT
+
+
+class Client:
+    # One keep-alive HTTP/1.1 connection to the booking service
+    def __init__(self, reader, writer, host):
+        self.reader = reader
+        self.writer = writer
+        self.host = host
+
+    @classmethod
+    async def connect(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, host)
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        self.writer.close()
+
+
+# Function to run the request mix from `concurrency` connections and collect (status, seconds) per request
+async def run_load(host, port, requests, concurrency, read_share, student_ids):
+    client = await Client.connect(host, port)
+    status, hostels = await client.request("GET", "/hostels")
+    rooms = []
+    for hostel in hostels[:50]:
+        status, rows = await client.request("GET", f"/hostels/{quote(hostel['name'])}/rooms")
+        rooms += [(hostel["name"], row["floor"], row["room"]) for row in rows]
+    client.close()
+
+    students = iter(student_ids)
+    results = []
+    counter = iter(range(requests))
+
+    async def desk(number):
+        connection = await Client.connect(host, port)
+        try:
+            for i in counter:
+                hostel_name, floor, room = rooms[(i * 7 + number) % len(rooms)]
+                if (i % 100) < read_share * 100:
+                    method, path, payload = "GET", f"/hostels/{quote(hostel_name)}/rooms?floor={quote(floor)}", None
+                else:
+                    method, path = "POST", "/bookings"
+                    student_id = next(students, f"unknown-{i}")
+                    payload = {"hostel": hostel_name, "floor": floor, "room": room, "student_id": student_id,
+                               "name": f"Student {i}"}
+                start = time.perf_counter()
+                status, body = await connection.request(method, path, payload)
+                results.append((method, status, time.perf_counter() - start))
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(desk(number) for number in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    # Every room the load touched must still be within capacity
+    client = await Client.connect(host, port)
+    overbooked = 0
+    for hostel in hostels[:50]:
+        status, rows = await client.request("GET", f"/hostels/{quote(hostel['name'])}/rooms")
+        overbooked += sum(1 for row in rows if row["booked"] > row["capacity"])
+    client.close()
+    return results, seconds, overbooked
+
+
+def print_report(results, seconds, overbooked):
+    print(f"{len(results)} requests in {seconds:.2f} s: {len(results) / seconds:.0f} req/s")
+    for method in sorted({method for method, status, latency in results}):
+        latencies = sorted(latency for kind, status, latency in results if kind == method)
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000
+        print(f"  {method:<6} {len(latencies):>7} requests  p50 {p50:8.2f} ms  p99 {p99:8.2f} ms")
+    statuses = collections.Counter(status for method, status, latency in results)
+    print("  status codes: " + ", ".join(f"{status} x {count}" for status, count in sorted(statuses.items())))
+    print(f"  overbooked rooms: {overbooked}")
+
+
+# Function to start booking_service.py on a throwaway copy of a generated dataset
+def spawn_service(directory, port, backend, hostel_count):
+    shutil.copy("college_ids.json", directory)
+    if backend == "sqlite":
+        target = storage.SqliteStorage(os.path.join(directory, storage.SQLITE_FILE))
+    else:
+        target = storage.JsonStorage(os.path.join(directory, storage.DATA_FILE),
+                                     os.path.join(directory, storage.STUDENT_BOOKINGS_FILE))
+    target.save_hostels(make_hostels(hostel_count))
+    target.close()
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "booking_service.py")
+    process = subprocess.Popen([sys.executable, script, "--port", str(port), "--storage", backend], cwd=directory,
+                               stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("booking_service.py did not start")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure requests/second and p99 latency of booking_service.py.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--read-share", type=float, default=0.5, help="fraction of requests that only read")
+    parser.add_argument("--spawn", choices=["json", "sqlite"],
+                        help="start a service on a generated dataset with this backend instead of using a running one")
+    parser.add_argument("--hostels", type=int, default=100, help="hostels in the generated dataset")
+    args = parser.parse_args()
+
+    process = None
+    directory = tempfile.mkdtemp() if args.spawn else None
+    try:
+        if args.spawn:
+            process = spawn_service(directory, args.port, args.spawn, args.hostels)
+        print_report(*asyncio.run(run_load(args.host, args.port, args.requests, args.concurrency, args.read_share,
+                                           all_student_ids())))
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGINT)  # The service stores queued writes before exiting
+            process.wait()
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
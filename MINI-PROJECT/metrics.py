@@ -0,0 +1,204 @@
+import bisect
+import contextlib
+import cProfile
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+METRICS_ENV = "HOSTEL_METRICS"  # Set to 1 to collect timings and counters (same as --metrics)
+PROFILE_ENV = "HOSTEL_PROFILE_DIR"  # Directory for one cProfile dump per booking (same as --profile-bookings)
+# Upper bounds of the latency histogram buckets, in seconds (anything slower lands in +Inf)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Checked on every instrumented call; while it is False a call costs one global lookup and a branch
+enabled = os.environ.get(METRICS_ENV, "") not in ("", "0")
+profile_dir = os.environ.get(PROFILE_ENV) or None
+
+_lock = threading.Lock()
+_histograms = {}  # operation -> Histogram
+_counters = {}  # counter name -> total
+_profile_numbers = itertools.count(1)
+_profiling = threading.local()  # Set while a profiled call runs on this thread, so nested ones are skipped
+
+
+class Histogram:
+    # Latency distribution of one operation in fixed buckets, plus count, sum and max
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    # Function to estimate a quantile as the upper bound of the bucket it falls in (capped at the max seen)
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+# Function to turn instrumentation on (from a CLI flag); profile_directory also captures cProfile dumps
+def enable(profile_directory=None):
+    global enabled, profile_dir
+    enabled = True
+    if profile_directory:
+        os.makedirs(profile_directory, exist_ok=True)
+        profile_dir = profile_directory
+
+
+def disable():
+    global enabled, profile_dir
+    enabled = False
+    profile_dir = None
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def observe(name, seconds):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+
+# Function to add to a counter such as bytes written or items scanned
+def count(name, amount=1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+# Decorator recording the latency of every call under name
+def timed(name):
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+# Context manager recording the latency of a block under name
+@contextlib.contextmanager
+def timer(name):
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+# Decorator writing one cProfile dump per call ("<name>-000001.prof") while a profile directory is set
+def profiled(name):
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if profile_dir is None or getattr(_profiling, "active", False):
+                return function(*args, **kwargs)
+            profile = cProfile.Profile()
+            _profiling.active = True
+            try:
+                return profile.runcall(function, *args, **kwargs)
+            finally:
+                _profiling.active = False
+                os.makedirs(profile_dir, exist_ok=True)
+                profile.dump_stats(os.path.join(profile_dir, f"{name}-{next(_profile_numbers):06d}.prof"))
+        return wrapper
+    return decorate
+
+
+# Rows of (operation, calls, p50 ms, p99 ms, max ms, total s) for the diagnostics view
+def latency_rows():
+    with _lock:
+        return [(name, histogram.count, round(histogram.quantile(0.5) * 1000, 3),
+                 round(histogram.quantile(0.99) * 1000, 3), round(histogram.max * 1000, 3), round(histogram.total, 4))
+                for name, histogram in sorted(_histograms.items())]
+
+
+def counter_rows():
+    with _lock:
+        return sorted(_counters.items())
+
+
+def snapshot():
+    with _lock:
+        return {
+            "enabled": enabled,
+            "buckets": list(BUCKETS),
+            "latency": {name: {"count": histogram.count, "sum": histogram.total, "max": histogram.max,
+                               "p50": histogram.quantile(0.5), "p99": histogram.quantile(0.99),
+                               "buckets": list(histogram.buckets)}
+                        for name, histogram in sorted(_histograms.items())},
+            "counters": dict(sorted(_counters.items())),
+        }
+
+
+# Function to render the metrics in the Prometheus text exposition format
+def prometheus_text():
+    data = snapshot()
+    lines = ["# HELP hostel_operation_seconds Latency of hostel operations.",
+             "# TYPE hostel_operation_seconds histogram"]
+    for name, histogram in data["latency"].items():
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), histogram["buckets"]):
+            cumulative += count
+            label = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'hostel_operation_seconds_bucket{{operation="{name}",le="{label}"}} {cumulative}')
+        lines.append(f'hostel_operation_seconds_sum{{operation="{name}"}} {histogram["sum"]}')
+        lines.append(f'hostel_operation_seconds_count{{operation="{name}"}} {histogram["count"]}')
+    for name, value in data["counters"].items():
+        lines.append(f"# TYPE hostel_{name}_total counter")
+        lines.append(f"hostel_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Function to write the metrics to path: Prometheus text for .prom/.txt, JSON otherwise
+def dump(path):
+    with open(path, "w") as file:
+        if path.endswith((".prom", ".txt")):
+            file.write(prometheus_text())
+        else:
+            json.dump(snapshot(), file, indent=4)
+
+
+# Function to add the --metrics, --metrics-file and --profile-bookings flags to a script's parser
+def add_arguments(parser):
+    parser.add_argument("--metrics", action="store_true", help=f"collect timings and counters (or set {METRICS_ENV}=1)")
+    parser.add_argument("--metrics-file", help="write the metrics here on exit (.json, or .prom for Prometheus text)")
+    parser.add_argument("--profile-bookings", metavar="DIR",
+                        help=f"write one cProfile dump per booking into DIR (or set {PROFILE_ENV})")
+
+
+def configure(args):
+    if args.metrics or args.metrics_file or args.profile_bookings:
+        enable(args.profile_bookings)
@@ -1,48 +1,36 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-import json
-import os
-
-DATA_FILE = "hostel_data.json"
-COLLEGE_IDS_FILE = "college_ids.json"  # File to store valid student IDs
-STUDENT_BOOKINGS_FILE = "student_bookings.json"  # File to store student booking details
-
-# Function to load valid student IDs from file
-def load_valid_ids():
-    valid_ids = []
-    try:
-        with open(COLLEGE_IDS_FILE, "r") as file:
-            data = json.load(file)  # Load the nested structure from the file
-            for year in data.values():  # Iterate through years
-                for department_data in year.values():  # Iterate through departments
-                    valid_ids.extend(department_data)  # Add all student IDs to valid_ids
-    except FileNotFoundError:
-        messagebox.showerror("Error", "The file containing student IDs was not found.")
-    return valid_ids
-
-# Function to load student bookings from file
-def load_student_bookings():
-    if os.path.exists(STUDENT_BOOKINGS_FILE):
-        with open(STUDENT_BOOKINGS_FILE, "r") as file:
-            return json.load(file)
-    return []
-
-# Function to save student bookings to a file
-def save_student_bookings(bookings):
-    with open(STUDENT_BOOKINGS_FILE, "w") as file:
-        json.dump(bookings, file, indent=4)
+from tkinter import ttk, messagebox, simpledialog, filedialog
+import argparse
+import metrics
+from analytics import AnalyticsReport
+from hostel_engine import HOSTELS_FOR, BookingError, HostelEngine
+from lazy_tree import LazyTreeFiller
+from persistence_worker import TkCallbacks, UiLatencyMonitor
+from search import MAX_RESULTS
+
+SEARCH_DELAY_MS = 80  # Pause in typing before the search results are refreshed
 
 class HostelManagementSystem:
-    def __init__(self, root):
+    def __init__(self, root, metrics_file=None):
         self.root = root
+        self.metrics_file = metrics_file  # Metrics are written here on close when instrumentation is on
         self.root.title("Hostel Management System")
         self.root.geometry("800x600")  # Set default window size
 
-        # Load hostel data and set up the UI
-        self.hostels = self.load_data()
+        # Booking engine over the storage backend (JSON files by default, HOSTEL_STORAGE=sqlite, journal or sharded)
+        self.engine = HostelEngine(lazy=True)  # Hostel summaries only; rooms are read when a hostel is opened
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)  # Flush storage on clean shutdown
+
+        # Saves run on a worker thread; results come back to this thread through root.after
+        self.callbacks = TkCallbacks(self.root)
+        self.worker = self.engine.start_worker(self.callbacks.schedule)
+        self.engine.start_tailer(self.callbacks.schedule)  # Picks up bookings stored at other desks
+        self.latency = UiLatencyMonitor(self.root)
+        self.latency.start()
 
-        # Load student bookings
-        self.student_bookings = load_student_bookings()
+        # Hostel data and the indexed student bookings, as loaded by the engine
+        self.hostels = self.engine.hostels
+        self.student_bookings = self.engine.bookings
 
         # Style configuration
         self.style = ttk.Style()
@@ -51,6 +39,11 @@ class HostelManagementSystem:
         self.style.configure("TLabel", font=("Helvetica", 12))
         self.style.configure("Treeview.Heading", font=("Helvetica", 14, "bold"))
 
+        # Status bar with pending saves and UI responsiveness
+        self.status_label = ttk.Label(self.root, text="", foreground="gray")
+        self.status_label.pack(side="bottom", fill="x", padx=10)
+        self.update_status()
+
         # Create Notebook (Tabs)
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill="both", expand=True, padx=10, pady=10)
@@ -58,6 +51,7 @@ class HostelManagementSystem:
         # Create Frames for each Tab
         self.view_rooms_frame = ttk.Frame(self.notebook)
         self.add_hostel_frame = ttk.Frame(self.notebook)
+        self.diagnostics_frame = ttk.Frame(self.notebook)  # Added once admin mode is entered
 
         # Add Frames to Tabs
         self.notebook.add(self.view_rooms_frame, text="View Rooms & Book")
@@ -75,13 +69,20 @@ class HostelManagementSystem:
         self.tree.heading("Hostel", text="Nearby Hostels")
         self.tree.heading("Distance", text="Distance (km)")
         self.tree.heading("Category", text="Category")
+        self.tree_scrollbar = ttk.Scrollbar(self.view_rooms_frame, orient="vertical")
+        self.tree_scrollbar.pack(side="right", fill="y", pady=10)
         self.tree.pack(fill="both", expand=True, padx=10, pady=10)
+        self.hostel_filler = LazyTreeFiller(self.tree, self.tree_scrollbar)  # Renders hostel rows page by page
 
         self.populate_hostel_list()
+        self.engine.feed.subscribe(self.show_changes)  # Hostels added here or at other desks
 
         self.view_rooms_button = ttk.Button(self.view_rooms_frame, text="View Rooms", command=self.view_rooms)
         self.view_rooms_button.pack(side="left", padx=10, pady=10)
 
+        self.auto_allocate_button = ttk.Button(self.view_rooms_frame, text="Auto Allocate", command=self.auto_allocate)
+        self.auto_allocate_button.pack(side="left", padx=10, pady=10)
+
         # Add Hostel Tab
         self.add_hostel_button = ttk.Button(self.add_hostel_frame, text="Add Hostel", command=self.add_hostel)
         self.add_hostel_button.pack(pady=20)
@@ -92,27 +93,64 @@ class HostelManagementSystem:
         self.check_booking_button.pack(pady=10)
         self.check_booking_button.config(state="disabled")  # Disable until correct code is entered
 
+        # Cancel a booking or move a booked student to another room
+        self.cancel_booking_button = ttk.Button(self.add_hostel_frame, text="Cancel Booking", command=self.cancel_booking)
+        self.cancel_booking_button.pack(pady=10)
+        self.cancel_booking_button.config(state="disabled")  # Disable until correct code is entered
+
+        self.transfer_button = ttk.Button(self.add_hostel_frame, text="Transfer Student", command=self.transfer_student)
+        self.transfer_button.pack(pady=10)
+        self.transfer_button.config(state="disabled")  # Disable until correct code is entered
+
+        # Search students by roll-number prefix, name or hostel / floor / room
+        self.search_button = ttk.Button(self.add_hostel_frame, text="Search Students", command=self.search_students)
+        self.search_button.pack(pady=10)
+        self.search_button.config(state="disabled")  # Disable until correct code is entered
+
+        # Occupancy, student mix and meal revenue reports
+        self.analytics_button = ttk.Button(self.add_hostel_frame, text="Analytics", command=self.show_analytics)
+        self.analytics_button.pack(pady=10)
+        self.analytics_button.config(state="disabled")  # Disable until correct code is entered
+
         # Add some helpful information
         self.info_label = ttk.Label(self.add_hostel_frame, text="Enter admin code in the 'View Rooms' tab to enable adding hostels.",
                                     foreground="blue")
         self.info_label.pack(pady=10)
 
-    def load_data(self):
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, "r") as file:
-                return json.load(file)
-        return {}
+        # Diagnostics Tab: latency histograms and counters from the metrics module
+        self.build_diagnostics_tab()
 
-    def save_data(self):
-        with open(DATA_FILE, "w") as file:
-            json.dump(self.hostels, file, indent=4)
+    def on_close(self):
+        self.engine.close()  # Waits for queued saves before closing the backend
+        if self.metrics_file and metrics.enabled:
+            metrics.dump(self.metrics_file)
+        self.root.destroy()
+
+    # Function to show queued saves and how late the Tk event loop has been running
+    def update_status(self):
+        lag_p99, lag_max = self.latency.summary()
+        slowest = f"{max(self.worker.write_times) * 1000:.0f} ms" if self.worker.write_times else "-"
+        self.status_label.config(text=f"Pending saves: {self.worker.pending()}   Slowest save: {slowest}   "
+                                      f"UI lag p99: {lag_p99:.0f} ms (max {lag_max:.0f} ms)")
+        self.root.after(1000, self.update_status)
 
     def populate_hostel_list(self):
-        self.tree.delete(*self.tree.get_children())
-        for hostel, info in self.hostels.items():
-            distance = info.get("distance", "N/A")
-            category = info.get("category", "N/A")
-            self.tree.insert("", "end", values=(hostel, distance, category))
+        self.hostel_filler.load(self.hostels, self.engine.hostel_row)
+
+    # Function to add rows only for hostels the list does not show yet
+    def append_new_hostels(self):
+        for hostel_name in self.hostels:
+            if hostel_name not in self.hostel_filler:
+                self.hostel_filler.append(hostel_name)
+
+    # Function to add or refresh only the hostel rows named in a batch of change-feed deltas
+    def show_changes(self, deltas):
+        for delta in deltas:
+            if delta[0] == "hostel" and delta[1] in self.hostels:
+                if delta[1] in self.hostel_filler:
+                    self.hostel_filler.update(delta[1])
+                else:
+                    self.hostel_filler.append(delta[1])
 
     def check_admin_code(self):
         entered_code = self.admin_code_entry.get()
@@ -130,15 +168,83 @@ class HostelManagementSystem:
         self.notebook.select(self.add_hostel_frame)
         self.add_hostel_button.config(state="normal")  # Enable Add Hostel button
         self.check_booking_button.config(state="normal")  # Enable Check Student Booking button
-
+        self.cancel_booking_button.config(state="normal")  # Enable Cancel Booking button
+        self.transfer_button.config(state="normal")  # Enable Transfer Student button
+        self.search_button.config(state="normal")  # Enable Search Students button
+        self.notebook.add(self.diagnostics_frame, text="Diagnostics")  # Show the Diagnostics tab
+        self.refresh_diagnostics()
+        self.analytics_button.config(state="normal")  # Enable Analytics button
+
+
+    def build_diagnostics_tab(self):
+        if not metrics.enabled:
+            ttk.Label(self.diagnostics_frame, text=f"Start with --metrics (or set {metrics.METRICS_ENV}=1) to collect "
+                                                   "timings, bytes written and items scanned.",
+                      foreground="blue").pack(pady=20)
+            return
+        columns = ("Metric", "Calls", "p50 ms", "p99 ms", "Max ms", "Total s")
+        self.diagnostics_tree = ttk.Treeview(self.diagnostics_frame, columns=columns, show='headings')
+        for column in columns:
+            self.diagnostics_tree.heading(column, text=column)
+            self.diagnostics_tree.column(column, width=110)
+        self.diagnostics_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        self.dump_metrics_button = ttk.Button(self.diagnostics_frame, text="Dump Metrics", command=self.dump_metrics)
+        self.dump_metrics_button.pack(pady=10)
+
+    # Function to redraw the metrics once a second while the window is open
+    def refresh_diagnostics(self):
+        if not metrics.enabled:
+            return
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        for row in metrics.latency_rows():
+            self.diagnostics_tree.insert("", "end", values=row)
+        for name, value in metrics.counter_rows():
+            self.diagnostics_tree.insert("", "end", values=(name.replace("_", " "), value, "", "", "", ""))
+        self.root.after(1000, self.refresh_diagnostics)
+
+    def dump_metrics(self):
+        path = filedialog.asksaveasfilename(defaultextension=".json", initialfile="hostel_metrics.json",
+                                            filetypes=[("JSON", "*.json"), ("Prometheus text", "*.prom")])
+        if not path:
+            return
+        metrics.dump(path)
+        messagebox.showinfo("Metrics Saved", f"Saved the metrics to {path}")
 
     def view_rooms(self):
         selected_item = self.tree.selection()
         if not selected_item:
             messagebox.showwarning("Warning", "Please select a hostel!")
             return
-        hostel_name = self.tree.item(selected_item, "values")[0]
-        RoomWindow(self.root, hostel_name, self.hostels[hostel_name]["floors"], self.save_data, self.student_bookings)
+        hostel_name = selected_item[0]  # Rows use the hostel name as their id; values turn "101" into 101
+        RoomWindow(self.root, hostel_name, self.engine)
+
+    def auto_allocate(self):
+        student_id = simpledialog.askstring("Student ID", "Enter Student ID:")
+        if not student_id:
+            return
+        student_name = simpledialog.askstring("Student Name", "Enter Student Name:")
+        if not student_name:
+            messagebox.showwarning("Warning", "Student name cannot be empty!")
+            return
+        category = simpledialog.askstring("Category", "Enter the student's category (Boys, Girls):")
+        if category not in HOSTELS_FOR:
+            messagebox.showwarning("Warning", "Category must be one of Boys, Girls!")
+            return
+
+        def saved(error):
+            if error is not None:
+                messagebox.showwarning("Warning", str(error))
+                return
+            booking = self.engine.find_booking(student_id)
+            messagebox.showinfo("Booking Confirmed", f"Student ID: {student_id}\n"
+                                                     f"Hostel: {booking['hostel_name']}\n"
+                                                     f"Floor: {booking['floor']}\n"
+                                                     f"Room: {booking['room']}")
+
+        try:
+            self.engine.submit_allocate(student_id, student_name, category, done=saved)
+        except BookingError as error:
+            messagebox.showwarning("Warning", str(error))
 
     def add_hostel(self):
         hostel_name = simpledialog.askstring("Hostel Name", "Enter the name of the new hostel:")
@@ -158,42 +264,30 @@ class HostelManagementSystem:
         standard_num_rooms = simpledialog.askinteger("Standard Number of Rooms", "Enter the standard number of rooms per floor:", minvalue=1)
         standard_capacity = simpledialog.askinteger("Standard Capacity", "Enter the standard capacity for each room:", minvalue=1)
 
-        floors = {}
-        for i in range(num_floors):
-            floor_name = f"Floor {i + 1}"
-            floors[floor_name] = {
-                f"Room {j + 1}": {
-                    "status": "available",
-                    "capacity": standard_capacity,
-                    "occupants": []
-                } for j in range(standard_num_rooms)
-            }
-
         distance = simpledialog.askfloat("Distance", "Enter the distance from the college (in km):")
         category = simpledialog.askstring("Category", "Enter the category (Boys, Girls, Mixed):")
-        if category not in ["Boys", "Girls", "Mixed"]:
-            messagebox.showwarning("Warning", "Category must be one of Boys, Girls, Mixed!")
+
+        def saved(error):
+            if error is not None:
+                messagebox.showwarning("Warning", str(error))
+                self.populate_hostel_list()  # The hostel was dropped again
+                return
+            self.append_new_hostels()  # Hostels other desks added meanwhile
+
+        try:
+            self.engine.submit_add_hostel(hostel_name, num_floors, standard_num_rooms, standard_capacity, distance,
+                                          category, done=saved)
+        except BookingError as error:
+            messagebox.showwarning("Warning", str(error))
             return
-        
-        self.hostels[hostel_name] = {
-            "distance": distance,
-            "category": category,
-            "floors": floors
-        }
-        self.save_data()
-        self.populate_hostel_list()
+        self.append_new_hostels()
 
     def check_student_booking(self):
         student_id = simpledialog.askstring("Student ID", "Enter Student ID:")
         if not student_id:
             return
         
-        booking_found = None
-        for booking in self.student_bookings:
-            if booking["student_id"] == student_id:
-                booking_found = booking
-                break
-        
+        booking_found = self.engine.find_booking(student_id)
         if booking_found:
             messagebox.showinfo("Booking Found", f"Student ID: {student_id}\n"
                                                  f"Hostel: {booking_found['hostel_name']}\n"
@@ -202,13 +296,158 @@ class HostelManagementSystem:
         else:
             messagebox.showwarning("Booking Not Found", "No booking found for this Student ID.")
 
+    def cancel_booking(self):
+        student_id = simpledialog.askstring("Student ID", "Enter Student ID:")
+        if not student_id:
+            return
+
+        booking = self.engine.find_booking(student_id)
+        if booking is None:
+            messagebox.showwarning("Booking Not Found", "No booking found for this Student ID.")
+            return
+        if not messagebox.askyesno("Cancel Booking", f"Cancel the booking of {student_id} in "
+                                                     f"{booking['hostel_name']} / {booking['floor']} / {booking['room']}?"):
+            return
+
+        def saved(error):
+            if error is not None:
+                messagebox.showwarning("Warning", str(error))
+                return
+            messagebox.showinfo("Booking Cancelled", f"Booking cancelled for Student ID: {student_id}")
+
+        try:
+            self.engine.submit_cancel(student_id, done=saved)
+        except BookingError as error:
+            messagebox.showwarning("Warning", str(error))
+
+    def transfer_student(self):
+        student_id = simpledialog.askstring("Student ID", "Enter Student ID:")
+        if not student_id:
+            return
+        if self.engine.find_booking(student_id) is None:
+            messagebox.showwarning("Booking Not Found", "No booking found for this Student ID.")
+            return
+
+        hostel_name = simpledialog.askstring("Hostel", "Enter the hostel to move the student to:")
+        floor = simpledialog.askstring("Floor", "Enter the floor:")
+        room = simpledialog.askstring("Room", "Enter the room:")
+        if not (hostel_name and floor and room):
+            messagebox.showwarning("Warning", "Hostel, floor and room are all needed!")
+            return
+
+        def saved(error):
+            if error is not None:
+                messagebox.showwarning("Warning", str(error))
+                return
+            messagebox.showinfo("Transfer Confirmed", f"Student ID: {student_id}\n"
+                                                      f"Hostel: {hostel_name}\n"
+                                                      f"Floor: {floor}\n"
+                                                      f"Room: {room}")
+
+        try:
+            self.engine.submit_transfer(student_id, hostel_name, floor, room, done=saved)
+        except BookingError as error:
+            messagebox.showwarning("Warning", str(error))
+
+    def search_students(self):
+        SearchWindow(self.root, self.engine)
+
+    def show_analytics(self):
+        AnalyticsWindow(self.root, self.engine.analytics())
+
+class SearchWindow:
+    def __init__(self, root, engine):
+        self.engine = engine
+        self.pending_search = None
+
+        # Set up the search window: results follow the query as it is typed
+        self.window = tk.Toplevel(root)
+        self.window.title("Search Students")
+        self.window.geometry("800x450")
+
+        self.query_label = ttk.Label(self.window, text="Roll number prefix (1602-23-737), name, or hostel / floor / room:")
+        self.query_label.pack(pady=5)
+        self.query_entry = ttk.Entry(self.window, width=50)
+        self.query_entry.pack(pady=5)
+        self.query_entry.bind("<KeyRelease>", self.schedule_search)
+        self.query_entry.focus_set()
+
+        columns = ("Student ID", "Name", "Hostel", "Floor", "Room")
+        self.result_tree = ttk.Treeview(self.window, columns=columns, show='headings')
+        for column in columns:
+            self.result_tree.heading(column, text=column)
+            self.result_tree.column(column, width=140)
+        self.result_scrollbar = ttk.Scrollbar(self.window, orient="vertical")
+        self.result_scrollbar.pack(side="right", fill="y")
+        self.result_tree.pack(fill="both", expand=True, padx=10)
+        self.result_filler = LazyTreeFiller(self.result_tree, self.result_scrollbar)  # Broad prefixes match thousands
+
+        self.count_label = ttk.Label(self.window, text="", foreground="gray")
+        self.count_label.pack(pady=5)
+
+    # Function to search once typing pauses, so a burst of keys runs one query
+    def schedule_search(self, event=None):
+        if self.pending_search is not None:
+            self.window.after_cancel(self.pending_search)
+        self.pending_search = self.window.after(SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        self.pending_search = None
+        results = self.engine.search(self.query_entry.get())
+        self.result_filler.load(results, self.engine.booking_row)
+        limit = " (showing the first matches)" if len(results) >= MAX_RESULTS else ""
+        self.count_label.config(text=f"{len(results)} students found{limit}")
+
+class AnalyticsWindow:
+    def __init__(self, root, report):
+        self.report = report
+
+        # Set up the analytics window with one tab per report section
+        self.window = tk.Toplevel(root)
+        self.window.title("Hostel Analytics")
+        self.window.geometry("900x500")
+
+        self.summary_label = ttk.Label(self.window, text=report.summary())
+        self.summary_label.pack(pady=5)
+
+        self.notebook = ttk.Notebook(self.window)
+        self.notebook.pack(fill="both", expand=True, padx=10, pady=5)
+        self.fillers = []
+        self.sections = list(AnalyticsReport.SECTIONS)
+        for section in self.sections:
+            frame = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=section.capitalize())
+            columns = AnalyticsReport.SECTIONS[section]
+            tree = ttk.Treeview(frame, columns=columns, show='headings')
+            for column in columns:
+                tree.heading(column, text=column.replace("_", " ").capitalize())
+                tree.column(column, width=90)
+            scrollbar = ttk.Scrollbar(frame, orient="vertical")
+            scrollbar.pack(side="right", fill="y")
+            tree.pack(fill="both", expand=True)
+            filler = LazyTreeFiller(tree, scrollbar)  # Floor reports can run to thousands of rows
+            rows = report.rows(section)
+            filler.load([str(i) for i in range(len(rows))], lambda key, rows=rows: rows[int(key)])
+            self.fillers.append(filler)
+
+        self.export_button = ttk.Button(self.window, text="Export CSV", command=self.export_csv)
+        self.export_button.pack(pady=10)
+
+    def export_csv(self):
+        section = self.sections[self.notebook.index(self.notebook.select())]
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".csv",
+                                            initialfile=f"{section}.csv", filetypes=[("CSV files", "*.csv")])
+        if not path:
+            return
+        self.report.export_csv(path, section)
+        messagebox.showinfo("Export Complete", f"Saved the {section} report to {path}", parent=self.window)
+
 class RoomWindow:
-    def __init__(self, root, hostel_name, floors, save_callback, student_bookings):
+    def __init__(self, root, hostel_name, engine):
         self.root = root
         self.hostel_name = hostel_name
-        self.floors = floors
-        self.save_callback = save_callback
-        self.student_bookings = student_bookings
+        self.engine = engine
+        self.floors = engine.hostels[hostel_name]["floors"]
 
         # Set up the room view window
         self.room_window = tk.Toplevel(self.root)
@@ -226,77 +465,78 @@ class RoomWindow:
         self.room_tree.heading("Booked", text="Booked")
         self.room_tree.heading("Remaining", text="Remaining")
         self.room_tree.heading("Capacity", text="Capacity")
+        self.room_scrollbar = ttk.Scrollbar(self.room_window, orient="vertical")
+        self.room_scrollbar.pack(side="right", fill="y")
         self.room_tree.pack(fill="both", expand=True)
+        self.room_filler = LazyTreeFiller(self.room_tree, self.room_scrollbar)  # Large floors render page by page
 
         self.floor_list.bind("<<ListboxSelect>>", self.populate_room_list)
+        self.shown_floor = None
+        # Rooms booked in other windows or at other desks are redrawn row by row while this window is open
+        self.subscription = self.engine.feed.subscribe(self.show_changes)
+        self.room_tree.bind("<Destroy>", lambda event: self.engine.feed.unsubscribe(self.subscription))
         self.book_room_button = tk.Button(self.room_window, text="Book Room", command=self.open_booking_window)
         self.book_room_button.pack(pady=10)
 
     def populate_room_list(self, event=None):
         try:
             selected_floor = self.floor_list.get(self.floor_list.curselection())
-            rooms = self.floors[selected_floor]
-            self.room_tree.delete(*self.room_tree.get_children())
-            for room, info in rooms.items():
-                booked = len(info["occupants"])
-                remaining = info["capacity"] - booked
-                status = "Fully Booked" if remaining == 0 else "Available"
-                self.room_tree.insert("", "end", values=(room, status, booked, remaining, info["capacity"]))
+            self.room_filler.load(self.floors[selected_floor],
+                                  lambda room: self.engine.room_row(self.hostel_name, selected_floor, room))
+            self.shown_floor = selected_floor
         except tk.TclError:
             pass
 
+    def show_changes(self, deltas):
+        for delta in deltas:
+            if delta[0] == "room" and delta[1] == self.hostel_name and delta[2] == self.shown_floor:
+                self.room_filler.update(delta[3])
+
     def open_booking_window(self):
         try:
             selected_floor = self.floor_list.get(self.floor_list.curselection())
-            selected_room = self.room_tree.item(self.room_tree.selection())["values"][0]
+            selected_room = self.room_tree.selection()[0]  # Rows use the room name as their id
             room_data = self.floors[selected_floor][selected_room]
+            # The room as the operator sees it now; the booking is refused if another desk changes it meanwhile
+            version = self.engine.room_version(self.hostel_name, selected_floor, selected_room)
 
-            if room_data["capacity"] == len(room_data["occupants"]):
+            if room_data["capacity"] <= len(room_data["occupants"]) + \
+                    self.engine.free_beds.held_beds(self.hostel_name, selected_floor, selected_room):
                 messagebox.showwarning("Warning", "Room is fully booked!")
                 return
 
             student_id = simpledialog.askstring("Student ID", "Enter Student ID:")
 
-            # Check if the student ID is valid
-            if student_id not in load_valid_ids():
-                messagebox.showwarning("Warning", "Invalid Student ID!")
-                return
-
-            # Check if the student already has any booking in the hostel
-            if any(booking["student_id"] == student_id for booking in self.student_bookings):
-                messagebox.showwarning("Warning", "Student has already booked a room!")
+            # Check the ID and any existing booking before asking for the name
+            try:
+                self.engine.check_student(self.hostel_name, selected_floor, selected_room, student_id)
+            except BookingError as error:
+                messagebox.showwarning("Warning", str(error))
                 return
 
-            # Check if the student has already booked this particular room
-            # Check if the student has already booked this particular room
-            if student_id in room_data["occupants"]:
-                messagebox.showwarning("Warning", "Student has already booked this room!")
-                return
-
-
             student_name = simpledialog.askstring("Student Name", "Enter Student Name:")
             if not student_name:
                 messagebox.showwarning("Warning", "Student name cannot be empty!")
                 return
 
-            # Add student to room occupants
-            room_data["occupants"].append({"id": student_id, "name": student_name})
-            self.save_callback()  # Save the updated data
-            self.populate_room_list()
-
-            # Save booking details to a separate file
-            booking_details = {
-                "student_id": student_id,
-                "student_name": student_name,
-                "hostel_name": self.hostel_name,  # Use self.hostel_name here
-                "room": selected_room,
-                "floor": selected_floor
-            }
-            self.student_bookings.append(booking_details)
-            save_student_bookings(self.student_bookings)
-
-            # Display a confirmation message
-            messagebox.showinfo("Booking Confirmed", f"Room booked successfully for Student ID: {student_id}, Name: {student_name}")
+            # Called on this thread once the save finished; storage re-checks the room under the shared lock
+            def saved(error):
+                if not self.room_window.winfo_exists():
+                    return
+                self.room_filler.update(selected_room)  # Show the room as it is now stored
+                if error is not None:
+                    messagebox.showwarning("Warning", str(error), parent=self.room_window)
+                    return
+                # Display a confirmation message
+                messagebox.showinfo("Booking Confirmed", f"Room booked successfully for Student ID: {student_id}, Name: {student_name}",
+                                    parent=self.room_window)
+
+            # Validate now and save on the worker thread; this also adds the student to the room occupants
+            try:
+                self.engine.submit_booking(self.hostel_name, selected_floor, selected_room, student_id, student_name,
+                                           expected_version=version, done=saved)
+            except BookingError as error:
+                messagebox.showwarning("Warning", str(error))
 
         except IndexError:
             messagebox.showwarning("Warning", "No room selected!")
@@ -304,6 +544,11 @@ class RoomWindow:
 
 # Main program
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hostel Management System")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.configure(args)
+
     root = tk.Tk()
-    app = HostelManagementSystem(root)
+    app = HostelManagementSystem(root, args.metrics_file)
     root.mainloop() 
\ No newline at end of file
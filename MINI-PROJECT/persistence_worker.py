@@ -0,0 +1,218 @@
+import collections
+import copy
+import queue
+import threading
+import time
+
+import metrics
+
+COALESCE_WINDOW = 0.05  # Seconds to wait for more bookings before writing a batch
+MAX_BATCH = 500  # Bookings folded into one write at most
+HEARTBEAT_MS = 100  # Interval of the UI latency probe
+POLL_MS = 20  # How often the Tk thread picks up finished writes
+
+
+class PersistenceWorker:
+    # Runs storage writes on a background thread so the Tk mainloop never waits on disk.
+    # Bursts of bookings are folded into one add_bookings() call; results come back through
+    # schedule(callback), which for Tk is a root.after(0, ...) wrapper.
+    def __init__(self, storage, schedule):
+        self.storage = storage
+        self.schedule = schedule
+        self.queue = queue.Queue()
+        self.write_times = collections.deque(maxlen=1000)  # Seconds per storage write
+        self.batches = 0
+        self.refused = collections.Counter()  # Room -> queued writes to it that storage refused
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    # op is ("book", (entries, versions, refused), shadow), ("cancel", args, shadow), ("transfer", args, shadow)
+    # or ("add_hostel", hostel_name, shadow); refused holds, per entry, how many refused writes to its room
+    # the caller had heard about when it read the expected version.
+    # shadow holds private copies of the rooms/hostels the write may refresh
+    def submit(self, op, done):
+        self.queue.put((op, done))
+
+    def pending(self):
+        return self.queue.unfinished_tasks
+
+    # Function to block until every queued write has been stored (used on window close)
+    def flush(self):
+        self.queue.join()
+
+    def stop(self):
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        held = collections.deque()  # Item taken off the queue while collecting a batch, handled next
+        while True:
+            item = held.popleft() if held else self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            batch = [item]
+            if item[0][0] == "book":
+                batch += self._collect_bookings(held)
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _collect_bookings(self, held):
+        batch = []
+        deadline = time.monotonic() + COALESCE_WINDOW
+        while len(batch) < MAX_BATCH:
+            try:
+                item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is None or item[0][0] != "book":
+                held.append(item)  # Not a booking; it runs right after this batch, ahead of later submissions
+                break
+            batch.append(item)
+        return batch
+
+    @metrics.timed("worker_write")
+    @metrics.profiled("save")
+    def _write(self, batch):
+        if len(batch) > 1:
+            entries = []
+            versions = []
+            shadow = {}
+            for (kind, payload, op_shadow), done in batch:
+                entries += payload[0]
+                versions += self._expected(*payload) or [None] * len(payload[0])
+                merge_shadow(shadow, op_shadow)
+            try:
+                self._timed(self.storage.add_bookings, shadow, None, entries, versions)
+            except Exception:
+                pass  # One of them was rejected; store them one by one so the rest still land
+            else:
+                for (kind, payload, op_shadow), done in batch:
+                    copy_shadow(shadow, op_shadow)
+                    self._deliver(done, None)
+                return
+
+        for op, done in batch:
+            try:
+                kind, payload, shadow = op
+                if kind == "book":
+                    self._timed(self.storage.add_bookings, shadow, None, payload[0], self._expected(*payload))
+                elif kind == "cancel":
+                    self._timed(self.storage.cancel_booking, shadow, None, *payload)
+                elif kind == "transfer":
+                    self._timed(self.storage.transfer_booking, shadow, None, *payload)
+                elif kind == "add_hostel":
+                    self._timed(self.storage.add_hostel, shadow, payload)
+                error = None
+            except Exception as exc:
+                error = exc
+                self.refused.update(room_keys(kind, payload))
+            self._deliver(done, error)
+
+    # Function to correct the versions a queued booking expects: each one counted on the writes queued
+    # ahead of it, so every refusal since the caller read the version leaves the room one version behind
+    def _expected(self, entries, versions, refused):
+        if versions is None:
+            return None
+        return [version if version is None else version - (self.refused[entry[:3]] - seen)
+                for entry, version, seen in zip(entries, versions, refused)]
+
+    def _deliver(self, done, error):
+        try:
+            self.schedule(lambda: done(error))
+        except RuntimeError:
+            pass  # The caller's event loop is already gone; the write itself has been stored
+
+    def _timed(self, write, *args):
+        start = time.perf_counter()
+        try:
+            write(*args)
+        finally:
+            self.write_times.append(time.perf_counter() - start)
+            self.batches += 1
+
+
+# Function to list the (hostel, floor, room) keys whose versions one operation bumps
+def room_keys(kind, payload):
+    if kind == "book":
+        return [entry[:3] for entry in payload[0]]
+    if kind == "cancel":
+        return [payload[:3]]
+    if kind == "transfer":
+        return [payload[1], payload[2]]
+    return []
+
+
+# Function to fold one operation's shadow rooms into a batch shadow (earliest copy of each room wins).
+# Rooms are copied so a batch that fails halfway leaves every operation's own shadow untouched.
+def merge_shadow(target, shadow):
+    for hostel_name, info in shadow.items():
+        floors = target.setdefault(hostel_name, {"floors": {}})["floors"]
+        for floor, rooms in info["floors"].items():
+            floor_rooms = floors.setdefault(floor, {})
+            for room, room_data in rooms.items():
+                if room not in floor_rooms:
+                    floor_rooms[room] = copy.deepcopy(room_data)
+
+
+# Function to copy the refreshed rooms of a batch shadow back into one operation's shadow
+def copy_shadow(source, shadow):
+    for hostel_name, info in shadow.items():
+        for floor, rooms in info["floors"].items():
+            for room in rooms:
+                rooms[room] = source[hostel_name]["floors"][floor][room]
+
+
+class TkCallbacks:
+    # Hands callbacks from the worker thread to the Tk thread; Tk itself is only touched from root.after
+    def __init__(self, root, interval_ms=POLL_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.callbacks = queue.SimpleQueue()
+        self.root.after(self.interval_ms, self._poll)
+
+    # Safe to call from any thread
+    def schedule(self, callback):
+        self.callbacks.put(callback)
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    callback = self.callbacks.get_nowait()
+                except queue.Empty:
+                    break
+                callback()
+        finally:
+            self.root.after(self.interval_ms, self._poll)  # Keep polling even if a callback raised
+
+
+class UiLatencyMonitor:
+    # Schedules a callback every HEARTBEAT_MS and records how late it fires;
+    # a blocked Tk mainloop shows up directly as lag
+    def __init__(self, root, interval_ms=HEARTBEAT_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.samples = collections.deque(maxlen=600)  # Lag in milliseconds, about a minute of history
+        self.expected = None
+
+    def start(self):
+        self.expected = time.perf_counter() + self.interval_ms / 1000
+        self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        now = time.perf_counter()
+        self.samples.append(max((now - self.expected) * 1000, 0.0))
+        self.expected = now + self.interval_ms / 1000
+        self.root.after(self.interval_ms, self._tick)
+
+    # Function to report (p99, max) lag in milliseconds over the recent samples
+    def summary(self):
+        if not self.samples:
+            return 0.0, 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)], ordered[-1]
@@ -0,0 +1,336 @@
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import sqlite3
+import sys
+
+import metrics
+from storage import COMMIT_FILE, DATA_FILE, STUDENT_BOOKINGS_FILE, FileLock, commit_temp_files, fsync_dir, \
+    recover_commit
+
+SCHEMA_VERSION = 2  # Stored per hostel as "schema"; files written before it count as version 1
+SCHEMA_KEY = "schema"
+CATEGORIES = ["Boys", "Girls", "Mixed"]
+MEAL_CHOICES = ["Veg", "Non-Veg"]
+PRICE_KEYS = ("veg_price", "non_veg_price")
+CHUNK_SIZE = 1 << 20  # Characters read from the data file at a time
+BATCH_HOSTELS = 16  # Hostels handed to a worker process per task
+WHITESPACE = " \t\n\r"
+
+# Version 2 is the shape both apps can read:
+#   {"distance": number or null, "category": "Boys" | "Girls" | "Mixed", "schema": 2,
+#    "floors": {floor: {room: {"status", "capacity": int >= 1, "occupants": [{"id", "name"?, "meal"?}],
+#                              "veg_price"?, "non_veg_price"? (both or neither), "version"?: int >= 0}}}}
+# new_hostel.py wrote {"id", "name"} occupants and no prices; Hostel_final.py wrote {"id", "meal"} occupants
+# and per-room prices. Upgrading fills in what one shape lacks, turns bare-string occupants and numbers
+# stored as text into the proper types, and reports whatever cannot be repaired without changing it.
+
+
+class StreamReader:
+    # Reads the top-level {"hostel": {...}, ...} object of a data file one hostel at a time with
+    # JSONDecoder.raw_decode. Only the hostel being decoded and one chunk are held in memory, so memory
+    # follows the largest hostel rather than the size of the file.
+    decoder = json.JSONDecoder()
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.consumed = 0  # Characters dropped from the front of the buffer so far
+        self.eof = False
+
+    def _more(self, size=None):
+        chunk = self.file.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.consumed += self.position
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def _skip_space(self):
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer) or not self._more():
+                return
+
+    def _expect(self, characters):
+        self._skip_space()
+        if self.position >= len(self.buffer) or self.buffer[self.position] not in characters:
+            raise ValueError(f"Expected {' or '.join(characters)} at character {self.consumed + self.position}")
+        self.position += 1
+        return self.buffer[self.position - 1]
+
+    # Function to decode the next JSON value; the read size doubles while a value spans chunks
+    def _value(self):
+        self._skip_space()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                end = None
+            if end is not None and (end < len(self.buffer) or self.eof):
+                self.position = end
+                return value
+            if not self._more(max(self.chunk_size, len(self.buffer) - self.position)):
+                if end is not None:
+                    self.position = end
+                    return value
+                raise ValueError(f"Damaged JSON at character {self.consumed + self.position}")
+
+    def __iter__(self):
+        self._expect("{")
+        self._skip_space()
+        if self.buffer[self.position:self.position + 1] == "}":
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected a hostel name at character {self.consumed + self.position}")
+            self._expect(":")
+            yield key, self._value()
+            if self._expect(",}") == "}":
+                return
+
+
+def _number(value, kind):
+    if isinstance(value, str):
+        try:
+            return kind(value.strip())
+        except ValueError:
+            return value
+    return value
+
+
+# Function to bring one room to the current shape; returns (room, problems) where problems are messages
+def migrate_room(room_data):
+    if not isinstance(room_data, dict):
+        return room_data, ["Room is not an object"]
+    problems = []
+    room = dict(room_data)
+    room.setdefault("status", "available")
+    room["capacity"] = _number(room.get("capacity"), int)
+    if not isinstance(room["capacity"], int) or isinstance(room["capacity"], bool) or room["capacity"] < 1:
+        problems.append(f"Capacity {room_data.get('capacity')!r} is not a positive whole number")
+
+    occupants = room.get("occupants", [])
+    if not isinstance(occupants, list):
+        return room_data, problems + ["Occupants are not a list"]
+    room["occupants"] = []
+    seen = set()
+    for occupant in occupants:
+        if isinstance(occupant, str):
+            occupant = {"id": occupant}  # Bare student ID
+        if not isinstance(occupant, dict) or not isinstance(occupant.get("id"), str) or not occupant["id"]:
+            problems.append(f"Occupant {occupant!r} has no student ID")
+            room["occupants"].append(occupant)
+            continue
+        occupant = dict(occupant)
+        if not occupant.get("name"):
+            occupant.pop("name", None)
+        if occupant.get("meal") is None:
+            occupant.pop("meal", None)
+        elif occupant["meal"] not in MEAL_CHOICES:
+            problems.append(f"Occupant {occupant['id']} has meal choice {occupant['meal']!r}")
+        if occupant["id"] in seen:
+            problems.append(f"Occupant {occupant['id']} is listed twice")
+        seen.add(occupant["id"])
+        room["occupants"].append(occupant)
+    if isinstance(room["capacity"], int) and len(room["occupants"]) > room["capacity"]:
+        problems.append(f"{len(room['occupants'])} occupants in a room for {room['capacity']}")
+
+    if any(key in room for key in PRICE_KEYS):
+        for key in PRICE_KEYS:
+            room[key] = _number(room.get(key), float)
+            if room[key] is not None and not isinstance(room[key], (int, float)):
+                problems.append(f"{key} {room[key]!r} is not a number")
+    version = room.get("version", 0)
+    if not isinstance(version, int) or version < 0:
+        problems.append(f"Version {version!r} is not a whole number")
+    return room, problems
+
+
+# Function to bring one hostel to the current shape. Returns (hostel, problems, occupants) where
+# problems are (floor, room, message) and occupants (student_id, floor, room) for the cross-hostel check.
+# Anything that cannot be repaired is reported and left as it was.
+def migrate_hostel(info):
+    if not isinstance(info, dict) or not isinstance(info.get("floors"), dict):
+        return info, [(None, None, "Hostel has no floors")], []
+    problems = []
+    hostel = {key: value for key, value in info.items() if key not in ("floors", SCHEMA_KEY)}
+    hostel["distance"] = _number(hostel.get("distance"), float)
+    if hostel["distance"] is not None and not isinstance(hostel["distance"], (int, float)):
+        problems.append((None, None, f"Distance {hostel['distance']!r} is not a number"))
+    if hostel.get("category") not in CATEGORIES:
+        problems.append((None, None, f"Category {hostel.get('category')!r} is not one of {', '.join(CATEGORIES)}"))
+    floors = {}
+    occupants = []
+    for floor, rooms in info["floors"].items():
+        if not isinstance(rooms, dict):
+            problems.append((floor, None, "Floor is not an object"))
+            floors[floor] = rooms
+            continue
+        floors[floor] = {}
+        for room, room_data in rooms.items():
+            floors[floor][room], room_problems = migrate_room(room_data)
+            problems += [(floor, room, message) for message in room_problems]
+            for occupant in floors[floor][room].get("occupants", []) if isinstance(floors[floor][room], dict) else []:
+                if isinstance(occupant, dict) and isinstance(occupant.get("id"), str):
+                    occupants.append((occupant["id"], floor, room))
+    if not problems:
+        hostel[SCHEMA_KEY] = SCHEMA_VERSION  # Only a hostel that checked clean is stamped, so it is skipped next time
+    hostel["floors"] = floors
+    return hostel, problems, occupants
+
+
+# Function to migrate a batch of (hostel_name, info) pairs and serialise each hostel the way
+# json.dump(..., indent=4) lays it out inside the whole file (runs in the worker processes)
+def migrate_batch(batch):
+    results = []
+    for hostel_name, info in batch:
+        hostel, problems, occupants = migrate_hostel(info)
+        text = json.dumps(hostel, indent=4).replace("\n", "\n    ")  # Newlines in strings are escaped
+        rooms = sum(len(floor_rooms) for floor_rooms in hostel["floors"].values() if isinstance(floor_rooms, dict)) \
+            if isinstance(hostel, dict) and isinstance(hostel.get("floors"), dict) else 0
+        results.append((hostel_name, text, rooms, info == hostel, problems, occupants))
+    return results
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Function to map over a stream in worker processes, keeping at most two tasks per worker in flight
+# so the reader never runs ahead of the writer
+def bounded_map(function, items, workers):
+    if workers <= 1:
+        yield from map(function, items)
+        return
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        in_flight = collections.deque()
+        for item in items:
+            in_flight.append(pool.submit(function, item))
+            if len(in_flight) >= workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+# Function to validate a data file and, unless check_only, rewrite it in the current schema.
+# The file is read and written one hostel at a time; output goes to output (default: the file itself,
+# committed like any save under the lock desks take for every write, so it and the bookings file next to
+# it shift their .bak generations together).
+# Returns (hostels, rooms, hostels changed, problems) with problems as (hostel, floor, room, message);
+# a damaged file raises ValueError and is left untouched.
+@metrics.timed("migrate_schema")
+def migrate_file(path=DATA_FILE, output=None, check_only=False, workers=None, chunk_size=CHUNK_SIZE):
+    workers = workers or os.cpu_count() or 1
+    target = output or path
+    temp_path = target + ".tmp"
+    counts = {"hostels": 0, "rooms": 0, "changed": 0}
+    problems = []
+    homes = sqlite3.connect("")  # Private temporary database: kept on disk once it outgrows SQLite's cache
+    homes.execute("CREATE TABLE occupants (student_id TEXT, hostel TEXT, floor TEXT, room TEXT)")
+    directory = os.path.dirname(path)
+    commit_file = os.path.join(directory, COMMIT_FILE)
+    bookings_file = os.path.join(directory, STUDENT_BOOKINGS_FILE)
+    with FileLock(path + ".lock"):
+        recover_commit(commit_file, [path, bookings_file])  # Finish a save a crash interrupted first
+        out = None if check_only else open(temp_path, "w")
+        try:
+            with open(path, "r") as source:
+                if out is not None:
+                    out.write("{")
+                batches = batched(StreamReader(source, chunk_size), BATCH_HOSTELS)
+                for results in bounded_map(migrate_batch, batches, workers):
+                    for hostel_name, text, rooms, unchanged, hostel_problems, occupants in results:
+                        if out is not None:
+                            out.write(("," if counts["hostels"] else "") + f"\n    {json.dumps(hostel_name)}: {text}")
+                        counts["hostels"] += 1
+                        counts["rooms"] += rooms
+                        counts["changed"] += not unchanged
+                        problems += [(hostel_name, floor, room, message)
+                                     for floor, room, message in hostel_problems]
+                        homes.executemany("INSERT INTO occupants VALUES (?, ?, ?, ?)",
+                                          [(student_id, hostel_name, floor, room)
+                                           for student_id, floor, room in occupants])
+                problems += students_in_two_rooms(homes)
+            if out is not None:
+                out.write("\n}" if counts["hostels"] else "}")
+                out.flush()
+                os.fsync(out.fileno())
+                out.close()
+                out = None
+                if output is not None:
+                    os.replace(temp_path, target)
+                    fsync_dir(os.path.dirname(os.path.abspath(target)))
+                elif counts["changed"]:
+                    commit_temp_files(commit_file, [(temp_path, path)], [bookings_file])
+        finally:
+            homes.close()
+            if out is not None:
+                out.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return counts["hostels"], counts["rooms"], counts["changed"], problems
+
+
+# Function to list every later room of a student listed in more than one room, in file order
+def students_in_two_rooms(homes):
+    rows = homes.execute(
+        "SELECT o.hostel, o.floor, o.room, o.student_id, f.hostel, f.floor, f.room FROM occupants o "
+        "JOIN (SELECT student_id, MIN(rowid) AS first FROM occupants GROUP BY student_id HAVING COUNT(*) > 1) d "
+        "ON o.student_id = d.student_id JOIN occupants f ON f.rowid = d.first "
+        "WHERE o.rowid != d.first AND (o.hostel != f.hostel OR o.floor != f.floor OR o.room != f.room) "
+        "ORDER BY o.rowid")
+    return [(hostel_name, floor, room, f"Occupant {student_id} is also in {first_hostel} / {first_floor} / {first_room}")
+            for hostel_name, floor, room, student_id, first_hostel, first_floor, first_room in rows]
+
+
+# Function to check hostels already in memory; returns (hostels, problems)
+def check_hostels(hostels):
+    checked = {}
+    problems = []
+    for hostel_name, info in hostels.items():
+        checked[hostel_name], hostel_problems, occupants = migrate_hostel(info)
+        problems += [(hostel_name, floor, room, message) for floor, room, message in hostel_problems]
+    return checked, problems
+
+
+def format_problem(problem):
+    hostel_name, floor, room, message = problem
+    return " / ".join(str(part) for part in (hostel_name, floor, room) if part is not None) + f": {message}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Check a hostel data file and upgrade it to schema version "
+                                                 f"{SCHEMA_VERSION}, one hostel at a time.")
+    parser.add_argument("--data-file", default=DATA_FILE)
+    parser.add_argument("--output", help="write the upgraded file here instead of replacing --data-file")
+    parser.add_argument("--check", action="store_true", help="only report problems, write nothing")
+    parser.add_argument("--workers", type=int, help="processes migrating hostels (default: one per CPU)")
+    args = parser.parse_args()
+
+    try:
+        hostel_count, room_count, changed, problems = migrate_file(args.data_file, args.output, args.check,
+                                                                   args.workers)
+    except ValueError as error:
+        print(f"{args.data_file}: {error}", file=sys.stderr)
+        sys.exit(2)
+    for problem in problems:
+        print(format_problem(problem), file=sys.stderr)
+    action = "checked" if args.check else f"{changed} upgraded"
+    print(f"{hostel_count} hostels, {room_count} rooms {action}, {len(problems)} problems")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,174 @@
+import bisect
+
+MAX_RESULTS = 1000  # Matches returned per query; the admin list pages through them anyway
+FUZZY_MIN_LENGTH = 4  # Shorter name parts only match by prefix, one typo would match too much
+
+
+# Function to list every string one deleted character away from word
+def deletions(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+# Function to check whether two words are at most one edit apart (insert, delete, substitute or swap)
+def within_one_edit(a, b):
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or \
+            (i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:])
+    return a[i:] == b[i + 1:]
+
+
+def name_words(name):
+    return (name or "").lower().split()
+
+
+class SearchIndex:
+    # Prefix search on roll numbers, prefix and one-typo search on student names, and lookups by
+    # hostel / floor / room, all over a BookingStore. Roll numbers sit in one sorted list, so a
+    # "1602-23-737" prefix (intake year, then department) is a contiguous slice found by bisect.
+    # Name words map to students; a word's one-letter deletions map back to the word, so a typo is
+    # found by looking up the query's own deletions instead of comparing against every name.
+    # The index follows later bookings, cancellations and transfers through BookingStore.watchers.
+    def __init__(self, bookings):
+        self.bookings = bookings
+        self.ids = sorted(bookings.by_student)
+        self.words = {}  # name word -> {student_id: None}
+        self.word_list = None  # Sorted name words, for prefix slices; sorted once after the first pass
+        self.near_words = {}  # deletion -> {word: None}
+        for booking in bookings:
+            self._add_name(booking)
+        self.word_list = sorted(self.words)
+        bookings.watchers.append(self)
+
+    def _add_name(self, booking):
+        for word in name_words(booking.get("student_name")):
+            students = self.words.get(word)
+            if students is None:
+                students = self.words[word] = {}
+                if self.word_list is not None:
+                    bisect.insort(self.word_list, word)
+                if len(word) >= FUZZY_MIN_LENGTH:
+                    for variant in deletions(word):
+                        self.near_words.setdefault(variant, {})[word] = None
+            students[booking["student_id"]] = None
+
+    def _remove_name(self, booking):
+        for word in name_words(booking.get("student_name")):
+            students = self.words.get(word)
+            if students is None:
+                continue
+            students.pop(booking["student_id"], None)
+            if students:
+                continue
+            del self.words[word]
+            del self.word_list[bisect.bisect_left(self.word_list, word)]
+            if len(word) >= FUZZY_MIN_LENGTH:
+                for variant in deletions(word):
+                    near = self.near_words[variant]
+                    near.pop(word, None)
+                    if not near:
+                        del self.near_words[variant]
+
+    # BookingStore calls these after every add and cancel (a transfer is a cancel plus an add)
+    def added(self, booking):
+        bisect.insort(self.ids, booking["student_id"])
+        self._add_name(booking)
+
+    def cancelled(self, booking):
+        position = bisect.bisect_left(self.ids, booking["student_id"])
+        if position < len(self.ids) and self.ids[position] == booking["student_id"]:
+            del self.ids[position]
+        self._remove_name(booking)
+
+    # Function to find students for whatever was typed: a roll-number prefix ("1602-23-737", "*" allowed
+    # at the end), "hostel / floor / room" (each part a prefix), or name words and hostel names. A query
+    # that starts with a digit but matches no roll number ("2nd Block") is searched as a name.
+    def search(self, query, limit=MAX_RESULTS):
+        query = query.strip().rstrip("*").strip()
+        if not query:
+            return []
+        if query[0].isdigit():
+            results = self.id_prefix(query, limit)
+            if results:
+                return results
+        if "/" in query:
+            return self.in_rooms(query, limit)
+        results = self.by_name(query, limit)
+        if len(results) < limit:
+            seen = set(results)
+            results += [student_id for student_id in self.in_rooms(query, limit - len(results))
+                        if student_id not in seen]
+        return results
+
+    def id_prefix(self, prefix, limit=MAX_RESULTS):
+        start = bisect.bisect_left(self.ids, prefix)
+        end = bisect.bisect_left(self.ids, prefix + "\uffff", start, min(start + limit, len(self.ids)))
+        return self.ids[start:end]
+
+    # Function to list the words that start with prefix, in sorted order
+    def words_with_prefix(self, prefix):
+        position = bisect.bisect_left(self.word_list, prefix)
+        while position < len(self.word_list) and self.word_list[position].startswith(prefix):
+            yield self.word_list[position]
+            position += 1
+
+    # Function to list the words one typo away from word (the word itself excluded)
+    def near(self, word):
+        if len(word) < FUZZY_MIN_LENGTH:
+            return []
+        candidates = {}
+        for variant in deletions(word) | {word}:
+            candidates.update(self.near_words.get(variant, {}))  # Words with a letter more, changed or swapped
+            if variant != word and len(variant) >= FUZZY_MIN_LENGTH and variant in self.words:
+                candidates[variant] = None  # Words with a letter less
+        candidates.pop(word, None)
+        return [candidate for candidate in candidates if within_one_edit(word, candidate)]
+
+    # Students whose name has a word starting with (or one typo away from) each query word.
+    # One word: prefix matches first, typo matches only if the prefixes leave room. Several words:
+    # the student sets of all words are intersected, starting from the rarest word.
+    def by_name(self, query, limit=MAX_RESULTS):
+        tokens = name_words(query)
+        if not tokens:
+            return []
+        if len(tokens) == 1:
+            results = {}
+            for words in (self.words_with_prefix(tokens[0]), self.near(tokens[0])):
+                for word in words:
+                    for student_id in self.words[word]:
+                        results[student_id] = None
+                        if len(results) >= limit:
+                            return list(results)
+            return list(results)
+
+        matches = sorted(([*self.words_with_prefix(token), *self.near(token)] for token in tokens),
+                         key=lambda words: sum(len(self.words[word]) for word in words))
+        found = set().union(*(self.words[word] for word in matches[0]))
+        for words in matches[1:]:
+            found &= set().union(*(self.words[word] for word in words))
+        ordered = dict.fromkeys(student_id for word in matches[0] for student_id in self.words[word]
+                                if student_id in found)  # In the rarest word's order
+        return list(ordered)[:limit]
+
+    # Students booked in hostels (and floors, rooms) whose names start with the "/"-separated parts
+    def in_rooms(self, query, limit=MAX_RESULTS):
+        parts = [part.strip().lower() for part in query.split("/")]
+        hostel_part, floor_part, room_part = (parts + ["", ""])[:3]
+        results = []
+        for hostel_name, hostel_bookings in self.bookings.by_hostel.items():
+            if not hostel_name.lower().startswith(hostel_part):
+                continue
+            for student_id, booking in hostel_bookings.items():
+                if booking["floor"].lower().startswith(floor_part) and booking["room"].lower().startswith(room_part):
+                    results.append(student_id)
+                    if len(results) >= limit:
+                        return results
+        return results
@@ -0,0 +1,1541 @@
+import argparse
+import collections
+import contextlib
+import copy
+import functools
+import hashlib
+import itertools
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from hostel_cache import HostelCache, LazyHostel, load_cached, source_stamp
+
+DATA_FILE = "hostel_data.json"
+STUDENT_BOOKINGS_FILE = "student_bookings.json"  # File to store student booking details
+SQLITE_FILE = "hostel_data.db"
+JOURNAL_FILE = "hostel_journal.jsonl"  # Append-only log used by the journal backend
+SHARD_DIR = "hostel_shards"  # Directory of the sharded backend: one JSON file per hostel plus a manifest
+MANIFEST_FILE = "manifest.json"
+BOOKINGS_LOG = "student_bookings.jsonl"  # Append-only booking log of the sharded backend
+COMPACT_EVERY = 500  # Journal records between background compactions
+STORAGE_ENV = "HOSTEL_STORAGE"  # Set to "sqlite", "journal" or "sharded" to change the backend
+COMMIT_FILE = ".hostel_commit"  # Marker listing the temp files of a multi-file save in progress
+BACKUP_COUNT = 2  # Rotating backups kept next to each JSON file (.bak, .bak.1, ...)
+OWN_WRITES_KEPT = 64  # Saves of one back-to-back run the change tailer can still skip past without a reload
+
+
+# Function to fsync a directory so renames inside it survive a crash
+def fsync_dir(path):
+    if not hasattr(os, "O_DIRECTORY"):
+        return  # Windows cannot open directories; os.replace is still atomic there
+    fd = os.open(path or ".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# Function to write JSON into "<path>.tmp" and fsync it; returns the temp path
+def write_temp_json(path, data):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump(data, file, indent=4)
+        metrics.count("bytes_written", file.tell())
+        file.flush()
+        os.fsync(file.fileno())
+    return temp_path
+
+
+# Function to shift the backups of a file along by one and keep the current version as .bak
+def rotate_backups(path):
+    if not os.path.exists(path):
+        return
+    for i in range(BACKUP_COUNT - 1, 0, -1):
+        older = path + (".bak" if i == 1 else f".bak.{i - 1}")
+        if os.path.exists(older):
+            os.replace(older, f"{path}.bak.{i}")
+    if os.path.exists(path + ".bak.tmp"):
+        os.remove(path + ".bak.tmp")  # Left over from a save interrupted mid-rotation
+    try:
+        os.link(path, path + ".bak.tmp")  # Hard link: no copy, old contents stay reachable after the replace
+        os.replace(path + ".bak.tmp", path + ".bak")
+    except OSError:
+        shutil.copy2(path, path + ".bak")
+
+
+# Function to atomically replace several files at once (all of them land, or none of them).
+# companions are files saved together with these that did not change: their backups are shifted too,
+# so backup generations of the whole set always come from the same save.
+@metrics.timed("save_json")
+def commit_json_files(commit_file, files, companions=()):
+    commit_temp_files(commit_file, [(write_temp_json(path, data), path) for path, data in files], companions)
+
+
+# Function to commit temp files that are already written and fsync'd, as (temp path, path) pairs; for
+# files too large to build in memory (schema.migrate_file streams its output)
+def commit_temp_files(commit_file, pairs, companions=()):
+    pairs = list(pairs)
+    for path in companions:
+        if os.path.exists(path):
+            open(path + ".rotate", "w").close()  # Flag: rotate once; removed when done, like a temp file
+            pairs.append((path + ".rotate", path))
+    marker_temp = write_temp_json(commit_file, pairs)
+    os.replace(marker_temp, commit_file)  # From here on the save is durable and will be rolled forward
+    fsync_dir(os.path.dirname(commit_file))
+    finish_commit(commit_file, pairs)
+
+
+# Function to move committed temp files into place and remove the marker
+def finish_commit(commit_file, pairs):
+    for temp_path, path in pairs:
+        if os.path.exists(temp_path):
+            rotate_backups(path)
+            if temp_path.endswith(".rotate"):
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, path)
+    fsync_dir(os.path.dirname(commit_file))
+    os.remove(commit_file)
+
+
+# Function to roll forward an interrupted save, or discard temp files of a save that never committed
+def recover_commit(commit_file, paths):
+    if os.path.exists(commit_file):
+        try:
+            with open(commit_file, "r") as file:
+                pairs = json.load(file)
+        except ValueError:
+            pairs = None
+        if pairs is not None:
+            finish_commit(commit_file, pairs)
+            return
+        os.remove(commit_file)
+    for path in paths + [commit_file]:
+        for leftover in (path + ".tmp", path + ".rotate"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+# Suffixes of a file's versions, newest first: the file itself, then its backups
+GENERATIONS = ["", ".bak"] + [f".bak.{i}" for i in range(1, BACKUP_COUNT)]
+
+
+# Function to read a JSON file, falling back to the newest readable backup if it is damaged
+@metrics.timed("load_json")
+def load_json_file(path, default):
+    candidates = [path + suffix for suffix in GENERATIONS]
+    for candidate in candidates:
+        if not os.path.exists(candidate):
+            continue
+        try:
+            with open(candidate, "r") as file:
+                return json.load(file)
+        except ValueError:
+            continue
+    return default
+
+
+class BookingError(Exception):
+    # Raised when a booking or hostel change is rejected; the message is shown to the operator
+    pass
+
+
+class BookingConflict(BookingError):
+    # Raised when a write is rejected because another desk changed the data first
+    pass
+
+
+class FileLock:
+    # Advisory lock on a side file, shared by every desk that uses the same data directory
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, "a+")
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        else:
+            self.file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after ten seconds; keep waiting
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+
+# Function to check a booking against the latest room state; raises BookingConflict
+def check_booking(room_data, booked_ids, occupant, expected_version=None):
+    if expected_version is not None and room_data.get("version", 0) != expected_version:
+        raise BookingConflict("This room was changed at another desk. Please check it and try again.")
+    if len(room_data["occupants"]) >= room_data["capacity"]:
+        raise BookingConflict("Room is fully booked!")
+    if any(existing["id"] == occupant["id"] for existing in room_data["occupants"]):
+        raise BookingConflict("Student has already booked this room!")
+    if occupant["id"] in booked_ids:
+        raise BookingConflict("Student has already booked a room!")
+
+
+# Function to move a student's occupant entry from source_room to target_room and bump both versions;
+# raises BookingConflict (before changing anything) if the move no longer fits
+def move_occupant(source_room, target_room, student_id):
+    occupant = next((occupant for occupant in source_room["occupants"] if occupant["id"] == student_id), None)
+    if occupant is None:
+        raise BookingConflict("This booking was changed at another desk. Please check it and try again.")
+    if len(target_room["occupants"]) >= target_room["capacity"]:
+        raise BookingConflict("Room is fully booked!")
+    if any(existing["id"] == student_id for existing in target_room["occupants"]):
+        raise BookingConflict("Student has already booked this room!")
+    source_room["occupants"] = [existing for existing in source_room["occupants"] if existing["id"] != student_id]
+    source_room["version"] = source_room.get("version", 0) + 1
+    target_room["occupants"].append(occupant)
+    target_room["version"] = target_room.get("version", 0) + 1
+    return occupant
+
+
+# Function to copy the stored room over the caller's room dict, keeping the dict itself
+def sync_room(hostels, hostel_name, floor, room, fresh_room):
+    room_data = hostels[hostel_name]["floors"][floor][room]
+    room_data.clear()
+    room_data.update(fresh_room)
+
+
+# Function to pick out of a freshly read tree the hostels a change tailer has not seen yet and the
+# rooms whose version differs from the one it saw last
+def tree_changes(hostels, known_hostels, versions):
+    new_hostels = {}
+    rooms = {}
+    for hostel_name, info in hostels.items():
+        if hostel_name not in known_hostels:
+            new_hostels[hostel_name] = info
+            continue
+        for floor, floor_rooms in info["floors"].items():
+            for room, room_data in floor_rooms.items():
+                if versions.get((hostel_name, floor, room)) != room_data.get("version", 0):
+                    rooms[(hostel_name, floor, room)] = room_data
+    return new_hostels, rooms
+
+
+class JsonStorage:
+    # Original layout: the whole hostel tree and the whole bookings list, one JSON file each.
+    # Every change is a locked read-modify-write, so several desks can share the files.
+    def __init__(self, data_file=DATA_FILE, bookings_file=STUDENT_BOOKINGS_FILE):
+        self.data_file = data_file
+        self.bookings_file = bookings_file
+        self.commit_file = os.path.join(os.path.dirname(data_file), COMMIT_FILE)
+        self.lock = FileLock(data_file + ".lock")
+        self.hostel_cache = HostelCache(data_file)
+        self.readable = {}  # path -> source_stamp at which it last parsed, so pair checks need not re-read it
+        self.own_writes = ()  # Change stamps through this desk's latest run of back-to-back saves, oldest first
+        with self.lock:
+            recover_commit(self.commit_file, [self.data_file, self.bookings_file])
+
+    def load_hostels(self):
+        return self._load_pair({0})[0][0]
+
+    def load_bookings(self):
+        return self._load_pair({1})[0][1]
+
+    # Function to read the hostel tree and the bookings list of one save. If either file is damaged, both
+    # are read from the newest backup generation in which both parse, so occupants and bookings never
+    # come from different saves. Files not in wanted are only checked (None in the result).
+    # Returns ([hostels, bookings], generation) where generation 0 means the files themselves.
+    @metrics.timed("load_json")
+    def _load_pair(self, wanted=(0, 1)):
+        files = [(self.data_file, {}), (self.bookings_file, [])]
+        for generation, suffix in enumerate(GENERATIONS):
+            values = []
+            for index, (path, default) in enumerate(files):
+                candidate = path + suffix
+                if not os.path.exists(candidate):
+                    values.append(default)
+                    continue
+                stamp = source_stamp(candidate)
+                if index not in wanted and self.readable.get(candidate) == stamp:
+                    values.append(None)
+                    continue
+                try:
+                    with open(candidate, "r") as file:
+                        values.append(json.load(file))
+                except ValueError:
+                    break
+                self.readable[candidate] = stamp
+            else:
+                return values, generation
+        return [load_json_file(path, default) for path, default in files], len(GENERATIONS)  # No whole generation
+
+    # Startup load: hostel summaries from the binary snapshot (floors read on demand) and the bookings
+    # list from its own snapshot; either is rebuilt from JSON when its source file changed. Only files
+    # that parse are snapshotted; a damaged one sends both to their backups, read in full.
+    def load_snapshot(self):
+        with self.lock:
+            try:
+                stamp = source_stamp(self.data_file)
+            except OSError:
+                return self.load_hostels(), self.load_bookings()
+            hostels = self.hostel_cache.read(stamp)
+            if hostels is None:
+                (hostels, bookings), generation = self._load_pair()
+                if generation:
+                    return hostels, bookings
+                self.hostel_cache.write(stamp, hostels)
+            self.readable[self.data_file] = stamp  # The snapshot was taken from this version parsing cleanly
+            try:
+                bookings = load_cached(self.bookings_file, functools.partial(self._read_primary, self.bookings_file, []))
+            except ValueError:
+                return tuple(self._load_pair()[0])
+        return hostels, bookings
+
+    @staticmethod
+    def _read_primary(path, default):
+        if not os.path.exists(path):
+            return default
+        with open(path, "r") as file:
+            return json.load(file)
+
+    def save_hostels(self, hostels):
+        self._commit([(self.data_file, hostels)])
+
+    def save_bookings(self, bookings):
+        self._commit([(self.bookings_file, list(bookings))])
+
+    # Function to write the hostel tree and the bookings list as one unit
+    def save_all(self, hostels, bookings):
+        self._commit([(self.data_file, hostels), (self.bookings_file, list(bookings))])
+
+    # The file a save leaves alone still gets its backups shifted, keeping the two files' generations paired
+    def _commit(self, files):
+        paths = [path for path, data in files]
+        before = self._change_stamp()
+        commit_json_files(self.commit_file, files, [path for path in (self.data_file, self.bookings_file)
+                                                    if path not in paths])
+        for path in paths:
+            self.readable[path] = source_stamp(path)
+        run = self.own_writes if self.own_writes and self.own_writes[-1] == before else (before,)
+        self.own_writes = (run + (self._change_stamp(),))[-OWN_WRITES_KEPT:]  # One tuple, read by the tailer
+
+    # Hostels added at other desks are merged into the caller's dict as well
+    def add_hostel(self, hostels, hostel_name):
+        with self.lock:
+            fresh_hostels = self.load_hostels()
+            if hostel_name in fresh_hostels:
+                raise BookingConflict("Hostel already exists!")
+            fresh_hostels[hostel_name] = hostels[hostel_name]
+            self._write_hostel(fresh_hostels, hostel_name)
+        for name, info in fresh_hostels.items():
+            hostels.setdefault(name, info)
+
+    # Validates against the stored state and updates the caller's room dict on success
+    def add_booking(self, hostels, bookings, hostel_name, floor, room, occupant, booking=None,
+                    expected_version=None):
+        with self.lock:
+            fresh_hostels = self.load_hostels()
+            fresh_bookings = self.load_bookings()
+            fresh_room = fresh_hostels[hostel_name]["floors"][floor][room]
+            try:
+                check_booking(fresh_room, {entry["student_id"] for entry in fresh_bookings}, occupant,
+                              expected_version)
+            except BookingConflict:
+                sync_room(hostels, hostel_name, floor, room, fresh_room)
+                raise
+            fresh_room["occupants"].append(occupant)
+            fresh_room["version"] = fresh_room.get("version", 0) + 1
+            if booking is not None:
+                fresh_bookings.append(booking)
+            self._write_booking(fresh_hostels, fresh_bookings, hostel_name, floor, room, occupant, booking)
+        sync_room(hostels, hostel_name, floor, room, fresh_room)
+
+    # Function to store many bookings with one write; entries are (hostel, floor, room, occupant, booking).
+    # versions optionally gives, per entry, the room version the booking expects (None skips the check).
+    def add_bookings(self, hostels, bookings, entries, versions=None):
+        with self.lock:
+            fresh_hostels = self.load_hostels()
+            fresh_bookings = self.load_bookings()
+            booked_ids = {entry["student_id"] for entry in fresh_bookings}
+            touched = {}
+            for (hostel_name, floor, room, occupant, booking), expected_version in \
+                    zip(entries, versions or itertools.repeat(None)):
+                fresh_room = fresh_hostels[hostel_name]["floors"][floor][room]
+                check_booking(fresh_room, booked_ids, occupant, expected_version)
+                fresh_room["occupants"].append(occupant)
+                fresh_room["version"] = fresh_room.get("version", 0) + 1
+                booked_ids.add(occupant["id"])
+                if booking is not None:
+                    fresh_bookings.append(booking)
+                touched[(hostel_name, floor, room)] = fresh_room
+            self._write_bookings(fresh_hostels, fresh_bookings, entries)
+        for (hostel_name, floor, room), fresh_room in touched.items():
+            sync_room(hostels, hostel_name, floor, room, fresh_room)
+
+    def cancel_booking(self, hostels, bookings, hostel_name, floor, room, student_id):
+        with self.lock:
+            fresh_hostels = self.load_hostels()
+            fresh_bookings = [entry for entry in self.load_bookings() if entry["student_id"] != student_id]
+            fresh_room = fresh_hostels[hostel_name]["floors"][floor][room]
+            fresh_room["occupants"] = [occupant for occupant in fresh_room["occupants"] if occupant["id"] != student_id]
+            fresh_room["version"] = fresh_room.get("version", 0) + 1
+            self._write_cancel(fresh_hostels, fresh_bookings, hostel_name, floor, room, student_id)
+        sync_room(hostels, hostel_name, floor, room, fresh_room)
+
+    # Occupant move, booking update and both version bumps land in one write.
+    # booking is the updated booking record, or None when no bookings list is kept.
+    def transfer_booking(self, hostels, bookings, student_id, source, target, booking=None):
+        with self.lock:
+            fresh_hostels = self.load_hostels()
+            fresh_bookings = self.load_bookings()
+            rooms = [fresh_hostels[hostel_name]["floors"][floor][room] for hostel_name, floor, room in (source, target)]
+            try:
+                move_occupant(rooms[0], rooms[1], student_id)
+            except BookingConflict:
+                for key, fresh_room in zip((source, target), rooms):
+                    sync_room(hostels, *key, fresh_room)
+                raise
+            if booking is not None:
+                fresh_bookings = [booking if entry["student_id"] == student_id else entry for entry in fresh_bookings]
+            self._write_transfer(fresh_hostels, fresh_bookings, student_id, source, target, booking)
+        for key, fresh_room in zip((source, target), rooms):
+            sync_room(hostels, *key, fresh_room)
+
+    # Function for change_feed.ChangeTailer: (stamp, new hostels, changed rooms) since stamp. The tree is
+    # only read again when the file's mtime or size moved, and not when every save since stamp was this
+    # desk's own (it already holds those changes). Runs on the tailer's thread, so it takes its own lock handle.
+    def read_changes(self, stamp, known_hostels, versions):
+        current = self._change_stamp()
+        if current == stamp:
+            return stamp, {}, {}
+        own_writes = self.own_writes
+        if stamp is not None and own_writes and own_writes[-1] == current and stamp in own_writes:
+            return current, {}, {}
+        with FileLock(self.lock.path):
+            current = self._change_stamp()
+            hostels = self._read_tree()
+        return (current,) + tree_changes(hostels, known_hostels, versions)
+
+    def _change_stamp(self):
+        return tuple(source_stamp(path) if os.path.exists(path) else None for path in (self.data_file,))
+
+    def _read_tree(self):
+        return self.load_hostels()
+
+    # Persistence steps, called with the lock held
+    def _write_hostel(self, hostels, hostel_name):
+        self.save_hostels(hostels)
+
+    def _write_booking(self, hostels, bookings, hostel_name, floor, room, occupant, booking):
+        if booking is None:
+            self.save_hostels(hostels)
+        else:
+            self.save_all(hostels, bookings)
+
+    def _write_bookings(self, hostels, bookings, entries):
+        self.save_all(hostels, bookings)
+
+    def _write_cancel(self, hostels, bookings, hostel_name, floor, room, student_id):
+        self.save_all(hostels, bookings)
+
+    def _write_transfer(self, hostels, bookings, student_id, source, target, booking):
+        self.save_all(hostels, bookings)
+
+    def close(self):
+        self.hostel_cache.close()
+
+
+# Function to apply one journal record to the loaded state (safe to apply twice)
+def apply_journal_record(hostels, bookings, record):
+    op = record["op"]
+    if op == "add_hostel":
+        hostels.setdefault(record["name"], record["info"])
+    elif op == "book":
+        room = hostels[record["hostel"]]["floors"][record["floor"]][record["room"]]
+        occupant = record["occupant"]
+        booking = record.get("booking")
+        # A segment replayed over the snapshot it was already folded into may book a student who has
+        # since moved; the replayed bookings say where they are now
+        placed = booking is not None and booking["student_id"] in bookings
+        if not placed and not any(existing["id"] == occupant["id"] for existing in room["occupants"]):
+            room["occupants"].append(occupant)
+            room["version"] = room.get("version", 0) + 1
+        if booking is not None:
+            bookings.setdefault(booking["student_id"], booking)
+    elif op == "book_many":
+        for entry in record["entries"]:
+            apply_journal_record(hostels, bookings, dict(entry, op="book"))
+    elif op == "cancel":
+        room = hostels[record["hostel"]]["floors"][record["floor"]][record["room"]]
+        remaining = [occupant for occupant in room["occupants"] if occupant["id"] != record["student_id"]]
+        if len(remaining) != len(room["occupants"]):
+            room["occupants"] = remaining
+            room["version"] = room.get("version", 0) + 1
+        bookings.pop(record["student_id"], None)
+    elif op == "transfer":
+        source, target = [hostels[hostel_name]["floors"][floor][room]
+                          for hostel_name, floor, room in (record["source"], record["target"])]
+        student_id = record["student_id"]
+        moved = [occupant for occupant in source["occupants"] if occupant["id"] == student_id]
+        if moved:  # Not moved yet; the write that logged this record already checked the target
+            source["occupants"] = [occupant for occupant in source["occupants"] if occupant["id"] != student_id]
+            source["version"] = source.get("version", 0) + 1
+            if not any(existing["id"] == student_id for existing in target["occupants"]):
+                target["occupants"] += moved[:1]  # Already there when the snapshot holds the move
+            target["version"] = target.get("version", 0) + 1
+        booking = record.get("booking")
+        if booking is not None:
+            bookings[booking["student_id"]] = booking
+    else:
+        raise ValueError(f"Unknown journal record: {op}")
+
+
+# Function to read the journal records at or after offset; returns (records, offset after the last
+# complete line, torn) where torn means the file ends in a partial line from a crash mid-append
+def read_journal(path, offset=0):
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return [], 0, False
+    with file:
+        file.seek(offset)
+        data = file.read()
+    end = data.rfind(b"\n") + 1
+    records = []
+    for line in data[:end].splitlines():
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue  # Torn line from a crash mid-append
+    return records, offset + end, end < len(data)
+
+
+class JournalStorage(JsonStorage):
+    # JSON snapshots plus an fsync'd JSONL journal; snapshots are only rewritten by compaction.
+    # Writes validate against a replayed state kept in memory, which only reads the records other desks
+    # appended since the last write, and only ever append one line.
+    def __init__(self, data_file=DATA_FILE, bookings_file=STUDENT_BOOKINGS_FILE, journal_file=JOURNAL_FILE,
+                 compact_every=COMPACT_EVERY):
+        super().__init__(data_file, bookings_file)
+        self.journal_file = journal_file
+        self.compacting_file = journal_file + ".compacting"  # Journal segment being folded into the snapshot
+        self.compact_every = compact_every
+        self.records = 0  # Records in the live journal
+        self.replayed_bookings = None
+        self.compactor = None
+        self.state = None  # (hostels, {student_id: booking}) used by writes; never handed to callers
+        self.state_stamp = None  # Snapshot and compacting-file stamps the state was replayed from
+        self.journal_id = None  # (device, inode) of the journal read into the state
+        self.offset = 0  # Journal bytes applied to the state, always at the end of a complete line
+        self.torn = False  # The journal ends in a partial line from a crash mid-append
+
+    def load_hostels(self):
+        hostels, bookings, offset, torn = self._replay()
+        self.replayed_bookings = list(bookings.values())
+        return hostels
+
+    def load_bookings(self):
+        if self.replayed_bookings is None:
+            self.load_hostels()
+        bookings, self.replayed_bookings = self.replayed_bookings, None
+        return bookings
+
+    # The journal has to be replayed over the whole tree, so nothing is loaded lazily
+    def load_snapshot(self):
+        return self.load_hostels(), self.load_bookings()
+
+    # Returns (hostels, {student_id: booking}, journal bytes read, torn)
+    def _replay(self):
+        (hostels, bookings), generation = self._load_pair()
+        bookings = {booking["student_id"]: booking for booking in bookings}
+        for record in read_journal(self.compacting_file)[0]:
+            apply_journal_record(hostels, bookings, record)
+        records, offset, torn = read_journal(self.journal_file)
+        for record in records:
+            apply_journal_record(hostels, bookings, record)
+        self.records = len(records)
+        return hostels, bookings, offset, torn
+
+    # Function to bring the write state up to date, called with the lock held. Only the journal records
+    # appended since the last call are read, unless a compaction replaced the files underneath.
+    def _refresh(self):
+        stamp = tuple(source_stamp(path) if os.path.exists(path) else None
+                      for path in (self.data_file, self.bookings_file, self.compacting_file))
+        try:
+            journal = os.stat(self.journal_file)
+            journal_id = (journal.st_dev, journal.st_ino)
+        except FileNotFoundError:
+            journal, journal_id = None, None
+        if self.state is None or stamp != self.state_stamp or (journal_id != self.journal_id and self.offset) or \
+                (journal is not None and journal.st_size < self.offset):
+            hostels, bookings, self.offset, self.torn = self._replay()
+            self.state = hostels, bookings
+            self.state_stamp = stamp
+        else:
+            records, self.offset, self.torn = read_journal(self.journal_file, self.offset)
+            for record in records:
+                apply_journal_record(*self.state, record)
+            self.records += len(records)
+            metrics.count("journal_records_read", len(records))
+        self.journal_id = journal_id
+        return self.state
+
+    # Function to copy one room out of the write state, so callers never share its dicts
+    def _stored_room(self, hostel_name, floor, room):
+        return copy.deepcopy(self.state[0][hostel_name]["floors"][floor][room])
+
+    # Reopened per append so a journal rotated by another desk is never written to. The record is read
+    # back into the write state, so the state always matches what a replay of the file gives.
+    @metrics.timed("save_journal")
+    def _append(self, record):
+        line = json.dumps(record) + "\n"
+        if self.torn:
+            line = "\n" + line  # Keep the record off the partial line a crash left behind
+        metrics.count("bytes_written", len(line))
+        with open(self.journal_file, "a") as journal:
+            journal.write(line)
+            journal.flush()
+            os.fsync(journal.fileno())
+        self._refresh()
+
+    # Appends do not touch the snapshots, so the journal files are part of the stamp
+    def _change_stamp(self):
+        return tuple(source_stamp(path) if os.path.exists(path) else None
+                     for path in (self.data_file, self.compacting_file, self.journal_file))
+
+    # Replays without touching self.records, which belongs to the writing thread
+    def _read_tree(self):
+        hostels = self._load_pair({0})[0][0]
+        bookings = {}
+        for path in (self.compacting_file, self.journal_file):
+            for record in read_journal(path)[0]:
+                apply_journal_record(hostels, bookings, record)
+        return hostels
+
+    def _write_hostel(self, hostels, hostel_name):
+        self._append({"op": "add_hostel", "name": hostel_name, "info": hostels[hostel_name]})
+
+    def _write_booking(self, hostels, bookings, hostel_name, floor, room, occupant, booking):
+        self._append({"op": "book", "hostel": hostel_name, "floor": floor, "room": room,
+                      "occupant": occupant, "booking": booking})
+
+    def _write_bookings(self, hostels, bookings, entries):
+        self._append({"op": "book_many", "entries": [
+            {"hostel": hostel_name, "floor": floor, "room": room, "occupant": occupant, "booking": booking}
+            for hostel_name, floor, room, occupant, booking in entries]})
+
+    def _write_cancel(self, hostels, bookings, hostel_name, floor, room, student_id):
+        self._append({"op": "cancel", "hostel": hostel_name, "floor": floor, "room": room,
+                      "student_id": student_id})
+
+    def _write_transfer(self, hostels, bookings, student_id, source, target, booking):
+        self._append({"op": "transfer", "student_id": student_id, "source": list(source), "target": list(target),
+                      "booking": booking})
+
+    # Hostels added at other desks are merged into the caller's dict as well
+    def add_hostel(self, hostels, hostel_name):
+        with self.lock:
+            stored_hostels, stored_bookings = self._refresh()
+            if hostel_name in stored_hostels:
+                raise BookingConflict("Hostel already exists!")
+            self._write_hostel(hostels, hostel_name)
+            added = {name: copy.deepcopy(info) for name, info in stored_hostels.items() if name not in hostels}
+        hostels.update(added)
+        self._maybe_compact()
+
+    def add_booking(self, hostels, bookings, hostel_name, floor, room, occupant, booking=None,
+                    expected_version=None):
+        with self.lock:
+            stored_bookings = self._refresh()[1]
+            try:
+                check_booking(self.state[0][hostel_name]["floors"][floor][room], stored_bookings, occupant,
+                              expected_version)
+            except BookingConflict:
+                sync_room(hostels, hostel_name, floor, room, self._stored_room(hostel_name, floor, room))
+                raise
+            self._write_booking(hostels, bookings, hostel_name, floor, room, occupant, booking)
+            fresh_room = self._stored_room(hostel_name, floor, room)
+        sync_room(hostels, hostel_name, floor, room, fresh_room)
+        self._maybe_compact()
+
+    # Entries are checked against copies of their rooms, so a rejected batch leaves the state untouched
+    def add_bookings(self, hostels, bookings, entries, versions=None):
+        with self.lock:
+            stored_bookings = self._refresh()[1]
+            booked_ids = collections.ChainMap({}, stored_bookings)
+            rooms = {}
+            for (hostel_name, floor, room, occupant, booking), expected_version in \
+                    zip(entries, versions or itertools.repeat(None)):
+                key = (hostel_name, floor, room)
+                if key not in rooms:
+                    rooms[key] = self._stored_room(*key)
+                check_booking(rooms[key], booked_ids, occupant, expected_version)
+                rooms[key]["occupants"].append(occupant)
+                rooms[key]["version"] = rooms[key].get("version", 0) + 1
+                booked_ids[occupant["id"]] = booking
+            self._write_bookings(hostels, bookings, entries)
+            rooms = {key: self._stored_room(*key) for key in rooms}
+        for key, fresh_room in rooms.items():
+            sync_room(hostels, *key, fresh_room)
+        self._maybe_compact()
+
+    def cancel_booking(self, hostels, bookings, hostel_name, floor, room, student_id):
+        with self.lock:
+            self._refresh()
+            self._write_cancel(hostels, bookings, hostel_name, floor, room, student_id)
+            fresh_room = self._stored_room(hostel_name, floor, room)
+        sync_room(hostels, hostel_name, floor, room, fresh_room)
+        self._maybe_compact()
+
+    def transfer_booking(self, hostels, bookings, student_id, source, target, booking=None):
+        with self.lock:
+            self._refresh()
+            rooms = [self._stored_room(*key) for key in (source, target)]
+            try:
+                move_occupant(rooms[0], rooms[1], student_id)
+            except BookingConflict:
+                for key, fresh_room in zip((source, target), rooms):
+                    sync_room(hostels, *key, fresh_room)
+                raise
+            self._write_transfer(hostels, bookings, student_id, source, target, booking)
+            rooms = [self._stored_room(*key) for key in (source, target)]
+        for key, fresh_room in zip((source, target), rooms):
+            sync_room(hostels, *key, fresh_room)
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self.records >= self.compact_every:
+            self.compact(background=True)
+
+    # Function to fold the journal into fresh snapshots and start an empty journal
+    def compact(self, background=False):
+        if self.compactor is not None:
+            if background and self.compactor.is_alive():
+                return  # Previous compaction still running, try again on a later write
+            self.compactor.join()
+            self.compactor = None
+        if background:
+            self.compactor = threading.Thread(target=self._compact, daemon=True)
+            self.compactor.start()
+        else:
+            self._compact()
+
+    def _compact(self):
+        with FileLock(self.data_file + ".lock"):  # Own lock handle, so it also works from the compactor thread
+            hostels, bookings = self._replay()[:2]
+            if self.records == 0 and not os.path.exists(self.compacting_file):
+                return
+            if os.path.exists(self.journal_file):
+                if os.path.exists(self.compacting_file):
+                    with open(self.compacting_file, "a") as target, open(self.journal_file, "r") as source:
+                        target.write(source.read())
+                        target.flush()
+                        os.fsync(target.fileno())
+                    os.remove(self.journal_file)
+                else:
+                    os.replace(self.journal_file, self.compacting_file)
+            self.records = 0
+            self.save_all(hostels, list(bookings.values()))
+            os.remove(self.compacting_file)
+
+    def close(self):
+        self.compact()
+
+
+class SqliteStorage:
+    # Local SQLite database in WAL mode, one row per hostel/floor/room/occupant/booking
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS hostels (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            distance REAL,
+            category TEXT,
+            schema INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS floors (
+            id INTEGER PRIMARY KEY,
+            hostel_id INTEGER NOT NULL REFERENCES hostels(id),
+            name TEXT NOT NULL,
+            UNIQUE (hostel_id, name)
+        );
+        CREATE TABLE IF NOT EXISTS rooms (
+            id INTEGER PRIMARY KEY,
+            floor_id INTEGER NOT NULL REFERENCES floors(id),
+            name TEXT NOT NULL,
+            status TEXT,
+            capacity INTEGER NOT NULL,
+            veg_price REAL,
+            non_veg_price REAL,
+            version INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (floor_id, name)
+        );
+        CREATE TABLE IF NOT EXISTS occupants (
+            id INTEGER PRIMARY KEY,
+            room_id INTEGER NOT NULL REFERENCES rooms(id),
+            student_id TEXT NOT NULL,
+            name TEXT,
+            meal TEXT
+        );
+        CREATE INDEX IF NOT EXISTS occupants_room ON occupants(room_id);
+        CREATE INDEX IF NOT EXISTS occupants_student ON occupants(student_id);
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY,
+            student_id TEXT NOT NULL UNIQUE,
+            student_name TEXT,
+            hostel_name TEXT NOT NULL,
+            floor TEXT NOT NULL,
+            room TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS bookings_hostel ON bookings(hostel_name);
+    """
+
+    def __init__(self, db_file=SQLITE_FILE):
+        self.db_file = db_file
+        # Transactions are explicit; the connection may be driven by a persistence_worker thread
+        self.conn = sqlite3.connect(db_file, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn_lock = threading.RLock()  # Floors loaded on the UI thread must not interleave with a write
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(self.SCHEMA)
+        self.watch_conn = None  # Read-only connection of a change tailer, opened on its first poll
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(rooms)")]
+        if "version" not in columns:  # Databases created before rooms were versioned
+            self.conn.execute("ALTER TABLE rooms ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        if "schema" not in [row[1] for row in self.conn.execute("PRAGMA table_info(hostels)")]:
+            self.conn.execute("ALTER TABLE hostels ADD COLUMN schema INTEGER")  # Created before schema.py
+
+    # BEGIN IMMEDIATE takes the database write lock up front, so desks queue instead of interleaving
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self.conn_lock, metrics.timer("save_sqlite"):
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def load_hostels(self):
+        hostels = {}
+        floors_by_id = {}
+        rooms_by_id = {}
+        for hostel_id, name, distance, category, schema in self.conn.execute(
+                "SELECT id, name, distance, category, schema FROM hostels ORDER BY id"):
+            hostels[name] = dict(self._hostel_summary(distance, category, schema), floors={})
+            floors_by_id[hostel_id] = hostels[name]["floors"]
+        hostel_floors = {}
+        for floor_id, hostel_id, name in self.conn.execute(
+                "SELECT id, hostel_id, name FROM floors ORDER BY id"):
+            hostel_floors[floor_id] = floors_by_id[hostel_id].setdefault(name, {})
+        for room_id, floor_id, name, status, capacity, veg_price, non_veg_price, version in self.conn.execute(
+                "SELECT id, floor_id, name, status, capacity, veg_price, non_veg_price, version FROM rooms ORDER BY id"):
+            room = self._room_dict(status, capacity, veg_price, non_veg_price, version)
+            hostel_floors[floor_id][name] = room
+            rooms_by_id[room_id] = room
+        for room_id, student_id, name, meal in self.conn.execute(
+                "SELECT room_id, student_id, name, meal FROM occupants ORDER BY id"):
+            rooms_by_id[room_id]["occupants"].append(self._occupant_dict(student_id, name, meal))
+        return hostels
+
+    def load_bookings(self):
+        return [
+            {"student_id": student_id, "student_name": student_name, "hostel_name": hostel_name,
+             "room": room, "floor": floor}
+            for student_id, student_name, hostel_name, floor, room in self.conn.execute(
+                "SELECT student_id, student_name, hostel_name, floor, room FROM bookings ORDER BY id")
+        ]
+
+    # Hostel rows and free-bed counts only; each hostel's floors are queried when first used
+    def load_snapshot(self):
+        with self.conn_lock:
+            rows = self.conn.execute("SELECT id, name, distance, category, schema FROM hostels ORDER BY id").fetchall()
+            free_beds = dict(self.conn.execute("""
+                SELECT floors.hostel_id, SUM(MAX(rooms.capacity - COALESCE(taken.count, 0), 0))
+                FROM rooms JOIN floors ON floors.id = rooms.floor_id
+                LEFT JOIN (SELECT room_id, COUNT(*) AS count FROM occupants GROUP BY room_id) AS taken
+                    ON taken.room_id = rooms.id
+                GROUP BY floors.hostel_id"""))
+        hostels = {
+            name: LazyHostel(self._hostel_summary(distance, category, schema),
+                             functools.partial(self._load_floors, hostel_id), free_beds.get(hostel_id, 0))
+            for hostel_id, name, distance, category, schema in rows
+        }
+        return hostels, self.load_bookings()
+
+    def _load_floors(self, hostel_id):
+        floors = {}
+        floors_by_id = {}
+        rooms_by_id = {}
+        with self.conn_lock:
+            for floor_id, name in self.conn.execute(
+                    "SELECT id, name FROM floors WHERE hostel_id = ? ORDER BY id", (hostel_id,)):
+                floors_by_id[floor_id] = floors.setdefault(name, {})
+            for room_id, floor_id, name, status, capacity, veg_price, non_veg_price, version in self.conn.execute(
+                    "SELECT rooms.id, floor_id, rooms.name, status, capacity, veg_price, non_veg_price, version "
+                    "FROM rooms JOIN floors ON floors.id = rooms.floor_id WHERE hostel_id = ? ORDER BY rooms.id",
+                    (hostel_id,)):
+                room = self._room_dict(status, capacity, veg_price, non_veg_price, version)
+                floors_by_id[floor_id][name] = room
+                rooms_by_id[room_id] = room
+            for room_id, student_id, name, meal in self.conn.execute(
+                    "SELECT room_id, student_id, occupants.name, meal FROM occupants "
+                    "JOIN rooms ON rooms.id = occupants.room_id JOIN floors ON floors.id = rooms.floor_id "
+                    "WHERE hostel_id = ? ORDER BY occupants.id", (hostel_id,)):
+                rooms_by_id[room_id]["occupants"].append(self._occupant_dict(student_id, name, meal))
+        return floors
+
+    @staticmethod
+    def _hostel_summary(distance, category, schema):
+        summary = {"distance": distance, "category": category}
+        if schema is not None:
+            summary["schema"] = schema
+        return summary
+
+    @staticmethod
+    def _room_dict(status, capacity, veg_price, non_veg_price, version):
+        room = {"status": status, "capacity": capacity, "occupants": []}
+        if veg_price is not None or non_veg_price is not None:
+            room["veg_price"] = veg_price
+            room["non_veg_price"] = non_veg_price
+        if version:
+            room["version"] = version
+        return room
+
+    @staticmethod
+    def _occupant_dict(student_id, name, meal):
+        occupant = {"id": student_id}
+        if name is not None:
+            occupant["name"] = name
+        if meal is not None:
+            occupant["meal"] = meal
+        return occupant
+
+    def _insert_hostel(self, hostel_name, info):
+        cursor = self.conn.execute("INSERT INTO hostels (name, distance, category, schema) VALUES (?, ?, ?, ?)",
+                                   (hostel_name, info.get("distance"), info.get("category"), info.get("schema")))
+        hostel_id = cursor.lastrowid
+        for floor_name, rooms in info.get("floors", {}).items():
+            floor_id = self.conn.execute("INSERT INTO floors (hostel_id, name) VALUES (?, ?)",
+                                         (hostel_id, floor_name)).lastrowid
+            for room_name, room in rooms.items():
+                room_id = self.conn.execute(
+                    "INSERT INTO rooms (floor_id, name, status, capacity, veg_price, non_veg_price, version) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (floor_id, room_name, room.get("status"), room["capacity"],
+                     room.get("veg_price"), room.get("non_veg_price"), room.get("version", 0))).lastrowid
+                self.conn.executemany(
+                    "INSERT INTO occupants (room_id, student_id, name, meal) VALUES (?, ?, ?, ?)",
+                    [(room_id, occupant["id"], occupant.get("name"), occupant.get("meal"))
+                     for occupant in room["occupants"]])
+
+    def _insert_booking(self, booking):
+        self.conn.execute(
+            "INSERT INTO bookings (student_id, student_name, hostel_name, floor, room) VALUES (?, ?, ?, ?, ?)",
+            (booking["student_id"], booking.get("student_name"), booking["hostel_name"],
+             booking["floor"], booking["room"]))
+
+    def _room_id(self, hostel_name, floor, room):
+        row = self.conn.execute(
+            "SELECT rooms.id FROM rooms "
+            "JOIN floors ON rooms.floor_id = floors.id "
+            "JOIN hostels ON floors.hostel_id = hostels.id "
+            "WHERE hostels.name = ? AND floors.name = ? AND rooms.name = ?",
+            (hostel_name, floor, room)).fetchone()
+        if row is None:
+            raise KeyError(f"{hostel_name} / {floor} / {room} does not exist")
+        return row[0]
+
+    def _load_room(self, room_id, conn=None):
+        conn = conn or self.conn
+        status, capacity, veg_price, non_veg_price, version = conn.execute(
+            "SELECT status, capacity, veg_price, non_veg_price, version FROM rooms WHERE id = ?",
+            (room_id,)).fetchone()
+        room = self._room_dict(status, capacity, veg_price, non_veg_price, version)
+        for student_id, name, meal in conn.execute(
+                "SELECT student_id, name, meal FROM occupants WHERE room_id = ? ORDER BY id", (room_id,)):
+            room["occupants"].append(self._occupant_dict(student_id, name, meal))
+        return room
+
+    def save_hostels(self, hostels):
+        with self._transaction():
+            self.conn.execute("DELETE FROM occupants")
+            self.conn.execute("DELETE FROM rooms")
+            self.conn.execute("DELETE FROM floors")
+            self.conn.execute("DELETE FROM hostels")
+            for hostel_name, info in hostels.items():
+                self._insert_hostel(hostel_name, info)
+
+    def save_bookings(self, bookings):
+        with self._transaction():
+            self.conn.execute("DELETE FROM bookings")
+            for booking in bookings:
+                self._insert_booking(booking)
+
+    def add_hostel(self, hostels, hostel_name):
+        with self._transaction():
+            if self.conn.execute("SELECT 1 FROM hostels WHERE name = ?", (hostel_name,)).fetchone():
+                raise BookingConflict("Hostel already exists!")
+            self._insert_hostel(hostel_name, hostels[hostel_name])
+
+    # Occupant row, booking row and room version bump are written in one transaction
+    def add_booking(self, hostels, bookings, hostel_name, floor, room, occupant, booking=None,
+                    expected_version=None):
+        try:
+            with self._transaction():
+                room_id = self._room_id(hostel_name, floor, room)
+                fresh_room = self._load_room(room_id)
+                booked = self.conn.execute("SELECT 1 FROM bookings WHERE student_id = ?",
+                                           (occupant["id"],)).fetchone()
+                check_booking(fresh_room, {occupant["id"]} if booked else set(), occupant, expected_version)
+                self.conn.execute(
+                    "INSERT INTO occupants (room_id, student_id, name, meal) VALUES (?, ?, ?, ?)",
+                    (room_id, occupant["id"], occupant.get("name"), occupant.get("meal")))
+                self.conn.execute("UPDATE rooms SET version = version + 1 WHERE id = ?", (room_id,))
+                if booking is not None:
+                    self._insert_booking(booking)
+        except BookingConflict:
+            sync_room(hostels, hostel_name, floor, room, fresh_room)
+            raise
+        fresh_room["occupants"].append(occupant)
+        fresh_room["version"] = fresh_room.get("version", 0) + 1
+        sync_room(hostels, hostel_name, floor, room, fresh_room)
+
+    # All occupant and booking rows go in with executemany inside one transaction
+    def add_bookings(self, hostels, bookings, entries, versions=None):
+        with self._transaction():
+            rooms = {}  # (hostel, floor, room) -> (room_id, fresh room)
+            occupant_rows = []
+            booking_rows = []
+            ids = [occupant["id"] for hostel_name, floor, room, occupant, booking in entries]
+            booked_ids = set()
+            for start in range(0, len(ids), 500):  # Stay under SQLite's bound-parameter limit
+                chunk = ids[start:start + 500]
+                booked_ids.update(row[0] for row in self.conn.execute(
+                    f"SELECT student_id FROM bookings WHERE student_id IN ({','.join('?' * len(chunk))})", chunk))
+            for (hostel_name, floor, room, occupant, booking), expected_version in \
+                    zip(entries, versions or itertools.repeat(None)):
+                key = (hostel_name, floor, room)
+                if key not in rooms:
+                    room_id = self._room_id(hostel_name, floor, room)
+                    rooms[key] = (room_id, self._load_room(room_id))
+                room_id, fresh_room = rooms[key]
+                check_booking(fresh_room, booked_ids, occupant, expected_version)
+                fresh_room["occupants"].append(occupant)
+                fresh_room["version"] = fresh_room.get("version", 0) + 1
+                booked_ids.add(occupant["id"])
+                occupant_rows.append((room_id, occupant["id"], occupant.get("name"), occupant.get("meal")))
+                if booking is not None:
+                    booking_rows.append((booking["student_id"], booking.get("student_name"), booking["hostel_name"],
+                                         booking["floor"], booking["room"]))
+            self.conn.executemany("INSERT INTO occupants (room_id, student_id, name, meal) VALUES (?, ?, ?, ?)",
+                                  occupant_rows)
+            self.conn.executemany(
+                "INSERT INTO bookings (student_id, student_name, hostel_name, floor, room) VALUES (?, ?, ?, ?, ?)",
+                booking_rows)
+            self.conn.executemany("UPDATE rooms SET version = ? WHERE id = ?",
+                                  [(fresh_room["version"], room_id) for room_id, fresh_room in rooms.values()])
+        for (hostel_name, floor, room), (room_id, fresh_room) in rooms.items():
+            sync_room(hostels, hostel_name, floor, room, fresh_room)
+
+    def cancel_booking(self, hostels, bookings, hostel_name, floor, room, student_id):
+        with self._transaction():
+            room_id = self._room_id(hostel_name, floor, room)
+            self.conn.execute("DELETE FROM occupants WHERE room_id = ? AND student_id = ?", (room_id, student_id))
+            self.conn.execute("DELETE FROM bookings WHERE student_id = ?", (student_id,))
+            self.conn.execute("UPDATE rooms SET version = version + 1 WHERE id = ?", (room_id,))
+            fresh_room = self._load_room(room_id)
+        sync_room(hostels, hostel_name, floor, room, fresh_room)
+
+    # The occupant row moves and the booking row is rewritten in the same transaction
+    def transfer_booking(self, hostels, bookings, student_id, source, target, booking=None):
+        try:
+            with self._transaction():
+                source_id, target_id = self._room_id(*source), self._room_id(*target)
+                rooms = [self._load_room(source_id), self._load_room(target_id)]
+                occupant = move_occupant(rooms[0], rooms[1], student_id)
+                self.conn.execute("DELETE FROM occupants WHERE room_id = ? AND student_id = ?",
+                                  (source_id, student_id))
+                self.conn.execute(  # Re-inserted so it sorts last in the target room, as in the JSON layout
+                    "INSERT INTO occupants (room_id, student_id, name, meal) VALUES (?, ?, ?, ?)",
+                    (target_id, student_id, occupant.get("name"), occupant.get("meal")))
+                self.conn.execute("UPDATE rooms SET version = version + 1 WHERE id IN (?, ?)", (source_id, target_id))
+                if booking is not None:
+                    self.conn.execute("UPDATE bookings SET hostel_name = ?, floor = ?, room = ? WHERE student_id = ?",
+                                      (booking["hostel_name"], booking["floor"], booking["room"], student_id))
+        except BookingConflict:
+            for key, fresh_room in zip((source, target), rooms):
+                sync_room(hostels, *key, fresh_room)
+            raise
+        for key, fresh_room in zip((source, target), rooms):
+            sync_room(hostels, *key, fresh_room)
+
+    # Function for change_feed.ChangeTailer: (stamp, new hostels, changed rooms) since stamp. Uses its own
+    # connection, whose data_version only moves when another connection commits; one room scan then
+    # finds the changed versions and only those rooms' occupants are read.
+    def read_changes(self, stamp, known_hostels, versions):
+        if self.watch_conn is None:
+            self.watch_conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None,
+                                              check_same_thread=False)
+        conn = self.watch_conn
+        current = conn.execute("PRAGMA data_version").fetchone()[0]
+        if current == stamp:
+            return stamp, {}, {}
+        conn.execute("BEGIN")  # One snapshot for every query below
+        try:
+            new_hostels = {}
+            changed = {}
+            for hostel_id, hostel_name, distance, category, schema in conn.execute(
+                    "SELECT id, name, distance, category, schema FROM hostels ORDER BY id"):
+                if hostel_name not in known_hostels:
+                    new_hostels[hostel_name] = dict(self._hostel_summary(distance, category, schema), floors={})
+            for room_id, hostel_name, floor, room, version in conn.execute(
+                    "SELECT rooms.id, hostels.name, floors.name, rooms.name, version FROM rooms "
+                    "JOIN floors ON rooms.floor_id = floors.id JOIN hostels ON floors.hostel_id = hostels.id "
+                    "ORDER BY rooms.id"):
+                if hostel_name in new_hostels:
+                    new_hostels[hostel_name]["floors"].setdefault(floor, {})[room] = self._load_room(room_id, conn)
+                elif versions.get((hostel_name, floor, room)) != version:
+                    changed[(hostel_name, floor, room)] = room_id
+            rooms = {key: self._load_room(room_id, conn) for key, room_id in changed.items()}
+        finally:
+            conn.execute("COMMIT")
+        return current, new_hostels, rooms
+
+    def close(self):
+        if self.watch_conn is not None:
+            self.watch_conn.close()
+        self.conn.close()
+
+
+def count_beds(floors):
+    return sum(room_data["capacity"] for rooms in floors.values() for room_data in rooms.values())
+
+
+# Function to fingerprint a hostel the way its shard file is written, so unchanged hostels are not rewritten
+def shard_digest(info):
+    return hashlib.sha1(json.dumps(dict(info), indent=4).encode()).hexdigest()
+
+
+# Function to apply one booking-log record to {student_id: booking}
+def apply_booking_record(bookings, record):
+    op = record["op"]
+    if op == "book":
+        bookings.setdefault(record["booking"]["student_id"], record["booking"])
+    elif op == "cancel":
+        bookings.pop(record["student_id"], None)
+    elif op == "transfer":
+        bookings[record["booking"]["student_id"]] = record["booking"]
+    else:
+        raise ValueError(f"Unknown booking record: {op}")
+
+
+class ShardedStorage:
+    # One JSON file per hostel (same layout as one entry of hostel_data.json), a manifest with each
+    # hostel's file, summary (distance, category, ...) and bed count, and an append-only bookings log.
+    # A booking rewrites only its own hostel's file and appends one log line, so its cost does not grow
+    # with the number of hostels. Writes hold one lock for the directory, but only for that small write.
+    # Files and log line are committed together through a marker, rolled forward after a crash.
+    def __init__(self, directory=SHARD_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.manifest_file = os.path.join(directory, MANIFEST_FILE)
+        self.bookings_log = os.path.join(directory, BOOKINGS_LOG)
+        self.commit_file = os.path.join(directory, COMMIT_FILE)
+        self.lock = FileLock(os.path.join(directory, MANIFEST_FILE + ".lock"))
+        self.manifest = {}  # hostel -> {"file", "summary", "capacity"}
+        self.claims = {}  # student_id -> booking, as far as the log has been read
+        self.log_position = (None, 0)  # (inode, offset) of the log read so far
+        self.log_records = 0
+        self.digests = {}  # hostel -> digest of the shard as last read or written, for dirty checks
+        with self.lock:
+            self._recover()
+
+    def _shard_path(self, hostel_name):
+        return os.path.join(self.directory, self.manifest[hostel_name]["file"])
+
+    # Function to pick a file name for a new hostel that no other hostel uses
+    def _shard_file(self, hostel_name):
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", hostel_name).strip("-").lower() or "hostel"
+        used = {entry["file"] for entry in self.manifest.values()}
+        for number in itertools.count(len(self.manifest) + 1):
+            name = f"{number:05d}-{slug}.json"
+            if name not in used:
+                return name
+
+    def _read_manifest(self):
+        self.manifest = load_json_file(self.manifest_file, {"hostels": {}})["hostels"]
+
+    # Function to read the log lines other desks appended since the last call (all of it after a rewrite)
+    def _read_claims(self):
+        try:
+            stat = os.stat(self.bookings_log)
+        except FileNotFoundError:
+            self.claims, self.log_position, self.log_records = {}, (None, 0), 0
+            return
+        inode, offset = self.log_position
+        if inode != stat.st_ino or stat.st_size < offset:
+            self.claims, offset, self.log_records = {}, 0, 0
+        with open(self.bookings_log, "r") as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith("\n"):
+                    break  # Torn append; the commit marker rolls it forward
+                apply_booking_record(self.claims, json.loads(line))
+                offset += len(line)
+                self.log_records += 1
+        self.log_position = (stat.st_ino, offset)
+
+    def _read_shard(self, hostel_name):
+        with open(self._shard_path(hostel_name), "r") as file:
+            text = file.read()
+        self.digests[hostel_name] = hashlib.sha1(text.encode()).hexdigest()  # Same text as write_temp_json wrote
+        return json.loads(text)
+
+    # Function to store shard files, the manifest and log records as one unit
+    def _commit(self, shards, records=(), manifest=False):
+        files = [(self._shard_path(hostel_name), info) for hostel_name, info in shards.items()]
+        if manifest:
+            files.append((self.manifest_file, {"version": 1, "hostels": self.manifest}))
+        marker = {"pairs": [(write_temp_json(path, data), path) for path, data in files],
+                  "records": list(records), "log_size": os.path.getsize(self.bookings_log)
+                  if os.path.exists(self.bookings_log) else 0}
+        marker_temp = write_temp_json(self.commit_file, marker)
+        os.replace(marker_temp, self.commit_file)  # From here on the change is durable
+        fsync_dir(self.directory)
+        self._finish(marker)
+        for hostel_name, info in shards.items():
+            self.digests[hostel_name] = shard_digest(info)
+
+    # Function to move committed files into place and append the log records (safe to repeat)
+    def _finish(self, marker):
+        for temp_path, path in marker["pairs"]:
+            if os.path.exists(temp_path):
+                os.replace(temp_path, path)
+        if marker["records"]:
+            with open(self.bookings_log, "a") as log:
+                log.truncate(marker["log_size"])  # Drop a partial append from an interrupted attempt
+                line = "".join(json.dumps(record) + "\n" for record in marker["records"])
+                metrics.count("bytes_written", len(line))
+                log.write(line)
+                log.flush()
+                os.fsync(log.fileno())
+        fsync_dir(self.directory)
+        os.remove(self.commit_file)
+
+    def _recover(self):
+        if os.path.exists(self.commit_file):
+            try:
+                with open(self.commit_file, "r") as file:
+                    marker = json.load(file)
+            except ValueError:
+                marker = None
+            if marker is not None:
+                self._finish(marker)
+            else:
+                os.remove(self.commit_file)
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))  # Temp files of a change that never committed
+
+    # Function to refresh the manifest and bookings from disk; call with the lock held
+    def _refresh(self):
+        self._read_manifest()
+        self._read_claims()
+
+    def load_hostels(self):
+        with self.lock:
+            self._refresh()
+            return {hostel_name: self._read_shard(hostel_name) for hostel_name in self.manifest}
+
+    def load_bookings(self):
+        with self.lock:
+            self._read_claims()
+            return list(self.claims.values())
+
+    # Startup load: the manifest only; each hostel's file is read when its rooms are first needed.
+    # Free beds before then are the hostel's beds minus its bookings.
+    def load_snapshot(self):
+        with self.lock:
+            self._refresh()
+            booked = collections.Counter(booking["hostel_name"] for booking in self.claims.values())
+            hostels = {hostel_name: self._lazy_hostel(hostel_name, entry["capacity"] - booked[hostel_name])
+                       for hostel_name, entry in self.manifest.items()}
+            return hostels, list(self.claims.values())
+
+    def _lazy_hostel(self, hostel_name, free_beds):
+        return LazyHostel(self.manifest[hostel_name]["summary"], lambda: self._read_shard(hostel_name)["floors"],
+                          max(free_beds, 0))
+
+    # Writes the hostels whose contents changed since they were read; hostels whose rooms were never
+    # loaded are skipped without being read
+    def save_hostels(self, hostels):
+        with self.lock:
+            self._read_manifest()
+            shards = {}
+            manifest = not os.path.exists(self.manifest_file)
+            for hostel_name, info in hostels.items():
+                if isinstance(info, LazyHostel) and not info.loaded:
+                    continue
+                if hostel_name not in self.manifest:
+                    self.manifest[hostel_name] = {"file": self._shard_file(hostel_name)}
+                entry = self.manifest[hostel_name]
+                summary = {key: value for key, value in info.items() if key != "floors"}
+                capacity = count_beds(info.get("floors", {}))
+                if entry.get("summary") != summary or entry.get("capacity") != capacity:
+                    entry.update(summary=summary, capacity=capacity)
+                    manifest = True
+                if shard_digest(info) != self.digests.get(hostel_name):
+                    shards[hostel_name] = dict(info)
+            for hostel_name in [name for name in self.manifest if name not in hostels]:
+                del self.manifest[hostel_name]  # Same as rewriting hostel_data.json without it
+                manifest = True
+            if shards or manifest:
+                self._commit(shards, manifest=manifest)
+
+    def save_bookings(self, bookings):
+        with self.lock:
+            self._rewrite_log(bookings)
+
+    # Function to replace the bookings log with one record per booking; call with the lock held
+    def _rewrite_log(self, bookings):
+        temp_path = self.bookings_log + ".tmp"
+        with open(temp_path, "w") as file:
+            for booking in bookings:
+                file.write(json.dumps({"op": "book", "booking": booking}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.bookings_log)
+        fsync_dir(self.directory)
+        self.log_position = (None, 0)
+        self._read_claims()
+
+    # Hostels added at other desks are merged into the caller's dict as well
+    def add_hostel(self, hostels, hostel_name):
+        with self.lock:
+            self._refresh()
+            if hostel_name in self.manifest:
+                raise BookingConflict("Hostel already exists!")
+            info = hostels[hostel_name]
+            self.manifest[hostel_name] = {"file": self._shard_file(hostel_name),
+                                          "summary": {key: value for key, value in info.items() if key != "floors"},
+                                          "capacity": count_beds(info["floors"])}
+            self._commit({hostel_name: info}, manifest=True)
+        for name in self.manifest:
+            if name not in hostels:
+                hostels[name] = self._lazy_hostel(name, self.manifest[name]["capacity"])
+
+    def add_booking(self, hostels, bookings, hostel_name, floor, room, occupant, booking=None,
+                    expected_version=None):
+        with self.lock:
+            self._refresh()
+            fresh_info = self._read_shard(hostel_name)
+            fresh_room = fresh_info["floors"][floor][room]
+            try:
+                check_booking(fresh_room, self.claims, occupant, expected_version)
+            except BookingConflict:
+                sync_room(hostels, hostel_name, floor, room, fresh_room)
+                raise
+            fresh_room["occupants"].append(occupant)
+            fresh_room["version"] = fresh_room.get("version", 0) + 1
+            self._commit({hostel_name: fresh_info}, [{"op": "book", "booking": booking}] if booking else ())
+        sync_room(hostels, hostel_name, floor, room, fresh_room)
+
+    # Function to store many bookings with one commit; each touched hostel's file is written once
+    def add_bookings(self, hostels, bookings, entries, versions=None):
+        with self.lock:
+            self._refresh()
+            shards = {}
+            booked_ids = set(self.claims)
+            records = []
+            for (hostel_name, floor, room, occupant, booking), expected_version in \
+                    zip(entries, versions or itertools.repeat(None)):
+                if hostel_name not in shards:
+                    shards[hostel_name] = self._read_shard(hostel_name)
+                fresh_room = shards[hostel_name]["floors"][floor][room]
+                check_booking(fresh_room, booked_ids, occupant, expected_version)
+                fresh_room["occupants"].append(occupant)
+                fresh_room["version"] = fresh_room.get("version", 0) + 1
+                booked_ids.add(occupant["id"])
+                if booking is not None:
+                    records.append({"op": "book", "booking": booking})
+            self._commit(shards, records)
+        for hostel_name, floor, room, occupant, booking in entries:
+            sync_room(hostels, hostel_name, floor, room, shards[hostel_name]["floors"][floor][room])
+
+    def cancel_booking(self, hostels, bookings, hostel_name, floor, room, student_id):
+        with self.lock:
+            self._refresh()
+            fresh_info = self._read_shard(hostel_name)
+            fresh_room = fresh_info["floors"][floor][room]
+            fresh_room["occupants"] = [occupant for occupant in fresh_room["occupants"] if occupant["id"] != student_id]
+            fresh_room["version"] = fresh_room.get("version", 0) + 1
+            records = [{"op": "cancel", "student_id": student_id}] if student_id in self.claims else []
+            self._commit({hostel_name: fresh_info}, records)
+        sync_room(hostels, hostel_name, floor, room, fresh_room)
+
+    # A move between hostels commits both hostels' files and the log record together
+    def transfer_booking(self, hostels, bookings, student_id, source, target, booking=None):
+        with self.lock:
+            self._refresh()
+            shards = {hostel_name: self._read_shard(hostel_name) for hostel_name in {source[0], target[0]}}
+            rooms = [shards[hostel_name]["floors"][floor][room] for hostel_name, floor, room in (source, target)]
+            try:
+                move_occupant(rooms[0], rooms[1], student_id)
+            except BookingConflict:
+                for key, fresh_room in zip((source, target), rooms):
+                    sync_room(hostels, *key, fresh_room)
+                raise
+            self._commit(shards, [{"op": "transfer", "booking": booking}] if booking else ())
+        for key, fresh_room in zip((source, target), rooms):
+            sync_room(hostels, *key, fresh_room)
+
+    # Function for change_feed.ChangeTailer: (stamp, new hostels, changed rooms) since stamp. The stamp
+    # holds every file's mtime and size, so only the hostel files that were replaced are read again.
+    # Files are only ever swapped in whole, so no lock is needed.
+    def read_changes(self, stamp, known_hostels, versions):
+        current = {}
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                current[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        if current == stamp:
+            return stamp, {}, {}
+        new_hostels = {}
+        rooms = {}
+        for hostel_name, entry in load_json_file(self.manifest_file, {"hostels": {}})["hostels"].items():
+            if hostel_name in known_hostels and stamp is not None and \
+                    current.get(entry["file"]) == stamp.get(entry["file"]):
+                continue
+            info = load_json_file(os.path.join(self.directory, entry["file"]), None)
+            if info is not None:
+                hostel_new, hostel_rooms = tree_changes({hostel_name: info}, known_hostels, versions)
+                new_hostels.update(hostel_new)
+                rooms.update(hostel_rooms)
+        return current, new_hostels, rooms
+
+    # The log is rewritten without cancelled and superseded records once it is mostly history
+    def close(self):
+        with self.lock:
+            self._read_claims()
+            if self.log_records > 2 * len(self.claims) + COMPACT_EVERY:
+                self._rewrite_log(list(self.claims.values()))
+
+
+class MemoryStorage:
+    # Keeps everything in memory only; used by scripts and benchmarks that should not touch disk
+    def __init__(self, hostels=None, bookings=None):
+        self.hostels = hostels if hostels is not None else {}
+        self.bookings = list(bookings or [])
+
+    def load_hostels(self):
+        return self.hostels
+
+    def load_bookings(self):
+        return list(self.bookings)
+
+    def load_snapshot(self):
+        return self.load_hostels(), self.load_bookings()
+
+    def save_hostels(self, hostels):
+        self.hostels = hostels
+
+    def save_bookings(self, bookings):
+        self.bookings = list(bookings)
+
+    def add_hostel(self, hostels, hostel_name):
+        self.hostels.setdefault(hostel_name, hostels[hostel_name])
+
+    def add_booking(self, hostels, bookings, hostel_name, floor, room, occupant, booking=None,
+                    expected_version=None):
+        room_data = hostels[hostel_name]["floors"][floor][room]
+        check_booking(room_data, (), occupant, expected_version)
+        room_data["occupants"].append(occupant)
+        room_data["version"] = room_data.get("version", 0) + 1
+        if booking is not None:
+            self.bookings.append(booking)
+
+    def add_bookings(self, hostels, bookings, entries, versions=None):
+        for entry, expected_version in zip(entries, versions or itertools.repeat(None)):
+            self.add_booking(hostels, bookings, *entry, expected_version)
+
+    def cancel_booking(self, hostels, bookings, hostel_name, floor, room, student_id):
+        room_data = hostels[hostel_name]["floors"][floor][room]
+        room_data["occupants"] = [occupant for occupant in room_data["occupants"] if occupant["id"] != student_id]
+        room_data["version"] = room_data.get("version", 0) + 1
+        self.bookings = [entry for entry in self.bookings if entry["student_id"] != student_id]
+
+    # Nothing is shared with other desks
+    def read_changes(self, stamp, known_hostels, versions):
+        return stamp, {}, {}
+
+    def transfer_booking(self, hostels, bookings, student_id, source, target, booking=None):
+        move_occupant(*[hostels[hostel_name]["floors"][floor][room] for hostel_name, floor, room in (source, target)],
+                      student_id)
+        if booking is not None:
+            self.bookings = [booking if entry["student_id"] == student_id else entry for entry in self.bookings]
+
+    def close(self):
+        pass
+
+
+# Function to open the storage backend selected by the HOSTEL_STORAGE environment variable
+def open_storage(kind=None):
+    kind = kind or os.environ.get(STORAGE_ENV, "json")
+    if kind == "json":
+        return JsonStorage()
+    if kind == "sqlite":
+        return SqliteStorage()
+    if kind == "journal":
+        return JournalStorage()
+    if kind == "sharded":
+        return ShardedStorage()
+    if kind == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+# Function to copy everything from one backend into another (e.g. JSON files into SQLite)
+def migrate(source, target):
+    hostels = source.load_hostels()
+    bookings = source.load_bookings()
+    target.save_hostels(hostels)
+    target.save_bookings(bookings)
+    return len(hostels), len(bookings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import the JSON hostel files into SQLite or per-hostel shard files.")
+    parser.add_argument("--data-file", default=DATA_FILE)
+    parser.add_argument("--bookings-file", default=STUDENT_BOOKINGS_FILE)
+    parser.add_argument("--to", choices=["sqlite", "sharded"], default="sqlite")
+    parser.add_argument("--db", default=SQLITE_FILE)
+    parser.add_argument("--shards", default=SHARD_DIR, help="directory for --to sharded")
+    args = parser.parse_args()
+
+    if args.to == "sharded":
+        target, destination = ShardedStorage(args.shards), args.shards
+    else:
+        target, destination = SqliteStorage(args.db), args.db
+    hostel_count, booking_count = migrate(JsonStorage(args.data_file, args.bookings_file), target)
+    target.close()
+    print(f"Imported {hostel_count} hostels and {booking_count} bookings into {destination}")
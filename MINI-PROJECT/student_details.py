@@ -1,3 +1,4 @@
+import argparse
 import json
 
 # Define department codes and their corresponding names
@@ -11,31 +12,74 @@ department_codes = {
     "748": "AIML"  # Updated department code for AIML
 }
 
-# Function to generate roll numbers for each department, year-wise
-def generate_roll_numbers():
-    roll_numbers_by_year = {}
+COLLEGE_CODE = "1602"
+RANGES_FORMAT = "roll_ranges"  # Marker for the compact file layout
+
+
+# Function to format one roll number as "1602-YY-DDD-NNN"
+def format_roll_number(year, department_code, unique_id, college=COLLEGE_CODE, width=3):
+    year_suffix = str(year)[2:]  # Get the last two digits of the year (e.g., 20 for 2020)
+    return f"{college}-{year_suffix}-{department_code}-{str(unique_id).zfill(width)}"
+
 
-    # Initialize dictionary with years and department names
-    for year in range(2020, 2025):  # 2020 to 2024 for five years
-        roll_numbers_by_year[str(year)] = {}
+# Function to stream the nested year -> department -> [roll numbers] layout, byte-for-byte what json.dump(indent=4) writes
+def write_nested(file, years, departments, intake, college):
+    width = max(3, len(str(intake)))
+    file.write("{")
+    for year_number, year in enumerate(years):
+        file.write(",\n" if year_number else "\n")
+        file.write(f'    "{year}": {{')
+        for department_number, (department_code, department_name) in enumerate(departments.items()):
+            file.write(",\n" if department_number else "\n")
+            file.write(f"        {json.dumps(department_name)}: ")
+            if intake < 1:
+                file.write("[]")
+                continue
+            file.write("[\n")
+            file.write(",\n".join(
+                f'            "{format_roll_number(year, department_code, unique_id, college, width)}"'
+                for unique_id in range(1, intake + 1)))
+            file.write("\n        ]")
+        file.write("\n    }" if departments else "}")
+    file.write("\n}" if len(years) else "}")
 
-        for department_code, department_name in department_codes.items():
-            roll_numbers_by_year[str(year)][department_name] = []
 
-    # Define the range for the unique IDs (001 to 194 for each department)
-    for year in range(2020, 2025):  # 2020 to 2024 for five years
-        year_suffix = str(year)[2:]  # Get the last two digits of the year (e.g., 20 for 2020)
+# Function to build the compact layout: year -> department code -> [first, last] serial
+def compact_ranges(years, departments, intake, college):
+    return {
+        "format": RANGES_FORMAT,
+        "college": college,
+        "width": max(3, len(str(intake))),
+        "departments": dict(departments),
+        "years": {
+            str(year): {department_code: [1, intake] for department_code in departments}
+            for year in years
+        }
+    }
+
+
+# Function to generate roll numbers for each department, year-wise
+def generate_roll_numbers(years=range(2020, 2025), departments=None, intake=194, path="college_ids.json",
+                          compact=False, college=COLLEGE_CODE):
+    departments = departments or department_codes
+    years = list(years)
+    with open(path, "w") as file:
+        if compact:
+            json.dump(compact_ranges(years, departments, intake, college), file, indent=4)
+        else:
+            write_nested(file, years, departments, intake, college)
 
-        for department_code, department_name in department_codes.items():
-            for unique_id in range(1, 195):  # Generating IDs from 001 to 194 for each department
-                # Format the roll number as "1602-XX-XXX-XXX"
-                roll_number = f"1602-{year_suffix}-{department_code}-{str(unique_id).zfill(3)}"
-                # Append the roll number to the respective department and year
-                roll_numbers_by_year[str(year)][department_name].append(roll_number)
 
-    # Write the structured roll numbers to a JSON file
-    with open("college_ids.json", "w") as file:
-        json.dump(roll_numbers_by_year, file, indent=4)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the valid student ID file.")
+    parser.add_argument("--start-year", type=int, default=2020)
+    parser.add_argument("--end-year", type=int, default=2024, help="last year, inclusive")
+    parser.add_argument("--intake", type=int, default=194, help="students per department per year")
+    parser.add_argument("--college", default=COLLEGE_CODE)
+    parser.add_argument("--compact", action="store_true", help="write year x department ranges instead of every ID")
+    parser.add_argument("--output", default="college_ids.json")
+    args = parser.parse_args()
 
-# Call the function to generate the roll numbers
-generate_roll_numbers()
+    # Call the function to generate the roll numbers
+    generate_roll_numbers(range(args.start_year, args.end_year + 1), intake=args.intake, path=args.output,
+                          compact=args.compact, college=args.college)
@@ -0,0 +1,118 @@
+import json
+import os
+
+import metrics
+
+COLLEGE_IDS_FILE = "college_ids.json"  # File to store valid student IDs
+COLLEGE_CODE = "1602"  # Prefix used by student_details.generate_roll_numbers
+
+# Cached index, rebuilt only when the ID file changes on disk
+_index = None
+_index_stamp = None
+_index_path = None
+
+
+# Function to pack a "1602-YY-DDD-NNN" roll number into one integer (None if it does not match)
+def encode_id(student_id):
+    if not isinstance(student_id, str) or len(student_id) != 15:
+        return None
+    parts = student_id.split("-")
+    if len(parts) != 4 or parts[0] != COLLEGE_CODE:
+        return None
+    year, department, unique_id = parts[1], parts[2], parts[3]
+    if len(year) != 2 or len(department) != 3 or len(unique_id) != 3:
+        return None
+    if not (year.isdigit() and department.isdigit() and unique_id.isdigit()):
+        return None
+    return (int(year) * 1000 + int(department)) * 1000 + int(unique_id)
+
+
+class IdSetIndex:
+    # Every valid ID listed out: packed integers for roll numbers, strings for anything else
+    def __init__(self, encoded, others):
+        self.encoded = encoded
+        self.others = others
+
+    def __contains__(self, student_id):
+        key = encode_id(student_id)
+        if key is not None:
+            return key in self.encoded
+        return student_id in self.others
+
+    def __len__(self):
+        return len(self.encoded) + len(self.others)
+
+
+class IdRangeIndex:
+    # Compact layout from student_details.generate_roll_numbers(compact=True): (year, department) -> serial ranges
+    def __init__(self, college, width, ranges):
+        self.college = college
+        self.width = width
+        self.ranges = ranges  # (year suffix, department code) -> [(first, last), ...]
+
+    def __contains__(self, student_id):
+        if not isinstance(student_id, str):
+            return False
+        parts = student_id.split("-")
+        if len(parts) != 4 or parts[0] != self.college:
+            return False
+        year, department, unique_id = parts[1], parts[2], parts[3]
+        if len(unique_id) != self.width or not unique_id.isdigit():
+            return False
+        serial = int(unique_id)
+        for first, last in self.ranges.get((year, department), ()):
+            if first <= serial <= last:
+                return True
+        return False
+
+    def __len__(self):
+        return sum(last - first + 1 for spans in self.ranges.values() for first, last in spans)
+
+
+# Function to build the lookup index from either file layout
+def build_id_index(data):
+    if data.get("format") == "roll_ranges":
+        ranges = {}
+        for year, departments in data["years"].items():
+            for department_code, span in departments.items():
+                spans = span if span and isinstance(span[0], list) else [span]
+                ranges[(str(year)[2:], department_code)] = [tuple(item) for item in spans]
+        return IdRangeIndex(data["college"], data["width"], ranges)
+
+    encoded = set()
+    others = set()  # IDs that do not follow the roll number format are kept as strings
+    for year in data.values():
+        for department_ids in year.values():
+            for student_id in department_ids:
+                key = encode_id(student_id)
+                if key is None:
+                    others.add(student_id)
+                else:
+                    encoded.add(key)
+    return IdSetIndex(encoded, others)
+
+
+# Function to get the ID index, reloading the file only if its mtime or size changed
+def load_id_index(path=COLLEGE_IDS_FILE):
+    global _index, _index_stamp, _index_path
+    stat = os.stat(path)  # Raises FileNotFoundError if the file is missing
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    if _index is None or _index_path != path or _index_stamp != stamp:
+        with metrics.timer("load_ids"), open(path, "r") as file:
+            _index = build_id_index(json.load(file))
+        _index_stamp = stamp
+        _index_path = path
+    return _index
+
+
+# Function to check a student ID against the index in constant time
+def is_valid_id(student_id, path=COLLEGE_IDS_FILE):
+    return student_id in load_id_index(path)
+
+
+# Function to drop the cached index (next lookup reloads the file)
+def clear_id_index():
+    global _index, _index_stamp, _index_path
+    _index = None
+    _index_stamp = None
+    _index_path = None
@@ -0,0 +1,25 @@
+import json
+import os
+import sys
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)  # The modules are flat files next to this directory
+
+COLLEGE_IDS = os.path.join(PROJECT_DIR, "college_ids.json")
+
+
+# Every data file is cwd-relative, so each test runs in its own empty directory
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+# Every valid roll number, in the same order as college_ids.json
+@pytest.fixture(scope="session")
+def roll_numbers():
+    with open(COLLEGE_IDS, "r") as file:
+        data = json.load(file)
+    return [student_id for year in data.values() for department in year.values() for student_id in department]
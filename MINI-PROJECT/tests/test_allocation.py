@@ -0,0 +1,66 @@
+import io
+
+import storage
+from allocation import allocate, read_students
+from hostel_engine import HostelEngine
+from storage import BookingError
+
+from conftest import COLLEGE_IDS
+
+
+# Short rows, overlong rows and unreadable budgets become per-row errors; the good rows are still placed
+def test_malformed_rows_are_reported_per_row(roll_numbers):
+    first, second, third, fourth = roll_numbers[:4]
+    file = io.StringIO("\n".join([
+        "student_id,name,category,preferences,meal,max_meal_price",
+        f"{first},Asha,Boys,Hostel A,Veg,",
+        f"{second},Ben",
+        f"{third},Cara,Boys,Hostel A,Veg,cheap",
+        f"{fourth},Dev,Boys,Hostel A,Veg,500,extra",
+    ]) + "\n")
+    errors = []
+    rows = list(read_students(file, errors))
+    assert rows == [(2, first, "Asha", "Boys", ["Hostel A"], "Veg", None)]
+    assert errors == [(3, second, "Row is missing: category, preferences!"),
+                      (4, third, "Maximum meal price must be a number!"),
+                      (5, fourth, "Row has more fields than the header!")]
+
+
+def test_budget_is_read_as_a_number():
+    file = io.StringIO("student_id,name,category,preferences,max_meal_price\nX,Asha,Boys,, 120.5 \n")
+    errors = []
+    assert list(read_students(file, errors))[0][6] == 120.5
+    assert errors == []
+
+
+# Hostels with a missing or non-numeric distance sort after every real distance instead of raising
+def test_hostels_without_a_distance_are_tried_last(roll_numbers):
+    engine = HostelEngine(storage.MemoryStorage(), ids_file=COLLEGE_IDS)
+    engine.add_hostel("Far", 1, 1, 1, 9.0, "Boys")
+    engine.add_hostel("Unknown", 1, 1, 1, 1.0, "Boys")
+    engine.add_hostel("Near", 1, 1, 1, 0.5, "Boys")
+    engine.hostels["Unknown"]["distance"] = None
+    rows = [(index + 2, student_id, f"Student {index}", "Boys", [], None, None)
+            for index, student_id in enumerate(roll_numbers[:3])]
+    booked, unplaced, errors = allocate(engine, rows, workers=1)
+    assert [booking["hostel_name"] for booking in booked] == ["Near", "Far", "Unknown"]
+    assert unplaced == [] and errors == []
+
+
+# A placement the engine refuses becomes that row's error; the students after it are still placed
+def test_refused_placement_does_not_stop_the_run(roll_numbers, monkeypatch):
+    engine = HostelEngine(storage.MemoryStorage(), ids_file=COLLEGE_IDS)
+    engine.add_hostel("Hostel A", 1, 1, 3, 1.0, "Boys")
+    make_entry = engine.make_entry
+
+    def refuse_second(hostel_name, floor, room, student_id, *args, **kwargs):
+        if student_id == roll_numbers[1]:
+            raise BookingError("Student has already booked a room!")
+        return make_entry(hostel_name, floor, room, student_id, *args, **kwargs)
+
+    monkeypatch.setattr(engine, "make_entry", refuse_second)
+    rows = [(index + 2, student_id, f"Student {index}", "Boys", [], None, None)
+            for index, student_id in enumerate(roll_numbers[:3])]
+    booked, unplaced, errors = allocate(engine, rows, workers=1)
+    assert [booking["student_id"] for booking in booked] == [roll_numbers[0], roll_numbers[2]]
+    assert unplaced == [] and errors == [(3, roll_numbers[1], "Student has already booked a room!")]
@@ -0,0 +1,18 @@
+from analytics import AnalyticsReport
+
+
+def hostels(capacities):
+    return {"Hostel A": {"category": "Boys", "floors": {"Floor 1": {
+        f"Room {number}": {"capacity": capacity, "occupants": [{"id": "1602-21-733-001", "meal": "Veg"}],
+                           "veg_price": 100}
+        for number, capacity in enumerate(capacities, 1)}}}}
+
+
+# Capacities stored as text are read as numbers; ones that are not numbers are left out and counted
+def test_text_capacities():
+    report = AnalyticsReport(hostels(["3", 2, "two", None]))
+    assert report.hostels == [("Hostel A", "Boys", 5, 2, 3, 0.6, 2, 0, 200)]
+    assert report.floors == [("Hostel A", "Floor 1", 5, 2, 3, 0.6)]
+    assert report.skipped_rooms == 2
+    assert report.summary().endswith("Rooms skipped (unreadable capacity): 2")
+    assert "skipped" not in AnalyticsReport(hostels([3])).summary()
@@ -0,0 +1,177 @@
+import copy
+import itertools
+import json
+import os
+import random
+
+import pytest
+
+import storage
+from hostel_engine import HostelEngine
+
+from conftest import COLLEGE_IDS
+
+ROOM = ("Hostel A", "Floor 1", "Room 1")
+BOOKING = {"student_id": "1602-20-732-001", "student_name": "Asha", "hostel_name": "Hostel A",
+           "room": "Room 1", "floor": "Floor 1"}
+
+
+def hostels_with(*occupants):
+    rooms = {"Room 1": {"status": "available", "capacity": 2, "occupants": [{"id": student_id, "name": "Asha"}
+                                                                             for student_id in occupants]},
+             "Room 2": {"status": "available", "capacity": 2, "occupants": []}}
+    return {"Hostel A": {"distance": 1.0, "category": "Boys", "floors": {"Floor 1": rooms}}}
+
+
+OLD = (hostels_with(), [])
+NEW = (hostels_with(BOOKING["student_id"]), [BOOKING])
+
+
+class Crash(Exception):
+    pass  # Stands in for the process being killed
+
+
+class CrashAt:
+    # Counts the filesystem steps a save takes (JSON writes, fsyncs, renames, links, removes) and
+    # raises Crash at step `at`. A JSON write that is interrupted leaves `fraction` of its bytes behind.
+    def __init__(self, monkeypatch, at, fraction):
+        self.at = at
+        self.fraction = fraction
+        self.steps = 0
+        self.crashed = False
+        dump = json.dump
+        monkeypatch.setattr(json, "dump", self.wrap(dump, torn=True))
+        for name in ("fsync", "replace", "link", "remove"):
+            monkeypatch.setattr(os, name, self.wrap(getattr(os, name)))
+
+    def wrap(self, function, torn=False):
+        def step(*args, **kwargs):
+            if self.steps == self.at:
+                self.crashed = True
+                if torn:
+                    text = json.dumps(args[0], **kwargs)
+                    args[1].write(text[:int(len(text) * self.fraction)])
+                    args[1].flush()
+                raise Crash
+            self.steps += 1
+            return function(*args, **kwargs)
+        return step
+
+
+def open_storage(directory):
+    return storage.JsonStorage(str(directory / storage.DATA_FILE), str(directory / storage.STUDENT_BOOKINGS_FILE))
+
+
+# Function to open the files the way the next run would (which recovers an interrupted save) and read them
+def reopened(directory):
+    backend = open_storage(directory)
+    state = (backend.load_hostels(), backend.load_bookings())
+    backend.close()
+    return state
+
+
+# Function to interrupt a save at every step in turn; each run starts from files holding OLD
+def crash_every_step(tmp_path, monkeypatch, save, seed):
+    rng = random.Random(seed)
+    for at in itertools.count():
+        directory = tmp_path / f"crash-{at}"
+        directory.mkdir()
+        backend = open_storage(directory)
+        backend.save_all(*copy.deepcopy(OLD))
+        with monkeypatch.context() as patch:
+            crash = CrashAt(patch, at, rng.random())
+            try:
+                save(backend)
+            except Crash:
+                pass
+        backend.close()
+        yield directory, crash.crashed
+        if not crash.crashed:
+            return
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_interrupted_save_all_is_all_old_or_all_new(tmp_path, monkeypatch, seed):
+    runs = list(crash_every_step(tmp_path, monkeypatch, lambda backend: backend.save_all(*copy.deepcopy(NEW)), seed))
+    assert len(runs) > 10  # Two temp files, the marker, backups and renames: every one was interrupted
+    outcomes = []
+    for directory, crashed in runs:
+        state = reopened(directory)
+        assert state in (OLD, NEW)
+        assert not any(name.endswith((".tmp", ".rotate")) or name == storage.COMMIT_FILE
+                       for name in os.listdir(directory))
+        outcomes.append(state)
+    assert outcomes[0] == OLD and outcomes[-1] == NEW
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_interrupted_booking_is_all_old_or_all_new(tmp_path, monkeypatch, seed):
+    def book(backend):
+        hostels, bookings = copy.deepcopy(OLD)
+        backend.add_booking(hostels, bookings, *ROOM, {"id": BOOKING["student_id"], "name": "Asha"}, BOOKING)
+
+    booked = copy.deepcopy(NEW)
+    booked[0]["Hostel A"]["floors"]["Floor 1"]["Room 1"]["version"] = 1
+    outcomes = [reopened(directory) for directory, crashed in crash_every_step(tmp_path, monkeypatch, book, seed)]
+    assert all(state in (OLD, booked) for state in outcomes)
+    assert outcomes[-1] == booked
+
+
+# A crash during recovery is recovered on the next open as well
+def test_interrupted_recovery_finishes_on_next_open(tmp_path, monkeypatch):
+    for directory, crashed in crash_every_step(tmp_path, monkeypatch,
+                                               lambda backend: backend.save_all(*copy.deepcopy(NEW)), 0):
+        if not os.path.exists(directory / storage.COMMIT_FILE):
+            continue
+        with monkeypatch.context() as patch:
+            CrashAt(patch, 1, 0.5)
+            try:
+                open_storage(directory)
+            except Crash:
+                pass
+        assert reopened(directory) == NEW
+
+
+def damage(path):
+    with open(path, "r+") as file:
+        file.truncate(os.path.getsize(path) // 2)
+
+
+# Each save shifts both files' backups, so .bak files always belong to the same save
+def test_backups_of_both_files_come_from_the_same_save(data_dir):
+    backend = open_storage(data_dir)
+    backend.save_all(*copy.deepcopy(OLD))
+    backend.save_all(*copy.deepcopy(NEW))
+    grown = copy.deepcopy(NEW[0])
+    grown["Hostel B"] = copy.deepcopy(grown["Hostel A"])
+    backend.save_hostels(grown)  # Bookings unchanged, but their backups move along
+    for suffix, expected in ((".bak", NEW), (".bak.1", OLD)):
+        with open(backend.data_file + suffix) as hostels, open(backend.bookings_file + suffix) as bookings:
+            assert (json.load(hostels), json.load(bookings)) == expected
+
+
+# Falling back for one file only would pair the older hostels with the newer bookings (or the reverse)
+@pytest.mark.parametrize("damaged", [storage.DATA_FILE, storage.STUDENT_BOOKINGS_FILE])
+def test_damaged_file_falls_back_together_with_its_partner(data_dir, damaged):
+    backend = open_storage(data_dir)
+    backend.save_all(*copy.deepcopy(NEW))
+    backend.save_all(*copy.deepcopy(OLD))  # The student cancelled
+    damage(data_dir / damaged)
+    assert reopened(data_dir) == NEW
+
+    engine = HostelEngine(open_storage(data_dir), ids_file=COLLEGE_IDS, lazy=True)
+    try:
+        assert engine.room(*ROOM)["occupants"] == NEW[0]["Hostel A"]["floors"]["Floor 1"]["Room 1"]["occupants"]
+        assert engine.find_booking(BOOKING["student_id"]) is not None
+    finally:
+        engine.close()
+
+
+def test_single_file_loader_still_uses_the_newest_readable_backup(data_dir):
+    path = str(data_dir / "data.json")
+    storage.commit_json_files(str(data_dir / storage.COMMIT_FILE), [(path, {"version": 1})])
+    storage.commit_json_files(str(data_dir / storage.COMMIT_FILE), [(path, {"version": 2})])
+    damage(path)
+    assert storage.load_json_file(path, None) == {"version": 1}
+    damage(path + ".bak")
+    assert storage.load_json_file(path, None) is None
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+import storage
+from booking_service import BookingService
+from hostel_engine import HostelEngine
+
+from conftest import COLLEGE_IDS
+
+
+@pytest.fixture
+def service():
+    engine = HostelEngine(storage.MemoryStorage(), ids_file=COLLEGE_IDS)
+    engine.add_hostel("101", 1, 1, 2, 1.0, "Boys")
+    return BookingService(engine)
+
+
+@pytest.mark.parametrize("body", [
+    b'{"hostel": ["101"], "floor": "Floor 1", "room": "Room 1", "student_id": "x", "name": "Asha"}',
+    b'{"hostel": {"a": 1}, "floor": "Floor 1", "room": "Room 1", "student_id": "x", "name": "Asha"}',
+    b'{"hostel": 101, "floor": "Floor 1", "room": "Room 1", "student_id": "x", "name": "Asha"}',
+])
+def test_non_string_fields_are_a_validation_error(service, body):
+    status, payload = asyncio.run(service.respond("POST", "/bookings", body))
+    assert (status, payload) == (400, {"error": "Fields must be strings: hostel"})
+    status, payload = asyncio.run(service.respond("PUT", "/bookings/x", body))
+    assert (status, payload) == (400, {"error": "Fields must be strings: hostel"})
+
+
+# Function to send raw request bytes to a connection handler and read back everything it writes
+async def exchange(service, request):
+    server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+    async with server:
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+
+
+@pytest.mark.parametrize("length", [b"ten", b"-1", b"1.5"])
+def test_unreadable_content_length_is_answered(service, length):
+    response = asyncio.run(exchange(service, b"POST /bookings HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n{}"))
+    assert response.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+    assert response.endswith(b'{"error": "Content-Length must be a whole number"}')
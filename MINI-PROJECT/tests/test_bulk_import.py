@@ -0,0 +1,63 @@
+import pytest
+
+import storage
+from bulk_import import import_csv
+from hostel_engine import HostelEngine
+from storage import BookingConflict
+
+from conftest import COLLEGE_IDS
+
+
+def write_csv(path, lines):
+    path.write_text("\n".join(["student_id,name,hostel,floor,room"] + lines) + "\n")
+    return str(path)
+
+
+# Short and overlong rows become per-row errors; the good rows around them are still booked
+def test_malformed_rows_are_reported_per_row(data_dir, roll_numbers):
+    engine = HostelEngine(storage.MemoryStorage(), ids_file=COLLEGE_IDS)
+    engine.add_hostel("Hostel A", 1, 2, 4, 1.0, "Boys")
+    first, second, third, fourth = roll_numbers[:4]
+    path = write_csv(data_dir / "rows.csv", [
+        f"{first},Asha,Hostel A,Floor 1,Room 1",
+        f"{second},Ben",
+        f"{third},Cara,Hostel A,Floor 1,Room 2,Room 3",
+        f"{fourth},Dev,Hostel A,Floor 1,Room 2,",
+        "",
+        "1602-99-999-999,Eve,Hostel A,Floor 1,Room 1",
+    ])
+    booked, errors = import_csv(engine, path)
+    assert [booking["student_id"] for booking in booked] == [first, fourth]
+    assert errors == [(3, second, "Row is missing: hostel, floor, room!"),
+                      (4, third, "Row has more fields than the header!"),
+                      (7, "1602-99-999-999", "Invalid Student ID!")]
+
+
+def test_strict_import_books_nothing_when_a_row_is_malformed(data_dir, roll_numbers):
+    engine = HostelEngine(storage.MemoryStorage(), ids_file=COLLEGE_IDS)
+    engine.add_hostel("Hostel A", 1, 2, 4, 1.0, "Boys")
+    path = write_csv(data_dir / "rows.csv", [f"{roll_numbers[0]},Asha,Hostel A,Floor 1,Room 1", f"{roll_numbers[1]}"])
+    booked, errors = import_csv(engine, path, strict=True)
+    assert booked == [] and len(errors) == 1
+    assert engine.find_booking(roll_numbers[0]) is None
+
+
+# A student booked at another desk after the rows were checked only costs that row; the rest still land
+def test_conflict_from_another_desk_rejects_only_its_row(data_dir, roll_numbers):
+    engine = HostelEngine(storage.open_storage("json"), ids_file=COLLEGE_IDS)
+    engine.add_hostel("Hostel A", 1, 2, 4, 1.0, "Boys")
+    other = HostelEngine(storage.open_storage("json"), ids_file=COLLEGE_IDS)
+    first, second, third = roll_numbers[:3]
+    try:
+        other.book("Hostel A", "Floor 1", "Room 2", second, "Ben")
+        path = write_csv(data_dir / "rows.csv", [f"{student_id},Student,Hostel A,Floor 1,Room 1"
+                                                 for student_id in (first, second, third)])
+        with pytest.raises(BookingConflict):
+            import_csv(engine, path, strict=True)
+        assert engine.find_booking(first) is None
+        booked, errors = import_csv(engine, path)
+        assert [booking["student_id"] for booking in booked] == [first, third]
+        assert errors == [(3, second, "Student has already booked a room!")]
+    finally:
+        other.close()
+        engine.close()
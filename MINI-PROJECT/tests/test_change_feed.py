@@ -0,0 +1,66 @@
+import logging
+import threading
+
+import metrics
+import storage
+from change_feed import ChangeTailer
+from hostel_engine import HostelEngine
+
+from conftest import COLLEGE_IDS
+
+
+class FlakyStorage:
+    # read_changes raises on the first calls (a file caught mid-replace), then reports one changed room
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def read_changes(self, stamp, known_hostels, versions):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OSError("hostel_data.json is being replaced")
+        return self.calls, {}, {("Hostel A", "Floor 1", "Room 1"): {"version": self.calls}}
+
+
+def test_failed_polls_are_counted_and_logged(monkeypatch, caplog):
+    monkeypatch.setattr(metrics, "enabled", True)
+    metrics.reset()
+    applied = threading.Event()
+    tailer = ChangeTailer(FlakyStorage(failures=3), lambda new_hostels, rooms: applied.set(), lambda fn: fn(),
+                          interval=0.01)
+    with caplog.at_level(logging.WARNING, logger="change_feed"):
+        tailer.start()
+        try:
+            assert applied.wait(5)  # Still polling after the failures
+        finally:
+            tailer.stop()
+    assert dict(metrics.counter_rows())["tail_errors"] == 3
+    failures = [record for record in caplog.records if "other desks failed" in record.getMessage()]
+    assert len(failures) == 3 and all(record.exc_info[0] is OSError for record in failures)
+    metrics.reset()
+
+
+# Saves made at this desk move the file stamp without a reload; a save from another desk is read again
+def test_own_saves_are_not_read_back(data_dir, roll_numbers, monkeypatch):
+    engine = HostelEngine(storage.JsonStorage(), ids_file=COLLEGE_IDS)
+    engine.add_hostel("Hostel A", 1, 2, 2, 1.0, "Boys")
+    other = HostelEngine(storage.JsonStorage(), ids_file=COLLEGE_IDS)
+    tailer = ChangeTailer(engine.storage, engine.apply_changes, lambda fn: fn())
+    reads = []
+    read_tree = storage.JsonStorage._read_tree
+    monkeypatch.setattr(storage.JsonStorage, "_read_tree", lambda self: reads.append(self) or read_tree(self))
+    try:
+        tailer.poll(publish=False)
+        engine.book("Hostel A", "Floor 1", "Room 1", roll_numbers[0], "Asha")
+        engine.book("Hostel A", "Floor 1", "Room 1", roll_numbers[1], "Ben")
+        assert tailer.poll() == 0 and reads == [engine.storage]
+        assert tailer.poll() == 0 and len(reads) == 1
+
+        other.book("Hostel A", "Floor 1", "Room 2", roll_numbers[2], "Cara")
+        assert tailer.poll() >= 1 and len(reads) == 2  # Room 1 comes along too; the engine already has it
+        assert engine.find_booking(roll_numbers[2])["room"] == "Room 2"
+        engine.book("Hostel A", "Floor 1", "Room 2", roll_numbers[3], "Dev")
+        assert tailer.poll() == 0 and len(reads) == 2
+    finally:
+        other.close()
+        engine.close()
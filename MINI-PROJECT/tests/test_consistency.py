@@ -0,0 +1,74 @@
+import queue
+import random
+
+import pytest
+
+import storage
+from benchmarks import consistency_errors, make_hostels, room_occupants
+from hostel_engine import HostelEngine
+
+from conftest import COLLEGE_IDS
+
+OPERATIONS = 600
+
+# MemoryStorage writes straight into the rooms it is handed and has no stored copy to re-check a queued
+# write against, so it only runs inline
+CASES = [("memory", "inline")] + [(kind, mode) for kind in ("json", "journal", "sqlite", "sharded")
+                                  for mode in ("inline", "worker")]
+
+
+# Random book/cancel/transfer operations on every backend, inline and through the persistence worker;
+# the rooms and bookings must agree in memory and after a reload
+@pytest.mark.parametrize("seed", [17, 29])
+@pytest.mark.parametrize("kind, mode", CASES)
+def test_random_operations_keep_rooms_and_bookings_consistent(roll_numbers, kind, mode, seed):
+    memory = storage.MemoryStorage(make_hostels(6, floors=2, rooms=5, capacity=3))
+
+    def open_backend():
+        return memory if kind == "memory" else storage.open_storage(kind)
+
+    backend = open_backend()
+    if kind != "memory":
+        backend.save_hostels(make_hostels(6, floors=2, rooms=5, capacity=3))
+    engine = HostelEngine(backend, ids_file=COLLEGE_IDS)
+    callbacks = queue.SimpleQueue()
+    worker = engine.start_worker(callbacks.put) if mode == "worker" else None
+    rooms = [(hostel, floor, room) for hostel, info in engine.hostels.items()
+             for floor, floor_rooms in info["floors"].items() for room in floor_rooms]
+    students = roll_numbers[:len(rooms) * 2]  # Twice as many students as rooms, so rooms fill up
+    rng = random.Random(seed)
+
+    def run_callbacks():
+        while not callbacks.empty():
+            callbacks.get()()
+
+    try:
+        for i in range(OPERATIONS):
+            student_id = rng.choice(students)
+            try:
+                if student_id not in engine.bookings:
+                    engine.submit_booking(*rng.choice(rooms), student_id, f"Student {i}")
+                elif rng.random() < 0.5:
+                    engine.submit_cancel(student_id)
+                else:
+                    engine.submit_transfer(student_id, *rng.choice(rooms))
+            except storage.BookingError:
+                pass
+            if worker is not None and i % 50 == 49:
+                worker.flush()
+            run_callbacks()
+        if worker is not None:
+            worker.flush()
+            run_callbacks()
+        assert consistency_errors(engine.hostels, engine.bookings) == []
+        expected = room_occupants(engine.hostels)
+        assert len(engine.bookings) > 0
+    finally:
+        engine.close()
+
+    reloaded = HostelEngine(open_backend(), ids_file=COLLEGE_IDS)
+    try:
+        assert consistency_errors(reloaded.hostels, reloaded.storage.load_bookings()) == []
+        assert room_occupants(reloaded.hostels) == expected
+    finally:
+        reloaded.close()
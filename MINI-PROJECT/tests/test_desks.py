@@ -0,0 +1,33 @@
+import multiprocessing
+
+import pytest
+
+import storage
+from benchmarks import _desk_worker
+
+DESKS = 8
+ATTEMPTS = 5
+CAPACITY = 10
+
+
+# N desk processes hammer one room; it must end up exactly full, never over capacity, with one
+# booking per occupant
+@pytest.mark.parametrize("kind", ["json", "journal", "sqlite", "sharded"])
+def test_desks_never_overfill_a_room(data_dir, kind):
+    hostels = {"Stress": {"distance": 1.0, "category": "Mixed", "floors": {
+        "Floor 1": {"Room 1": {"status": "available", "capacity": CAPACITY, "occupants": []}}}}}
+    backend = storage.open_storage(kind)
+    backend.save_hostels(hostels)
+    backend.close()
+
+    with multiprocessing.Pool(DESKS) as pool:
+        results = pool.starmap(_desk_worker, [(kind, str(data_dir), desk, ATTEMPTS) for desk in range(DESKS)])
+
+    backend = storage.open_storage(kind)
+    try:
+        occupants = backend.load_hostels()["Stress"]["floors"]["Floor 1"]["Room 1"]["occupants"]
+        bookings = backend.load_bookings()
+    finally:
+        backend.close()
+    assert sum(results) == len(occupants) == len(bookings) == CAPACITY
+    assert sorted(occupant["id"] for occupant in occupants) == sorted(booking["student_id"] for booking in bookings)
@@ -0,0 +1,244 @@
+import queue
+
+import pytest
+
+import storage
+from hostel_engine import HostelEngine
+from storage import BookingConflict, BookingError
+
+from conftest import COLLEGE_IDS
+
+KINDS = ["memory", "json", "journal", "sqlite", "sharded"]
+ROOM = ("Hostel A", "Floor 1", "Room 1")
+
+
+# Function to open one backend in the test directory; memory hands back the same store so a reopen sees it
+@pytest.fixture(params=KINDS)
+def open_backend(request):
+    memory = storage.MemoryStorage()
+    return lambda: memory if request.param == "memory" else storage.open_storage(request.param)
+
+
+@pytest.fixture
+def engine(open_backend):
+    engine = HostelEngine(open_backend(), ids_file=COLLEGE_IDS)
+    engine.add_hostel("Hostel A", 2, 3, 2, 1.5, "Boys")
+    yield engine
+    engine.close()
+
+
+def reopened(open_backend):
+    return HostelEngine(open_backend(), ids_file=COLLEGE_IDS)
+
+
+def test_add_hostel_builds_every_floor_and_room(engine, open_backend):
+    info = engine.hostels["Hostel A"]
+    assert (info["distance"], info["category"]) == (1.5, "Boys")
+    assert list(info["floors"]) == ["Floor 1", "Floor 2"]
+    assert list(info["floors"]["Floor 2"]) == ["Room 1", "Room 2", "Room 3"]
+    assert all(room_data["capacity"] == 2 and room_data["occupants"] == []
+               for rooms in info["floors"].values() for room_data in rooms.values())
+
+    other = reopened(open_backend)
+    try:
+        assert other.list_rooms("Hostel A") == engine.list_rooms("Hostel A")
+    finally:
+        other.close()
+
+
+@pytest.mark.parametrize("arguments, message", [
+    (("", 1, 1, 1, 1.0, "Boys"), "Hostel name cannot be empty!"),
+    (("Hostel A", 1, 1, 1, 1.0, "Boys"), "Hostel already exists!"),
+    (("Hostel B", 0, 1, 1, 1.0, "Boys"), "Number of floors must be greater than 0!"),
+    (("Hostel B", 1, 0, 1, 1.0, "Boys"), "Number of rooms must be greater than 0!"),
+    (("Hostel B", 1, 1, 0, 1.0, "Boys"), "Room capacity must be greater than 0!"),
+    (("Hostel B", 1, 1, 1, 1.0, "Staff"), "Category must be one of Boys, Girls, Mixed!"),
+])
+def test_add_hostel_rejects_bad_input(engine, arguments, message):
+    with pytest.raises(BookingError, match=message):
+        engine.add_hostel(*arguments)
+    assert list(engine.hostels) == ["Hostel A"]
+
+
+def test_book_stores_occupant_and_booking(engine, open_backend, roll_numbers):
+    student_id = roll_numbers[0]
+    booking = engine.book(*ROOM, student_id, "Asha")
+    assert booking == {"student_id": student_id, "student_name": "Asha", "hostel_name": "Hostel A",
+                       "room": "Room 1", "floor": "Floor 1"}
+    assert engine.find_booking(student_id) == booking
+    assert engine.list_rooms("Hostel A", "Floor 1")[0] == ("Room 1", "Available", 1, 1, 2)
+
+    other = reopened(open_backend)
+    try:
+        assert other.find_booking(student_id) == booking
+        assert [occupant["id"] for occupant in other.room(*ROOM)["occupants"]] == [student_id]
+    finally:
+        other.close()
+
+
+@pytest.mark.parametrize("case, message", [
+    ("invalid id", "Invalid Student ID!"),
+    ("no name", "Student name cannot be empty!"),
+    ("bad meal", "Invalid meal choice!"),
+    ("booked twice", "Student has already booked this room!"),
+    ("second room", "Student has already booked a room!"),
+    ("room full", "Room is fully booked!"),
+])
+def test_book_rejects(engine, roll_numbers, case, message):
+    first, second, third = roll_numbers[:3]
+    if case in ("booked twice", "second room", "room full"):
+        engine.book(*ROOM, first, "Asha")
+    if case == "room full":
+        engine.book(*ROOM, second, "Ben")
+    student_id, name, meal, room = {
+        "invalid id": ("1602-99-999-999", "Asha", None, ROOM),
+        "no name": (first, "", None, ROOM),
+        "bad meal": (first, "Asha", "Vegan", ROOM),
+        "booked twice": (first, "Asha", None, ROOM),
+        "second room": (first, "Asha", None, ("Hostel A", "Floor 2", "Room 1")),
+        "room full": (third, "Cara", None, ROOM),
+    }[case]
+    before = engine.list_rooms("Hostel A")
+    with pytest.raises(BookingError, match=message):
+        engine.book(*room, student_id, name, meal)
+    assert engine.list_rooms("Hostel A") == before
+
+
+def test_cancel_frees_the_bed(engine, open_backend, roll_numbers):
+    student_id = roll_numbers[0]
+    booking = engine.book(*ROOM, student_id, "Asha")
+    assert engine.cancel(student_id) == booking
+    assert engine.find_booking(student_id) is None
+    assert engine.list_rooms("Hostel A", "Floor 1")[0] == ("Room 1", "Available", 0, 2, 2)
+    with pytest.raises(BookingError, match="No booking found"):
+        engine.cancel(student_id)
+
+    other = reopened(open_backend)
+    try:
+        assert other.find_booking(student_id) is None
+        assert other.room(*ROOM)["occupants"] == []
+    finally:
+        other.close()
+
+
+def test_find_booking_unknown_student(engine, roll_numbers):
+    assert engine.find_booking(roll_numbers[0]) is None
+
+
+def test_list_rooms_rows(engine, roll_numbers):
+    engine.book(*ROOM, roll_numbers[0], "Asha")
+    engine.book(*ROOM, roll_numbers[1], "Ben")
+    rows = engine.list_rooms("Hostel A")
+    assert len(rows) == 6  # Every floor when none is given
+    assert rows[:3] == [("Room 1", "Fully Booked", 2, 0, 2), ("Room 2", "Available", 0, 2, 2),
+                        ("Room 3", "Available", 0, 2, 2)]
+    assert engine.list_rooms("Hostel A", "Floor 2") == rows[3:]
+
+
+# Function to run the worker's finished-write callbacks on this thread, the way TkCallbacks does
+def drain(engine, callbacks):
+    engine.worker.flush()
+    while not callbacks.empty():
+        callbacks.get()()
+
+
+# The version read when the room was opened is checked by storage, inline and through the worker
+@pytest.mark.parametrize("mode", ["inline", "worker"])
+def test_booking_is_refused_when_another_desk_changed_the_room(open_backend, roll_numbers, mode):
+    if open_backend() is open_backend():
+        pytest.skip("MemoryStorage has no other desks")
+    engine = HostelEngine(open_backend(), ids_file=COLLEGE_IDS)
+    engine.add_hostel("Hostel A", 1, 1, 3, 1.0, "Boys")
+    other = reopened(open_backend)
+    callbacks = queue.SimpleQueue()
+    if mode == "worker":
+        engine.start_worker(callbacks.put)
+    errors = []
+    try:
+        version = engine.room_version(*ROOM)
+        other.book(*ROOM, roll_numbers[0], "Asha")  # Lands while the operator is still typing
+        try:
+            engine.submit_booking(*ROOM, roll_numbers[1], "Ben", expected_version=version, done=errors.append)
+        except BookingConflict as error:
+            errors.append(error)
+        if mode == "worker":
+            drain(engine, callbacks)
+        assert len(errors) == 1 and isinstance(errors[0], BookingConflict)
+        assert engine.find_booking(roll_numbers[1]) is None
+    finally:
+        other.close()
+        engine.close()
+    stored = reopened(open_backend)
+    try:
+        assert [occupant["id"] for occupant in stored.room(*ROOM)["occupants"]] == [roll_numbers[0]]
+    finally:
+        stored.close()
+
+
+# Bookings this desk queued itself count towards the version, so back-to-back bookings are not refused
+def test_queued_bookings_at_this_desk_are_not_conflicts(engine, roll_numbers):
+    callbacks = queue.SimpleQueue()
+    engine.start_worker(callbacks.put)
+    errors = []
+    for student_id in roll_numbers[:2]:
+        engine.submit_booking(*ROOM, student_id, "Student", expected_version=engine.room_version(*ROOM),
+                              done=errors.append)
+    drain(engine, callbacks)
+    assert errors == [None, None]
+    assert engine.room_version(*ROOM) == engine.room(*ROOM)["version"] == 2
+
+
+# When storage refuses the first of several queued bookings for a room, the ones behind it still land:
+# written in one batch, or in later batches queued before the refusal came back
+@pytest.mark.parametrize("batched", [True, False])
+def test_bookings_queued_behind_a_refused_one_still_land(open_backend, roll_numbers, batched):
+    if open_backend() is open_backend():
+        pytest.skip("MemoryStorage has no other desks")
+    engine = HostelEngine(open_backend(), ids_file=COLLEGE_IDS)
+    engine.add_hostel("Hostel A", 1, 2, 4, 1.0, "Boys")
+    other = reopened(open_backend)
+    callbacks = queue.SimpleQueue()
+    engine.start_worker(callbacks.put)
+    errors = []
+    try:
+        other.book("Hostel A", "Floor 1", "Room 2", roll_numbers[0], "Asha")  # This desk has not seen it yet
+        for student_id in roll_numbers[:4]:
+            engine.submit_booking(*ROOM, student_id, "Student", expected_version=engine.room_version(*ROOM),
+                                  done=errors.append)
+            if not batched:
+                engine.worker.flush()  # Written on its own; its result has not reached this thread yet
+        drain(engine, callbacks)
+        assert [type(error) for error in errors] == [BookingConflict, type(None), type(None), type(None)]
+        assert [occupant["id"] for occupant in engine.room(*ROOM)["occupants"]] == roll_numbers[1:4]
+        engine.submit_booking(*ROOM, roll_numbers[4], "Eve", expected_version=engine.room_version(*ROOM),
+                              done=errors.append)
+        drain(engine, callbacks)
+        assert errors[-1] is None
+    finally:
+        other.close()
+        engine.close()
+
+
+# A change another desk made that this desk has already seen is refused before anything is queued
+def test_stale_version_is_refused_at_once(engine, roll_numbers):
+    version = engine.room_version(*ROOM)
+    engine.book(*ROOM, roll_numbers[0], "Asha")
+    with pytest.raises(BookingConflict, match="changed at another desk"):
+        engine.submit_booking(*ROOM, roll_numbers[1], "Ben", expected_version=version)
+
+
+# Auto-allocation tries every hostel the student's category may use, nearest first, and nothing else
+def test_auto_allocate_follows_the_student_category(roll_numbers):
+    engine = HostelEngine(storage.MemoryStorage(), ids_file=COLLEGE_IDS)
+    engine.add_hostel("Girls Near", 1, 1, 1, 0.5, "Girls")
+    engine.add_hostel("Mixed", 1, 1, 1, 1.0, "Mixed")
+    engine.add_hostel("Boys Far", 1, 1, 1, 2.0, "Boys")
+    first, second, third = roll_numbers[:3]
+    assert engine.auto_allocate(first, "Asha", "Boys")["hostel_name"] == "Mixed"
+    assert engine.auto_allocate(second, "Ben", "Boys")["hostel_name"] == "Boys Far"
+    with pytest.raises(BookingError, match="No free beds left for Boys!"):
+        engine.auto_allocate(third, "Cara", "Boys")
+    for category in ("", None, "Mixed"):
+        with pytest.raises(BookingError, match="Category must be one of Boys, Girls!"):
+            engine.submit_allocate(third, "Cara", category)
+    assert engine.find_booking(third) is None
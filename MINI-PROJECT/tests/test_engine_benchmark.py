@@ -0,0 +1,40 @@
+import itertools
+
+import pytest
+
+import storage
+from benchmarks import make_hostels
+from hostel_engine import HostelEngine
+
+from conftest import COLLEGE_IDS
+
+pytest.importorskip("pytest_benchmark")
+
+BOOKINGS = 500
+
+
+# Bookings per second through HostelEngine on 10, 100 and 1,000 hostels; each round books the next
+# student into the next room, so no round is rejected as a duplicate
+@pytest.mark.parametrize("count", [10, 100, 1000])
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_bookings_per_second(benchmark, roll_numbers, kind, count):
+    if kind == "memory":
+        backend = storage.MemoryStorage(make_hostels(count))
+    else:
+        backend = storage.open_storage(kind)
+        backend.save_hostels(make_hostels(count))
+    engine = HostelEngine(backend, ids_file=COLLEGE_IDS)
+    rooms = [(hostel, floor, room) for hostel, info in engine.hostels.items()
+             for floor, floor_rooms in info["floors"].items() for room in floor_rooms]
+    students = iter(roll_numbers)
+    targets = itertools.cycle(rooms)
+
+    def book():
+        engine.book(*next(targets), next(students), "Student")
+
+    try:
+        benchmark.pedantic(book, rounds=BOOKINGS, iterations=1)
+    finally:
+        engine.close()
+    assert len(engine.bookings) == BOOKINGS
+    benchmark.extra_info["bookings_per_second"] = round(1 / benchmark.stats.stats.mean)
@@ -0,0 +1,95 @@
+import pytest
+
+import storage
+
+ROOM = ("Hostel A", "Floor 1", "Room 1")
+
+
+def hostels():
+    return {"Hostel A": {"distance": 1.0, "category": "Boys", "floors": {"Floor 1": {
+        "Room 1": {"status": "available", "capacity": 2, "occupants": []},
+        "Room 2": {"status": "available", "capacity": 2, "occupants": []}}}}}
+
+
+def book(desk, tree, student_id, room=ROOM):
+    booking = {"student_id": student_id, "student_name": "Student", "hostel_name": room[0], "floor": room[1],
+               "room": room[2]}
+    desk.add_booking(tree, [], *room, {"id": student_id, "name": "Student"}, booking)
+
+
+@pytest.fixture
+def desks(data_dir):
+    first = storage.JournalStorage()
+    first.save_hostels(hostels())
+    second = storage.JournalStorage()
+    yield first, second
+    first.close()
+    second.close()
+
+
+# After the first write only the records other desks appended are read, never the whole journal again
+def test_writes_only_read_new_journal_records(desks, monkeypatch):
+    first, second = desks
+    tree_a, tree_b = first.load_hostels(), second.load_hostels()
+    book(first, tree_a, "S1")
+    replays = []
+    original = storage.JournalStorage._replay
+    monkeypatch.setattr(storage.JournalStorage, "_replay", lambda self: replays.append(self) or original(self))
+    book(second, tree_b, "S2")  # Second desk's first write: one full replay
+    book(first, tree_a, "S3", ("Hostel A", "Floor 1", "Room 2"))
+    book(second, tree_b, "S4", ("Hostel A", "Floor 1", "Room 2"))
+    assert replays == [second]
+
+    # The first desk saw S2 arrive from the second desk without a replay; the room is now full
+    with pytest.raises(storage.BookingConflict, match="fully booked"):
+        book(first, tree_a, "S5")
+    assert [occupant["id"] for occupant in tree_a["Hostel A"]["floors"]["Floor 1"]["Room 1"]["occupants"]] == \
+        ["S1", "S2"]
+    assert replays == [second]
+
+
+# The write state is private: changing what a write handed back does not change what the next write checks
+def test_callers_never_share_the_write_state(desks):
+    first, second = desks
+    tree = first.load_hostels()
+    book(first, tree, "S1")
+    tree["Hostel A"]["floors"]["Floor 1"]["Room 1"]["occupants"].append({"id": "ghost"})
+    book(first, first.load_hostels(), "S2")
+    assert [occupant["id"] for occupant in second.load_hostels()["Hostel A"]["floors"]["Floor 1"]["Room 1"]
+            ["occupants"]] == ["S1", "S2"]
+
+
+# A crash mid-append leaves a partial line; the next record starts on its own line and survives a replay
+def test_record_after_a_torn_line_is_kept(desks):
+    first, second = desks
+    tree = first.load_hostels()
+    book(first, tree, "S1")
+    with open(first.journal_file, "a") as journal:
+        journal.write('{"op": "book", "hos')
+    book(second, second.load_hostels(), "S2", ("Hostel A", "Floor 1", "Room 2"))
+    book(first, tree, "S3")
+    reopened = storage.JournalStorage()
+    try:
+        rooms = reopened.load_hostels()["Hostel A"]["floors"]["Floor 1"]
+        assert [occupant["id"] for occupant in rooms["Room 1"]["occupants"]] == ["S1", "S3"]
+        assert [occupant["id"] for occupant in rooms["Room 2"]["occupants"]] == ["S2"]
+    finally:
+        reopened.close()
+
+
+# A compaction at another desk replaces the snapshot; the next write replays it instead of reading on
+def test_write_after_compaction_at_another_desk(desks):
+    first, second = desks
+    tree_a, tree_b = first.load_hostels(), second.load_hostels()
+    book(first, tree_a, "S1")
+    book(second, tree_b, "S2", ("Hostel A", "Floor 1", "Room 2"))
+    second.compact()
+    book(second, tree_b, "S3", ("Hostel A", "Floor 1", "Room 2"))
+    with pytest.raises(storage.BookingConflict, match="fully booked"):
+        book(first, tree_a, "S4", ("Hostel A", "Floor 1", "Room 2"))
+    book(first, tree_a, "S4")
+    reopened = storage.JournalStorage()
+    try:
+        assert {booking["student_id"] for booking in reopened.load_bookings()} == {"S1", "S2", "S3", "S4"}
+    finally:
+        reopened.close()
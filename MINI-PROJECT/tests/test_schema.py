@@ -0,0 +1,81 @@
+import json
+import os
+
+import schema
+import storage
+from hostel_cache import LazyHostel
+from hostel_engine import HostelEngine
+
+from conftest import COLLEGE_IDS
+
+
+def legacy_hostels(occupants):
+    return {"Hostel A": {"distance": 1.0, "category": "Boys", "floors": {"Floor 1": {
+        "Room 1": {"status": "available", "capacity": "2", "occupants": occupants}}}}}
+
+
+def read(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+# An in-place upgrade is a save like any other: both files shift their backups, so the .bak pair still
+# comes from one save and the damaged-file fallback keeps pairing them
+def test_in_place_upgrade_rotates_both_files_together(data_dir):
+    backend = storage.JsonStorage()
+    booking = {"student_id": "S1", "student_name": "Asha", "hostel_name": "Hostel A", "floor": "Floor 1",
+               "room": "Room 1"}
+    backend.save_all(legacy_hostels([]), [])
+    backend.save_all(legacy_hostels(["S1"]), [booking])
+    backend.close()
+
+    hostels, rooms, changed, problems = schema.migrate_file(storage.DATA_FILE, workers=1)
+    assert (hostels, rooms, changed, problems) == (1, 1, 1, [])
+
+    upgraded = read(storage.DATA_FILE)["Hostel A"]
+    assert upgraded["schema"] == schema.SCHEMA_VERSION
+    assert upgraded["floors"]["Floor 1"]["Room 1"]["capacity"] == 2
+    assert read(storage.DATA_FILE + ".bak") == legacy_hostels(["S1"])
+    assert read(storage.STUDENT_BOOKINGS_FILE + ".bak") == [booking]
+    assert read(storage.DATA_FILE + ".bak.1") == legacy_hostels([])
+    assert read(storage.STUDENT_BOOKINGS_FILE + ".bak.1") == []
+    assert not os.path.exists(storage.COMMIT_FILE)
+    assert not any(name.endswith((".tmp", ".rotate")) for name in os.listdir(data_dir))
+
+
+def test_check_only_and_current_files_write_nothing(data_dir):
+    backend = storage.JsonStorage()
+    backend.save_all(legacy_hostels([]), [])
+    backend.close()
+    before = sorted(os.listdir(data_dir))
+    assert schema.migrate_file(storage.DATA_FILE, check_only=True, workers=1)[2] == 1
+    schema.migrate_file(storage.DATA_FILE, workers=1)
+    after_upgrade = sorted(os.listdir(data_dir))
+    assert schema.migrate_file(storage.DATA_FILE, workers=1)[2] == 0  # Already current: left alone
+    assert sorted(os.listdir(data_dir)) == after_upgrade
+    assert set(before) <= set(after_upgrade)
+
+
+# Hostels already at the current version are kept as loaded, and lazy ones keep their floors unread
+def test_engine_leaves_current_hostels_alone():
+    current = schema.migrate_hostel(legacy_hostels([])["Hostel A"])[0]
+    lazy = LazyHostel({"distance": 2.0, "category": "Girls", "schema": schema.SCHEMA_VERSION},
+                      lambda: current["floors"], 2)
+    load_floors = lazy.load_floors
+    hostels = {"Hostel A": current, "Hostel B": lazy}
+    engine = HostelEngine(storage.MemoryStorage(hostels), ids_file=COLLEGE_IDS)
+    assert engine.hostels["Hostel A"] is current
+    assert engine.hostels["Hostel B"] is lazy and not lazy.loaded and lazy.load_floors is load_floors
+    assert engine.problems == []
+
+
+# Old hostels are upgraded in memory; one with a problem left over is not stamped, so it is checked again
+def test_engine_upgrades_old_hostels_and_only_stamps_clean_ones():
+    hostels = legacy_hostels([])
+    hostels["Hostel B"] = {"distance": 2.0, "category": "Boys", "floors": {"Floor 1": {
+        "Room 1": {"status": "available", "capacity": 2, "occupants": [{"name": "Asha"}]}}}}
+    engine = HostelEngine(storage.MemoryStorage(hostels), ids_file=COLLEGE_IDS)
+    assert engine.hostels["Hostel A"]["schema"] == schema.SCHEMA_VERSION
+    assert engine.hostels["Hostel A"]["floors"]["Floor 1"]["Room 1"]["capacity"] == 2
+    assert "schema" not in engine.hostels["Hostel B"]
+    assert [problem[0] for problem in engine.problems] == ["Hostel B"]
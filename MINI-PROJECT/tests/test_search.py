@@ -0,0 +1,19 @@
+from bookings import BookingStore
+from search import SearchIndex
+
+
+def booking(student_id, name, hostel_name):
+    return {"student_id": student_id, "student_name": name, "hostel_name": hostel_name, "floor": "Floor 1",
+            "room": "Room 1"}
+
+
+# A query that starts with a digit is a roll-number prefix first, then a hostel or name search
+def test_digit_queries_fall_back_to_names():
+    index = SearchIndex(BookingStore([booking("1602-23-737-001", "Asha", "2nd Block"),
+                                      booking("1602-23-737-002", "Ben", "Main"),
+                                      booking("1602-22-733-001", "Cara 3rd", "Main")]))
+    assert index.search("1602-23") == ["1602-23-737-001", "1602-23-737-002"]
+    assert index.search("2nd Block") == ["1602-23-737-001"]
+    assert index.search("2nd block / floor 1") == ["1602-23-737-001"]
+    assert index.search("3rd") == ["1602-22-733-001"]
+    assert index.search("9") == []